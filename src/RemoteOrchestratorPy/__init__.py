@@ -1,4 +1,13 @@
 from .doit_rtas import (RemoteTaskActionSequence, doit_taskify, get_leaf_task_label, FileConfig,
                         get_dangling_task)
 from .setup_remote import setup_remote_debian,  setup_remote_openbsd
-from .doit_rtas_helpers import RTASExecutionError
+from .doit_rtas_helpers import RTASExecutionError, RemoteResultFile, fetch_result
+from .rtas_executor import RTASThreadRunner, RTASDoitMain
+from .ssh_pool import SSHConnectionPool, ssh_pool
+from .blob_store import RemoteBlobStore
+from .broadcast import FleetBroadcast
+from .rpyc_pool import RPyCConnPool, rpyc_pool
+from .fleet_stats import collect_fleet_stats, format_fleet_report
+from .bootstrap import BootstrapSpec
+from .wheelhouse import WheelhouseCache
+from .tunnels import TunnelManager, tunnel_manager, rpyc_connect
@@ -0,0 +1,164 @@
+"""
+content addressed store of shipped files on the remote, keyed by sha256.
+
+the same artifact is often shipped to several target paths on a host, or by several
+sub task sequences. with a RemoteBlobStore, ship_file:
+- checks <store_dir>/<sha256> on the remote; uploads the blob only if it is missing
+- materialises the target from the blob (reflink, copy or hardlink)
+- evicts least recently used blobs once the store grows past max_bytes
+
+the LRU clock is a stamp per blob in <store_dir>/.lru, touched on every hit; the blob's own
+mtime is left alone, since a hardlinked target shares it.
+
+note: a hardlinked target shares its inode with the blob; a remote step (or an in place ship)
+that edits the target also changes the blob. with link_mode="hardlink" the blob's sha256 is
+checked on every hit and a changed blob is uploaded again. a blob still linked by a target is
+never evicted: removing it would free nothing.
+"""
+import os
+import shlex
+import hashlib
+import threading
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# sh snippet per link mode: materialise $blob at $target
+link_cmds = {
+    "hardlink": 'ln -f "$blob" "$target" 2>/dev/null || cp -p "$blob" "$target"',
+    "reflink": 'cp -p --reflink=auto "$blob" "$target" 2>/dev/null || cp -p "$blob" "$target"',
+    "copy": 'cp -p "$blob" "$target"',
+}
+
+# sh snippet: sha256 of $blob in $sum (sha256sum on linux, sha256 on the BSDs)
+blob_sum_cmd = 'if command -v sha256sum >/dev/null; then sum=$(sha256sum < "$blob" | cut -d" " -f1); else sum=$(sha256 -q < "$blob"); fi'
+
+
+class RemoteBlobStore:
+    """
+    store_dir: directory on the remote that holds the blobs (e.g. under the remote workdir)
+    max_bytes: evict least recently used blobs above this size; None for no eviction
+    link_mode: one of reflink (copy on filesystems without reflinks), copy, hardlink
+    """
+    def __init__(self, store_dir, max_bytes=None, link_mode="reflink"):
+        assert link_mode in link_cmds
+        self.store_dir = Path(store_dir)
+        self.max_bytes = max_bytes
+        self.link_mode = link_mode
+        # (local path, size, mtime) -> sha256; avoids rehashing unchanged local files
+        self._digests = {}
+        # (host, sha256) -> lock; concurrent ships of the same blob upload it once
+        self._blob_locks = {}
+        self._lock = threading.Lock()
+
+    def local_digest(self, local_path):
+        st = os.stat(local_path)
+        key = (str(local_path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if key in self._digests:
+                return self._digests[key]
+        digest = hashlib.sha256()
+        with open(local_path, "rb") as fh:
+            for buf in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(buf)
+        with self._lock:
+            self._digests[key] = digest.hexdigest()
+        return self._digests[key]
+
+    def blob_path(self, digest):
+        return self.store_dir/digest
+
+    def stamp_path(self, digest):
+        return self.store_dir/".lru"/digest
+
+    def materialise(self, fabric_conn, digest, target_path):
+        """
+        link target_path to the blob, if the blob is in the store.
+        returns False on a store miss.
+        the blob's stamp is touched on a hit; it serves as the LRU clock.
+        """
+        verify = ""
+        if self.link_mode == "hardlink":
+            # a target edited in place changed the blob too: drop it, it is uploaded again
+            verify = f"""    {blob_sum_cmd}
+    if [ "$sum" != {digest} ]; then rm -f "$blob"; echo miss; exit 0; fi
+"""
+        script = f"""blob={shlex.quote(str(self.blob_path(digest)))}; target={shlex.quote(str(target_path))}
+mkdir -p {shlex.quote(str(self.store_dir/".lru"))}
+if [ -f "$blob" ]; then
+{verify}    touch {shlex.quote(str(self.stamp_path(digest)))}
+    {link_cmds[self.link_mode]} && echo hit
+else
+    echo miss
+fi
+"""
+        result = fabric_conn.run(script, hide=True, warn=True)
+        if result.stdout.strip() == "hit":
+            return True
+        if result.stdout.strip() != "miss":
+            raise IOError(f"blob store failed to materialise {target_path}: {result.stderr.strip()}")
+        return False
+
+    def add_blob(self, fabric_conn, local_path, digest, put=None):
+        """
+        upload local_path into the store; put(local, remote) defaults to fabric put
+        """
+        part_path = f"{self.blob_path(digest)}.part"
+        if put:
+            put(local_path, part_path)
+        else:
+            fabric_conn.put(str(local_path), part_path)
+        fabric_conn.run(f"mv -f {shlex.quote(part_path)} {shlex.quote(str(self.blob_path(digest)))}", hide=True)
+
+    def evict(self, fabric_conn):
+        """
+        keep the most recently used blobs that fit in max_bytes; remove the rest.
+        blobs still hardlinked by a target are neither counted nor removed.
+        """
+        if self.max_bytes is None:
+            return
+        script = f"""cd {shlex.quote(str(self.store_dir))} || exit 0
+total=0
+ls -t .lru 2>/dev/null | while read f; do
+    [ -f "$f" ] || {{ rm -f ".lru/$f"; continue; }}
+    [ -n "$(find "$f" -links +1)" ] && continue
+    total=$((total + $(wc -c < "$f")))
+    if [ $total -gt {int(self.max_bytes)} ]; then rm -f "$f" ".lru/$f"; echo "$f"; fi
+done
+"""
+        result = fabric_conn.run(script, hide=True, warn=True)
+        evicted = result.stdout.split()
+        if evicted:
+            logger.info(f"BLOB-store-evict: {fabric_conn.host}: {len(evicted)} blobs")
+
+    def ship(self, fabric_conn, local_path, target_path, put=None):
+        digest = self.local_digest(local_path)
+        with self._lock:
+            blob_lock = self._blob_locks.setdefault((fabric_conn.host, digest), threading.Lock())
+
+        with blob_lock:
+            if self.materialise(fabric_conn, digest, target_path):
+                logger.debug(f"BLOB-store-hit: {local_path} -> {target_path}")
+                return
+            logger.debug(f"BLOB-store-miss: {local_path} -> {target_path}")
+            self.add_blob(fabric_conn, local_path, digest, put=put)
+            if not self.materialise(fabric_conn, digest, target_path):
+                raise IOError(f"blob {digest} missing right after upload")
+        self.evict(fabric_conn)
+
+
+def ship_file_via_blob_store(blob_store,
+                             fabric_conn,
+                             file_to_ship,
+                             dest_path,
+                             put=None
+                             ):
+    """
+    same as ship_file, but through the remote content addressed store
+    """
+    try:
+        blob_store.ship(fabric_conn, file_to_ship, dest_path, put=put)
+    except Exception as e:
+        logger.debug(f"FILE-ship-FAILURE: {file_to_ship} due to {e}")
+        raise e
@@ -0,0 +1,227 @@
+"""
+single round trip bootstrap of a host: workdir, python, venv, pip packages and service files.
+
+the whole bootstrap is one idempotent sh script, fed to `sh -s` over one ssh exec channel.
+the script first compares two fingerprints:
+- the spec fingerprint, computed on the controller (python, system install command, packages,
+  name and sha256 of every file)
+- the node state, computed on the node (venv python, pyvenv.cfg version, installed
+  distributions, hashes of the files in the workdir)
+both are recorded in <remote_workdir>/.rtas_bootstrap after a successful run; if neither
+changed the script exits right away. otherwise only the steps that differ are redone
+(output of pip and the system install goes to .rtas_bootstrap.log).
+
+with a wheelhouse bundle (see wheelhouse) the packages are installed offline: a host that misses
+packages and does not have the bundle yet exits with NEED_WHEELHOUSE; run_bootstrap then
+uploads the bundle and reruns the script. the system install (idempotent, e.g. pkg_add or
+apt-get install) runs only if the spec fingerprint changed since the last successful run, or
+the python interpreter is missing on the node; its stdin is /dev/null, since the script itself
+is read from stdin.
+
+    spec = BootstrapSpec(remote_workdir, packages=("rpyc", "wget"), files=(service_py, launch_sh))
+    remote_task_append(spec, "bootstrap")
+"""
+import re
+import json
+import shlex
+import base64
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+from .ssh_pool import ssh_pool
+from .remote_execution_service import file_digest
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_MARKER = ".rtas_bootstrap"
+# exit code of the script when it needs the wheelhouse bundle uploaded
+NEED_WHEELHOUSE = 3
+
+
+class BootstrapSpec(NamedTuple):
+    remote_workdir: str
+    # interpreter on the node that creates the venv
+    python: str = "python3"
+    # pip requirements installed into the venv; name or name==version
+    packages: tuple = ("rpyc", "wget")
+    # sh command that installs python and system packages, e.g. "doas pkg_add python-3.12.8p1 wget"
+    system_install: str = None
+    # local files copied into remote_workdir (by basename)
+    files: tuple = ()
+    # local wheelhouse bundle (WheelhouseCache.bundle); pip installs from it with no network access
+    wheelhouse: str = None
+
+
+class BootstrapResult(NamedTuple):
+    exit_code: int
+    stdout: str
+    stderr: str
+
+
+def wheelhouse_name(spec):
+    """
+    remote file name of the spec's wheelhouse bundle, by content
+    """
+    return f"wheelhouse-{file_digest(spec.wheelhouse)[:16]}.tar.gz"
+
+
+def bootstrap_fingerprint(spec, file_digests=None):
+    """
+    sha256 over everything the spec asks for
+    """
+    if file_digests is None:
+        file_digests = [(Path(path).name, file_digest(path)) for path in spec.files]
+    return hashlib.sha256(json.dumps({"python": spec.python,
+                                      "system_install": spec.system_install,
+                                      "packages": sorted(spec.packages),
+                                      "files": file_digests,
+                                      "wheelhouse": wheelhouse_name(spec) if spec.wheelhouse else None
+                                      }, sort_keys=True).encode()).hexdigest()
+
+
+def _dist_info_pattern(requirement):
+    """
+    grep pattern of the .dist-info dir pip leaves in site-packages for requirement
+    """
+    name, _, version = requirement.partition("==")
+    name = re.sub(r"[-_.]+", "_", name.strip().lower())
+    if not re.fullmatch(r"[a-z0-9_]+", name):
+        raise ValueError(f"unsupported requirement {requirement}: use name or name==version")
+    version = re.escape(version.strip()) if version else "[^-]*"
+    return f"^{name}-{version}\\.dist-info$"
+
+
+def build_bootstrap_script(spec):
+    file_digests = [(Path(path).name, file_digest(path)) for path in spec.files]
+    fingerprint = bootstrap_fingerprint(spec, file_digests)
+    file_names = " ".join(shlex.quote(name) for name, _ in file_digests)
+
+    lines = [f"""fingerprint={fingerprint}
+python={shlex.quote(spec.python)}
+mkdir -p {shlex.quote(str(spec.remote_workdir))} && cd {shlex.quote(str(spec.remote_workdir))} || exit 1
+
+if command -v sha256sum >/dev/null 2>&1; then
+    hash_file() {{ sha256sum "$1" 2>/dev/null | cut -d' ' -f1; }}
+else
+    hash_file() {{ sha256 -q "$1" 2>/dev/null; }}
+fi
+
+node_state() {{
+    [ -x venv/bin/python3 ] && echo venv
+    sed -n 's/^version[_a-z]* *= *//p' venv/pyvenv.cfg 2>/dev/null
+    ls venv/lib/python*/site-packages 2>/dev/null | grep '\\.dist-info$'
+    for f in {file_names}; do echo "$f $(hash_file "$f")"; done
+}}
+
+if [ "$(cat {BOOTSTRAP_MARKER} 2>/dev/null)" = "$fingerprint $(node_state | cksum)" ]; then
+    echo "rtas-bootstrap: unchanged"
+    exit 0
+fi
+
+log={BOOTSTRAP_MARKER}.log
+: > $log
+fail() {{
+    echo "rtas-bootstrap: $1 failed" >&2
+    tail -n 20 $log >&2
+    exit 1
+}}
+"""]
+
+    if spec.system_install:
+        lines.append(f"""if [ "$(cut -d' ' -f1 {BOOTSTRAP_MARKER} 2>/dev/null)" != "$fingerprint" ] || ! command -v "$python" >/dev/null 2>&1; then
+    {{ {spec.system_install} ; }} < /dev/null >> $log 2>&1 || fail "system install"
+fi
+""")
+
+    lines.append("""py_version=$("$python" -c 'import sys; print("%d.%d" % sys.version_info[:2])') || fail python
+venv_version=$(sed -n 's/^version[_a-z]* *= *\\([0-9]*\\.[0-9]*\\).*/\\1/p' venv/pyvenv.cfg 2>/dev/null | head -n 1)
+if [ ! -x venv/bin/python3 ] || [ "$venv_version" != "$py_version" ]; then
+    rm -rf venv
+    "$python" -m venv venv >> $log 2>&1 || fail venv
+fi
+
+missing=""
+""")
+    for requirement in spec.packages:
+        lines.append(f"ls venv/lib/python*/site-packages 2>/dev/null | tr 'A-Z' 'a-z' | grep -q '{_dist_info_pattern(requirement)}'"
+                     f" || missing=\"$missing {shlex.quote(requirement)}\"\n")
+    if spec.wheelhouse:
+        bundle = shlex.quote(wheelhouse_name(spec))
+        lines.append(f"""if [ -n "$missing" ]; then
+    if [ ! -f {bundle} ]; then
+        echo "rtas-bootstrap: need wheelhouse"
+        exit {NEED_WHEELHOUSE}
+    fi
+    rm -rf wheelhouse && mkdir wheelhouse && tar -xzf {bundle} -C wheelhouse || fail "wheelhouse unpack"
+    venv/bin/python3 -m pip install --no-index --find-links wheelhouse $missing >> $log 2>&1 || fail "pip install"
+    rm -rf wheelhouse
+fi
+""")
+    else:
+        lines.append("""if [ -n "$missing" ]; then
+    venv/bin/python3 -m pip install $missing >> $log 2>&1 || fail "pip install"
+fi
+""")
+
+    for (name, sha256), path in zip(file_digests, spec.files):
+        encoded = base64.encodebytes(Path(path).read_bytes()).decode()
+        lines.append(f"""if [ "$(hash_file {shlex.quote(name)})" != {sha256} ]; then
+    "$python" -c 'import base64, sys; sys.stdout.buffer.write(base64.b64decode(sys.stdin.read()))' > {shlex.quote(name)}.rtas-part <<'RTAS_EOF' || fail "write {name}"
+{encoded}RTAS_EOF
+    mv -f {shlex.quote(name)}.rtas-part {shlex.quote(name)} || fail "write {name}"
+fi
+""")
+
+    lines.append(f"""echo "$fingerprint $(node_state | cksum)" > {BOOTSTRAP_MARKER}
+echo "rtas-bootstrap: updated"
+""")
+    return "".join(lines)
+
+
+def run_bootstrap(fabric_conn, spec):
+    """
+    run the bootstrap script of spec over one exec channel of the pooled ssh conn
+    """
+    script = build_bootstrap_script(spec)
+    result = _run_script(fabric_conn, script)
+    if result.exit_code == NEED_WHEELHOUSE and spec.wheelhouse:
+        # first install on this host: upload the bundle once, the next bootstraps find it in the workdir
+        remote_bundle = f"{spec.remote_workdir}/{wheelhouse_name(spec)}"
+        logger.info(f"RTAS-bootstrap-wheelhouse: {fabric_conn.host}: uploading {spec.wheelhouse}")
+        fabric_conn.put(str(spec.wheelhouse), f"{remote_bundle}.rtas-part")
+        fabric_conn.run(f"mv -f {shlex.quote(remote_bundle)}.rtas-part {shlex.quote(remote_bundle)}", hide=True)
+        result = _run_script(fabric_conn, script)
+    return result
+
+
+def _run_script(fabric_conn, script):
+    transport = ssh_pool.ensure_open(fabric_conn)
+    chan = transport.open_session()
+    try:
+        chan.exec_command("sh -s")
+        chan.sendall(script.encode())
+        chan.shutdown_write()
+        stdout, stderr = _read_output(chan)
+        exit_code = chan.recv_exit_status()
+    finally:
+        chan.close()
+    return BootstrapResult(exit_code,
+                           stdout.decode(errors="replace"),
+                           stderr.decode(errors="replace")
+                           )
+
+
+def _read_output(chan):
+    """
+    stdout and stderr of chan, read concurrently: reading one to eof first would block
+    the remote once the window of the other one is full
+    """
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(chan.makefile_stderr("rb").read()), daemon=True)
+    reader.start()
+    stdout = chan.makefile("rb").read()
+    reader.join()
+    return stdout, stderr[0] if stderr else b""
@@ -0,0 +1,271 @@
+"""
+peer relay broadcast of one local file to many hosts.
+
+with a plain ship_file every rtas uploads the file from the controller, i.e., the controller
+uplink carries it N times. a FleetBroadcast sends it once per seed host; every host relays
+the stream to its children as it arrives (relay_remote.py), along a fanout-ary tree:
+
+    controller --> seed 0 --> host 2, host 3 --> host 6, host 7 ...
+               +-> seed 1 --> host 4, host 5 --> ...
+
+the tree is a pipeline, so the time to reach all hosts is about one transfer plus
+per hop latency, growing with log(N).
+
+usage: share one FleetBroadcast across all rtas of a doit_taskify stage, i.e.,
+    rtas.set_task_ship_files_iter(fileconfigs, dest_dir, broadcast=fleet_broadcast)
+each rtas still gets its own ship_file: task, with its own task_dep and uptodate check. only
+the ship_file tasks that doit actually runs join a broadcast round: the first one to run
+waits until all registered hosts joined or gather_window passed, then relays the file to the
+hosts that joined; the others wait for it and report the outcome of their own host. a host
+whose ship_file is uptodate, or whose chain failed before it, never joins and is not written.
+a host the relay did not reach falls back to a direct upload.
+the ship_file tasks of a stage have to run concurrently (RTASRun with num_process) to share a
+round; run one at a time, every host gets a round of its own after gather_window.
+
+the hosts must reach each other over tcp at the address the controller uses for ssh (fabric_conn.host,
+resolved on the controller); a listening relay binds only that address.
+the stream carries a per broadcast token and the file is sha256 checked on every host.
+"""
+import os
+import shlex
+import socket
+import time
+import secrets
+import hashlib
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .ssh_pool import ssh_pool
+
+logger = logging.getLogger(__name__)
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "relay_remote.py")) as _fh:
+    relay_remote_source = _fh.read()
+
+STREAM_CHUNK = 1 << 18
+
+
+class _Relay:
+    """
+    relay process on one host, run over an exec channel
+    """
+    def __init__(self, fabric_conn, target_path):
+        self.fabric_conn = fabric_conn
+        self.target_path = target_path
+        self.chan = None
+        self.port = None
+        # address of the host as seen by its peers: the relay listens on it, the parent connects to it
+        self.address = None
+
+    def start(self, python, sha256, token, mode, children):
+        self.address = socket.getaddrinfo(self.fabric_conn.host, None, type=socket.SOCK_STREAM)[0][4][0]
+        transport = ssh_pool.ensure_open(self.fabric_conn)
+        self.chan = transport.open_session()
+        child_args = " ".join(f"{child.address} {child.port}" for child in children)
+        self.chan.exec_command(f"{python} -c {shlex.quote(relay_remote_source)} "
+                               f"{shlex.quote(str(self.target_path))} {sha256} {mode} {self.address} {child_args}")
+        # the token goes over stdin; on the command line any user of the host could read it with ps
+        self.chan.sendall(f"{token}\n".encode())
+        if mode == "listen":
+            # first line on stdout is the bound port
+            line = b""
+            while not line.endswith(b"\n"):
+                buf = self.chan.recv(1)
+                if not buf:
+                    raise IOError(f"relay on {self.fabric_conn.host} exited before listening: {self.stderr()}")
+                line += buf
+            self.port = int(line)
+
+    def stderr(self):
+        stderr = b""
+        while True:
+            buf = self.chan.recv_stderr(32768)
+            if not buf:
+                break
+            stderr += buf
+        return stderr.decode(errors="replace").strip()
+
+    def wait(self):
+        stderr = self.stderr()
+        exit_status = self.chan.recv_exit_status()
+        self.chan.close()
+        if exit_status != 0:
+            raise IOError(f"relay on {self.fabric_conn.host} exited with {exit_status}: {stderr}")
+        if stderr:
+            logger.debug(f"FILE-broadcast-relay: {self.fabric_conn.host}: {stderr}")
+
+
+class _Round:
+    """
+    one relay of a file, to the hosts that joined before it started
+    """
+    def __init__(self):
+        self.participants = []
+        self.results = None
+        self.done = threading.Event()
+
+
+class FleetBroadcast:
+    """
+    fanout: number of seed hosts fed by the controller, and of children per relaying host
+    python: python interpreter on the remote hosts
+    gather_window: seconds the first ship of a round waits for the ships of the other hosts
+    """
+    def __init__(self, fanout=2, python="python3", gather_window=2.0):
+        assert fanout >= 1
+        self.fanout = fanout
+        self.python = python
+        self.gather_window = gather_window
+        # local path -> keys of the hosts that may ship it (registered at task generation)
+        self._candidates = {}
+        # local path -> _Round still gathering hosts
+        self._rounds = {}
+        self._cond = threading.Condition()
+
+    def register(self, fabric_conn, local_path, target_path):
+        with self._cond:
+            self._candidates.setdefault(str(local_path), set()).add(self._key(fabric_conn, target_path))
+
+    @staticmethod
+    def _key(fabric_conn, target_path):
+        return (fabric_conn.host, fabric_conn.port, str(target_path))
+
+    def _tree(self, num_hosts):
+        """
+        children indices per host; hosts [0, fanout) are the seeds
+        """
+        return [list(range(self.fanout * (idx + 1), min(self.fanout * (idx + 2), num_hosts)))
+                for idx in range(num_hosts)
+                ]
+
+    def _run(self, local_path, participants):
+        """
+        relay local_path to participants [(fabric_conn, target_path)];
+        returns {key: None or the exception of a host the relay did not reach}
+        """
+        results = {self._key(fabric_conn, target_path): None for fabric_conn, target_path in participants}
+
+        digest = hashlib.sha256()
+        with open(local_path, "rb") as fh:
+            for buf in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(buf)
+        sha256 = digest.hexdigest()
+        token = secrets.token_hex(16)
+
+        relays = [_Relay(fabric_conn, target_path) for fabric_conn, target_path in participants]
+        tree = self._tree(len(relays))
+        depth = [0] * len(relays)
+        for idx, children in enumerate(tree):
+            for child in children:
+                depth[child] = depth[idx] + 1
+
+        # children must listen before their parent connects: start relays bottom up,
+        # the hosts of one level in parallel
+        started = [False] * len(relays)
+
+        def start(idx):
+            children = [relays[child] for child in tree[idx] if started[child]]
+            try:
+                relays[idx].start(self.python, sha256, token,
+                                  "stdin" if idx < self.fanout else "listen",
+                                  children)
+                started[idx] = True
+            except Exception as e:
+                results[self._key(relays[idx].fabric_conn, relays[idx].target_path)] = e
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            for level in range(max(depth), -1, -1):
+                list(executor.map(start, [idx for idx in range(len(relays)) if depth[idx] == level]))
+
+            # a host whose parent failed to start would wait for a connection that never comes
+            for idx, children in enumerate(tree):
+                if started[idx]:
+                    continue
+                for child in children:
+                    orphans = [child]
+                    while orphans:
+                        orphan = orphans.pop()
+                        if started[orphan]:
+                            relays[orphan].chan.close()
+                            started[orphan] = False
+                            results[self._key(relays[orphan].fabric_conn, relays[orphan].target_path)] = IOError("parent relay did not start")
+                        orphans.extend(tree[orphan])
+
+            def feed(idx):
+                relay = relays[idx]
+                with open(local_path, "rb") as fh:
+                    for buf in iter(lambda: fh.read(STREAM_CHUNK), b""):
+                        relay.chan.sendall(buf)
+                relay.chan.shutdown_write()
+
+            def wait(idx):
+                try:
+                    if idx < self.fanout:
+                        feed(idx)
+                    relays[idx].wait()
+                except Exception as e:
+                    results[self._key(relays[idx].fabric_conn, relays[idx].target_path)] = e
+
+            list(executor.map(wait, [idx for idx in range(len(relays)) if started[idx]]))
+
+        reached = sum(1 for result in results.values() if result is None)
+        logger.info(f"FILE-broadcast: {local_path}: relayed to {reached} of {len(relays)} hosts")
+        return results
+
+    def _join(self, fabric_conn, local_path, target_path):
+        """
+        add the host to the round of local_path that is gathering; returns (round, whether this ship leads it)
+        """
+        with self._cond:
+            round_ = self._rounds.get(local_path)
+            leader = round_ is None
+            if leader:
+                round_ = self._rounds[local_path] = _Round()
+            round_.participants.append((fabric_conn, target_path))
+            self._cond.notify_all()
+            if not leader:
+                return round_, False
+
+            deadline = time.monotonic() + self.gather_window
+            while len(round_.participants) < len(self._candidates.get(local_path, ())):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            # later ships start a new round
+            del self._rounds[local_path]
+            return round_, True
+
+    def ship(self, fabric_conn, local_path, target_path):
+        local_path = str(local_path)
+        round_, leader = self._join(fabric_conn, local_path, target_path)
+        if leader:
+            try:
+                round_.results = self._run(local_path, round_.participants)
+            except Exception as e:
+                round_.results = {self._key(*participant): e for participant in round_.participants}
+            finally:
+                round_.done.set()
+        else:
+            round_.done.wait()
+        result = round_.results.get(self._key(fabric_conn, target_path))
+        if result is None:
+            return
+        logger.info(f"FILE-broadcast-fallback: {fabric_conn.host}: {local_path} due to {result}")
+        fabric_conn.put(local_path, str(target_path))
+
+
+def ship_file_broadcast(fleet_broadcast,
+                        fabric_conn,
+                        file_to_ship,
+                        dest_path
+                        ):
+    """
+    same as ship_file, but via a FleetBroadcast shared by all hosts
+    """
+    try:
+        fleet_broadcast.ship(fabric_conn, file_to_ship, dest_path)
+    except Exception as e:
+        logger.debug(f"FILE-ship-FAILURE: {file_to_ship} due to {e}")
+        raise e
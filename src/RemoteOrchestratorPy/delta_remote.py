@@ -0,0 +1,99 @@
+"""
+remote half of the delta transfer (see delta_transfer). stdlib only.
+
+the controller runs the source of this file over an ssh exec:
+    python3 -c "<source>" sig <path> <block_size>
+        prints the size of path (or '-' if missing), then '<adler32> <md5>' per block
+    python3 -c "<source>" patch <path> <block_size> [<mode>]
+        rebuilds path from the op stream on stdin (a new file gets mode, in octal):
+        'C' <idx> <count>  copy count blocks of the old file starting at block idx
+        'D' <len> <data>   literal data
+        'E' <sha256>       end; the rebuilt file must have this digest
+"""
+import sys
+import os
+import zlib
+import hashlib
+import struct
+
+
+def read_exact(fh, size):
+    buf = b""
+    while len(buf) < size:
+        chunk = fh.read(size - len(buf))
+        if not chunk:
+            raise EOFError("delta stream ended early")
+        buf += chunk
+    return buf
+
+
+def signature(path, block_size, out):
+    if not os.path.isfile(path):
+        out.write(b"-\n")
+        return
+    out.write(f"{os.path.getsize(path)}\n".encode())
+    with open(path, "rb") as fh:
+        while True:
+            blk = fh.read(block_size)
+            if not blk:
+                break
+            out.write(f"{zlib.adler32(blk):08x} {hashlib.md5(blk).hexdigest()}\n".encode())
+
+
+def patch(path, block_size, inp, mode=None):
+    part_path = f"{path}.rtas-part"
+    old = open(path, "rb") if os.path.isfile(path) else None
+    digest = hashlib.sha256()
+    try:
+        with open(part_path, "wb") as new:
+            while True:
+                op = read_exact(inp, 1)
+                if op == b"C":
+                    idx, count = struct.unpack(">QQ", read_exact(inp, 16))
+                    old.seek(idx * block_size)
+                    remaining = count * block_size
+                    while remaining:
+                        # the last block of the old file may be short
+                        buf = old.read(min(remaining, 1 << 20))
+                        if not buf:
+                            break
+                        new.write(buf)
+                        digest.update(buf)
+                        remaining -= len(buf)
+                elif op == b"D":
+                    (length,) = struct.unpack(">Q", read_exact(inp, 8))
+                    buf = read_exact(inp, length)
+                    new.write(buf)
+                    digest.update(buf)
+                elif op == b"E":
+                    expected = read_exact(inp, 32)
+                    break
+                else:
+                    raise ValueError(f"bad delta op {op!r}")
+    except BaseException:
+        # e.g. the controller dropped the stream to upload the whole file instead
+        os.unlink(part_path)
+        raise
+    finally:
+        if old:
+            old.close()
+
+    if digest.digest() != expected:
+        os.unlink(part_path)
+        sys.stderr.write(f"digest mismatch for {path}\n")
+        sys.exit(2)
+    if os.path.isfile(path):
+        os.chmod(part_path, os.stat(path).st_mode)
+    elif mode is not None:
+        os.chmod(part_path, mode)
+    os.replace(part_path, path)
+
+
+if __name__ == "__main__":
+    cmd, path, block_size = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    if cmd == "sig":
+        signature(path, block_size, sys.stdout.buffer)
+    elif cmd == "patch":
+        patch(path, block_size, sys.stdin.buffer, int(sys.argv[4], 8) if len(sys.argv) > 4 else None)
+    else:
+        sys.exit(f"unknown command {cmd}")
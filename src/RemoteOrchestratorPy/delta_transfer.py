@@ -0,0 +1,226 @@
+"""
+rsync style delta transfer for shipped files (FileConfig(..., delta=True)).
+
+1. the remote computes block signatures (adler32, md5) of its current copy
+2. the controller scans the local file: blocks found on the remote become copy ops,
+   everything else is sent as literal data. adler32 is rolled byte by byte to find
+   blocks at shifted offsets (insertions/deletions)
+3. the remote rebuilds the file from the op stream, verifies its sha256 and renames it in place
+
+both remote steps run delta_remote.py via python3 -c; no rsync binary or rpyc service is needed.
+
+the rolling scan runs in pure python, a few MB/s over changed regions. a file with no remote
+copy is uploaded as is, and once the literal data of a delta passes max_literal_ratio of the file
+or max_literal_bytes, the delta is dropped and the whole file is uploaded instead.
+"""
+import os
+import math
+import mmap
+import shlex
+import struct
+import zlib
+import hashlib
+import logging
+
+from .ssh_pool import ssh_pool
+
+logger = logging.getLogger(__name__)
+
+ADLER_MOD = 65521
+# max size of a literal data op
+MAX_LITERAL = 1 << 20
+# defaults of ship_file_delta: fall back to a full upload above this much literal data
+MAX_LITERAL_RATIO = 0.5
+MAX_LITERAL_BYTES = 32 << 20
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "delta_remote.py")) as _fh:
+    delta_remote_source = _fh.read()
+
+
+def default_block_size(file_size):
+    """
+    sqrt of the file size, as rsync does, within [2KB, 128KB]
+    """
+    return min(max(int(math.sqrt(file_size)) & ~7, 2048), 1 << 17)
+
+
+def remote_signature(fabric_conn, remote_path, block_size, python="python3"):
+    """
+    returns (remote file size, [(adler32, md5hex) per block]); size is None if the file does not exist
+    """
+    result = fabric_conn.run(f"{python} -c {shlex.quote(delta_remote_source)} sig {shlex.quote(str(remote_path))} {block_size}",
+                             hide=True)
+    lines = result.stdout.splitlines()
+    if lines[0] == "-":
+        return None, []
+    signatures = []
+    for line in lines[1:]:
+        weak, strong = line.split()
+        signatures.append((int(weak, 16), strong))
+    return int(lines[0]), signatures
+
+
+def compute_delta(data, block_size, remote_size, signatures):
+    """
+    generator of ops over data (bytes like):
+    ('C', idx, count): copy count blocks from the remote copy starting at block idx
+    ('D', bytes): literal data
+    """
+    if not signatures:
+        # nothing on the remote to copy from
+        for start in range(0, len(data), MAX_LITERAL):
+            yield ('D', bytes(data[start:start + MAX_LITERAL]))
+        return
+
+    strong_index = {}
+    weak_index = {}
+    for idx, (weak, strong) in enumerate(signatures):
+        strong_index.setdefault(strong, idx)
+        weak_index.setdefault(weak, []).append(idx)
+
+    def block_len(idx):
+        return min(block_size, remote_size - idx * block_size)
+
+    size = len(data)
+    pos = 0
+    literal_start = 0
+    copy_run = None
+
+    def flush_literal(end):
+        for start in range(literal_start, end, MAX_LITERAL):
+            yield ('D', bytes(data[start:min(start + MAX_LITERAL, end)]))
+
+    def emit_copy(idx, at):
+        nonlocal copy_run, literal_start
+        if literal_start < at:
+            if copy_run:
+                yield ('C', *copy_run)
+                copy_run = None
+            yield from flush_literal(at)
+        if copy_run and copy_run[0] + copy_run[1] == idx:
+            copy_run = (copy_run[0], copy_run[1] + 1)
+        else:
+            if copy_run:
+                yield ('C', *copy_run)
+            copy_run = (idx, 1)
+        literal_start = at + block_len(idx)
+
+    while pos < size:
+        # fast path: block at pos is on the remote as is
+        blk = data[pos:pos + block_size]
+        idx = strong_index.get(hashlib.md5(blk).hexdigest())
+        if idx is not None and block_len(idx) == len(blk):
+            yield from emit_copy(idx, pos)
+            pos += len(blk)
+            continue
+
+        if pos + block_size >= size:
+            # tail shorter than a block and not on the remote
+            break
+
+        # roll the weak checksum forward, at most one block
+        weak = zlib.adler32(blk)
+        a, b = weak & 0xffff, weak >> 16
+        matched = False
+        end = min(pos + block_size, size - block_size)
+        for k in range(pos, end):
+            x_out = data[k]
+            x_in = data[k + block_size]
+            a = (a - x_out + x_in) % ADLER_MOD
+            b = (b - block_size * x_out + a - 1) % ADLER_MOD
+            candidates = weak_index.get((b << 16) | a)
+            if candidates is None:
+                continue
+            strong = hashlib.md5(data[k + 1:k + 1 + block_size]).hexdigest()
+            for idx in candidates:
+                if signatures[idx][1] == strong and block_len(idx) == block_size:
+                    yield from emit_copy(idx, k + 1)
+                    pos = k + 1 + block_size
+                    matched = True
+                    break
+            if matched:
+                break
+
+        if not matched:
+            pos = end
+
+    if copy_run:
+        yield ('C', *copy_run)
+    yield from flush_literal(size)
+
+
+def encode_op(op):
+    if op[0] == 'C':
+        return b"C" + struct.pack(">QQ", op[1], op[2])
+    return b"D" + struct.pack(">Q", len(op[1])) + op[1]
+
+
+def ship_file_delta(fabric_conn,
+                    file_to_ship,
+                    dest_path,
+                    block_size=None,
+                    python="python3",
+                    max_literal_ratio=MAX_LITERAL_RATIO,
+                    max_literal_bytes=MAX_LITERAL_BYTES
+                    ):
+    """
+    same as ship_file, but only blocks missing from the existing remote copy are sent
+    """
+    file_size = os.path.getsize(file_to_ship)
+    block_size = block_size or default_block_size(file_size)
+    try:
+        remote_size, signatures = remote_signature(fabric_conn, dest_path, block_size, python=python)
+        if remote_size is None:
+            logger.debug(f"FILE-ship-delta-fallback: {file_to_ship}: no remote copy")
+            fabric_conn.put(str(file_to_ship), str(dest_path))
+            return
+
+        literal_limit = min(max_literal_ratio * file_size, max_literal_bytes)
+        exit_status = None
+        with open(file_to_ship, "rb") as lfh:
+            data = mmap.mmap(lfh.fileno(), 0, access=mmap.ACCESS_READ) if file_size else b""
+            try:
+                digest = hashlib.sha256(data).digest()
+
+                transport = ssh_pool.ensure_open(fabric_conn)
+                chan = transport.open_session()
+                try:
+                    # a new file (removed since the signature was taken) gets the local mode, as with put
+                    mode = f"{os.stat(file_to_ship).st_mode & 0o7777:o}"
+                    chan.exec_command(f"{python} -c {shlex.quote(delta_remote_source)} patch {shlex.quote(str(dest_path))} {block_size} {mode}")
+                    literal_bytes = 0
+                    for op in compute_delta(data, block_size, remote_size, signatures):
+                        if op[0] == 'D':
+                            literal_bytes += len(op[1])
+                            if literal_bytes > literal_limit:
+                                # closing the channel before the end op aborts the remote patch
+                                break
+                        chan.sendall(encode_op(op))
+                    else:
+                        chan.sendall(b"E" + digest)
+                        chan.shutdown_write()
+
+                        stderr = b""
+                        while True:
+                            buf = chan.recv_stderr(32768)
+                            if not buf:
+                                break
+                            stderr += buf
+                        exit_status = chan.recv_exit_status()
+                finally:
+                    chan.close()
+            finally:
+                if file_size:
+                    data.close()
+
+        if exit_status is None:
+            logger.debug(f"FILE-ship-delta-fallback: {file_to_ship}: more than {literal_limit:.0f} bytes changed")
+            fabric_conn.put(str(file_to_ship), str(dest_path))
+            return
+        if exit_status != 0:
+            raise IOError(f"remote delta patch exited with {exit_status}: {stderr.decode(errors='replace').strip()}")
+        logger.debug(f"FILE-ship-delta: {file_to_ship}: sent {literal_bytes} of {file_size} bytes as literal data")
+
+    except Exception as e:
+        logger.debug(f"FILE-ship-FAILURE: {file_to_ship} due to {e}")
+        raise e
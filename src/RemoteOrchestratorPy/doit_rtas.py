@@ -10,8 +10,12 @@ Things to keep in mind:
 import traceback
 import sys
 import functools
-from .doit_rtas_helpers import (log_command_exec_status,
-                                log_command_exec_status_rpyc, 
+from .doit_rtas_helpers import (log_command_exec_status_rpyc, 
+                                log_batch_exec_status,
+                                log_batch_action_status,
+                                ActionResult,
+                                decode_result,
+                                run_batched,
                                 ship_file,
                                 fetch_file,
                                 get_ref_name,
@@ -20,10 +24,24 @@ from .doit_rtas_helpers import (log_command_exec_status,
                                 teardown_fetchfile
                                )
 
+from .ssh_pool import ssh_pool
+from .rpyc_pool import rpyc_pool
+from .ship_engine import ShipEngine, ship_file_pipelined, ship_files_bundle
+from .delta_transfer import ship_file_delta
+from .blob_store import ship_file_via_blob_store
+from .broadcast import ship_file_broadcast
+from .bootstrap import BootstrapSpec, run_bootstrap
+from .remote_stat import (RemoteStatProbe,
+                          CachedRemoteFilesDep,
+                          check_remote_files_exists_probe,
+                          invalidate_remote_paths
+                          )
 from patchwork.files import exists
 from doit_extntools import RemoteFilesDep, RemoteCommandError
 from pathlib import Path
 import logging
+import time
+import threading
 from collections import defaultdict
 
 # Create a defaultdict where each value is a dict
@@ -106,33 +124,64 @@ def doit_taskify(all_rtas,
     return wrapper
 
 
-def remote_exec_cmd(rtas,  task_label, *args):
+def remote_exec_cmd(rtas, task_label, *args):
+    """
+    run the commands in args via remote_exec_cmd_batch, so that a single command and a list
+    of commands fail the same way: by exit code, whatever they write to stderr
+    """
+    return remote_exec_cmd_batch(rtas, task_label, *args)
 
-    status = "Success"
+def remote_exec_cmd_batch(rtas, task_label, *args):
+    """
+    run all commands in args over one ssh exec channel;
+    stops at the first failing command.
+    """
+    cmd_results = run_batched(rtas.active_conn, args)
+    return log_batch_exec_status(cmd_results,
+                                 len(args),
+                                 task_label,
+                                 rtas
+                                 )
 
-    for cmdstr in args:
+def remote_bootstrap(rtas, task_label, spec):
+    """
+    run the bootstrap script of spec (see bootstrap) over one exec channel
+    """
+    result = run_bootstrap(rtas.active_conn, spec)
+    if result.exit_code == 0:
+        logger.info(f"IP Address: {rtas.ipv6} || {task_label} || {result.stdout.strip()}")
+        rtas.remote_task_results[task_label] = ("Success", result.stdout.strip())
+        return True
 
-        result = rtas.active_conn.run(cmdstr, hide=True)
-        # TODO: only the last command results are  kept 
-        status = log_command_exec_status(cmdstr,
-                                         result,
-                                         task_label,
-                                         rtas
-                                )
-    return status
+    logger.error(f"IP Address: {rtas.ipv6} || {task_label} || bootstrap failed")
+    logger.error(result.stderr.strip())
+    rtas.remote_task_results[task_label] = ("Error", result.stderr.strip())
+    raise RemoteCommandError("remote bootstrap failed", result.exit_code, result.stderr.strip())
 
 def remote_exec_func(rtas, task_label, cmdl):
     #result = "success"
     try:
         logger.debug(f"starting remote action: {cmdl}")
-        result = rtas.rpyc_conn.root.exec_action("remote_actions",
-                                                 cmdl[0],
-                                                 *cmdl[1],
-                                                 **cmdl[2]
-                                                  )
+
+        def on_record(kind, text):
+            # output chunks and progress records of the action, as they arrive
+            if kind == "output":
+                for line in text.splitlines():
+                    logger.info(f"RTAS-output: {rtas.ipv6} || {task_label} || {line}")
+            else:
+                logger.info(f"RTAS-progress: {rtas.ipv6} || {task_label} || {text}")
+
+        # a conn of its own, so that remote actions of other task chains on the host are not held up
+        with rpyc_pool.checkout(rtas.ipv6, default=rtas.rpyc_conn) as rpyc_conn:
+            result = rpyc_conn.root.exec_action_stream(on_record,
+                                                       "remote_actions",
+                                                       cmdl[0],
+                                                       *cmdl[1],
+                                                       **cmdl[2]
+                                                       )
         #result = rtas.rpyc_conn.root.exec_action("remote_actions", "wget_url", f"https://cdn.openbsd.org/pub/OpenBSD/snapshots/arm64/man76.tgz")
+        result = decode_result(result)
         
-        result = "Downloded"
         logger.debug(f"result via rpyc = {result}")
         logger.debug(f"task_label = {task_label}")
 
@@ -151,6 +200,122 @@ def remote_exec_func(rtas, task_label, cmdl):
         raise e
 
 
+def check_remote_memo(rtas, cmdl):
+    """
+    uptodate checker of a memoised remote step (append(..., memo=True)): True if the service
+    has a memoised result for the call, so doit skips the step without calling the action
+    """
+    if rtas.rpyc_conn is None:
+        return False
+    try:
+        with rpyc_pool.checkout(rtas.ipv6, default=rtas.rpyc_conn) as rpyc_conn:
+            return rpyc_conn.root.memo_lookup("remote_actions",
+                                              cmdl[0],
+                                              tuple(cmdl[1]),
+                                              tuple(cmdl[2].items())
+                                              )
+    except Exception as e:
+        logger.debug(f"memo lookup failed {e}")
+        return False
+
+
+def remote_exec_func_batch(rtas, task_label, cmdls, parallel=False):
+    """
+    run all the remote actions cmdls = [(action name, args, kwargs), ...] in one rpc (exec_actions);
+    in order, stopping at the first failure, or all in parallel
+    """
+    try:
+        logger.debug(f"starting batched remote actions: {cmdls}")
+        calls = tuple((cmdl[0], tuple(cmdl[1]), tuple(cmdl[2].items())) for cmdl in cmdls)
+        with rpyc_pool.checkout(rtas.ipv6, default=rtas.rpyc_conn) as rpyc_conn:
+            replies = rpyc_conn.root.exec_actions("remote_actions", calls, parallel)
+        action_results = [ActionResult(cmdl[0], status, decode_result(value), duration)
+                          for cmdl, (status, value, duration) in zip(cmdls, replies)
+                          ]
+        return log_batch_action_status(action_results, task_label, rtas)
+
+    except Exception as e:
+        logger.debug(f"exec_func_batch failed {e}")
+        if task_label not in rtas.remote_task_results:
+            rtas.remote_task_results[task_label] = ("Failed", str(e))
+        raise e
+
+
+def remote_submit_func(rtas, task_label, cmdl):
+    """
+    submit the remote action as a background job of the remote service and return right away.
+    the job is awaited by remote_wait_jobs at the end of the remote step chain.
+    """
+    try:
+        with rpyc_pool.checkout(rtas.ipv6, default=rtas.rpyc_conn) as rpyc_conn:
+            job_id = rpyc_conn.root.submit_job("remote_actions",
+                                               cmdl[0],
+                                               *cmdl[1],
+                                               **cmdl[2]
+                                               )
+        logger.info(f"RTAS-job-submit: {rtas.ipv6} || {task_label} || {cmdl[0]} as job {job_id}")
+        rtas.remote_jobs[task_label] = (cmdl[0], job_id)
+        rtas.remote_task_results[task_label] = ("Submitted", job_id)
+        return True
+
+    except Exception as e:
+        logger.debug(f"submit_func failed {e}")
+        rtas.remote_task_results[task_label] = ("Failed", str(e))
+        raise e
+
+
+# seconds between the poll_timeout of wait_jobs and the rpyc sync_request_timeout of the conn
+WAIT_JOBS_MARGIN = 5
+
+def remote_wait_jobs(rtas, task_labels, timeout=None, poll_timeout=None):
+    """
+    wait for the jobs submitted by the tasks task_labels; one rpc per poll_timeout seconds for all of them,
+    so no controller thread is tied up per job and no call runs into the rpyc sync_request_timeout.
+    timeout: overall timeout in seconds; pending jobs are cancelled once it passes
+    poll_timeout: defaults to the conn's sync_request_timeout less WAIT_JOBS_MARGIN
+    tasks that did not submit a job in this run (e.g. skipped as uptodate) are not waited for.
+    """
+    pending = {}
+    for task_label in task_labels:
+        if task_label not in rtas.remote_jobs:
+            logger.debug(f"RTAS-job-skip: {rtas.ipv6} || {task_label} || no job submitted")
+            continue
+        pending[rtas.remote_jobs[task_label][1]] = task_label
+    deadline = None if timeout is None else time.monotonic() + timeout
+    failed = []
+    last_progress = {}
+    while pending:
+        with rpyc_pool.checkout(rtas.ipv6, default=rtas.rpyc_conn) as rpyc_conn:
+            if poll_timeout is None:
+                sync_timeout = rpyc_conn._config["sync_request_timeout"]
+                wait_timeout = max(1, sync_timeout - WAIT_JOBS_MARGIN) if sync_timeout else 60
+            else:
+                wait_timeout = poll_timeout
+            statuses = rpyc_conn.root.wait_jobs(tuple(pending), wait_timeout)
+            for job_id, state, result, error, progress in statuses:
+                if progress and progress != last_progress.get(job_id):
+                    last_progress[job_id] = progress
+                    logger.info(f"RTAS-progress: {rtas.ipv6} || {pending[job_id]} || {progress}")
+                if state == "queued" or state == "running":
+                    if deadline is not None and time.monotonic() > deadline:
+                        rpyc_conn.root.cancel_job(job_id)
+                        state, error = "cancelled", f"timed out after {timeout}s"
+                    else:
+                        continue
+                task_label = pending.pop(job_id)
+                action_name = rtas.remote_jobs[task_label][0]
+                if state == "done":
+                    log_command_exec_status_rpyc(action_name, decode_result(result), task_label, rtas)
+                else:
+                    logger.info(f"RTAS-job-{state}: {rtas.ipv6} || {task_label} || job {job_id}: {error}")
+                    rtas.remote_task_results[task_label] = ("Failed", error)
+                    failed.append(task_label)
+
+    if failed:
+        raise RemoteCommandError("remote jobs failed", -1, f"failed jobs: {failed}")
+    return True
+
+
 def check_remote_files_exists(fabric_conn, remote_targets):
     
     for _fs in remote_targets:
@@ -223,6 +388,14 @@ class RemoteTaskActionSequence:
         self.task_failed_abort_execution = False
         self.task_failed_exception = None
         self.rpyc_conn = None
+        # remote_step task label -> (action name, job id) of detached remote actions
+        self.remote_jobs = {}
+        # serialises execution of this rtas's tasks when tasks are run
+        # concurrently (see rtas_executor); held for a whole remote_step, so only
+        # detached steps use more than one action slot of the service at a time
+        self.lock = threading.RLock()
+        # remote targets of all tasks of this rtas are stat'ed together in one exec
+        self.remote_stat_probe = RemoteStatProbe(self)
         make_active = True
         for user_name, fabric_conn in args:
             self.add_ssh_user(user_name, fabric_conn, make_active=make_active)
@@ -231,7 +404,8 @@ class RemoteTaskActionSequence:
         self.os_type = kwargs.get("os_type", "openbsd")
 
     def add_ssh_user(self, user_name, fabric_conn, make_active="False"):
-        self.ssh_users_fabric_conn[user_name] = fabric_conn
+        # share one ssh conn per (host, user) across rtas
+        self.ssh_users_fabric_conn[user_name] = ssh_pool.add(fabric_conn)
         if make_active:
             self.active_conn = self.ssh_users_fabric_conn[user_name]
         
@@ -294,6 +468,15 @@ class RemoteTaskActionSequence:
         """
         fileconfigs: A  list of fileconfig for files to ship
         dest_dir : should be a path object
+        kwargs['num_channels']: ship via a ShipEngine with that many pipelined sftp channels;
+                                the ship_file tasks of the group may then run concurrently (see rtas_executor)
+        kwargs['blob_store']: a RemoteBlobStore; files are uploaded only if their sha256 is not
+                              in the remote store yet, targets are linked from the store
+        kwargs['bundle']: ship all the files as one tar stream over a single exec channel,
+                          as a single ship_files:bundle task (kwargs['compress'] to gzip the stream);
+                          FileConfig.delta is ignored in bundle mode
+        kwargs['broadcast']: a FleetBroadcast shared by the rtas of a doit_taskify stage; the file is
+                             uploaded once to a few seed hosts and relayed host to host (see broadcast)
         """
         assert isinstance(dest_dir, Path)
 
@@ -323,6 +506,79 @@ class RemoteTaskActionSequence:
             file_to_ship = fileconfig.file_path
             return dest_dir/Path(file_to_ship).name
 
+        self.remote_stat_probe.register([target_path(fileconfig) for fileconfig in fileconfigs])
+
+        if kwargs.get('broadcast') and not kwargs.get('bundle'):
+            for fileconfig in fileconfigs:
+                if not fileconfig.delta:
+                    kwargs.get('broadcast').register(self.active_conn, fileconfig.file_path, target_path(fileconfig))
+
+        ship_engine = None
+        if kwargs.get('num_channels'):
+            ship_engine = ShipEngine(self.active_conn, num_channels=kwargs.get('num_channels'))
+
+        def ship_action(fileconfig):
+            if fileconfig.delta:
+                return (ship_file_delta, [self.active_conn,
+                                          fileconfig.file_path,
+                                          target_path(fileconfig)
+                                          ])
+            if kwargs.get('broadcast'):
+                # joins a broadcast round only if this host's chain is still running
+                return (action_wrapper(self, ship_file_broadcast), [kwargs.get('broadcast'),
+                                                                    self.active_conn,
+                                                                    fileconfig.file_path,
+                                                                    target_path(fileconfig)
+                                                                    ])
+            if kwargs.get('blob_store'):
+                return (ship_file_via_blob_store, [kwargs.get('blob_store'),
+                                                   self.active_conn,
+                                                   fileconfig.file_path,
+                                                   target_path(fileconfig),
+                                                   ship_engine.put if ship_engine else None
+                                                   ])
+            if ship_engine:
+                return (ship_file_pipelined, [ship_engine,
+                                              fileconfig.file_path,
+                                              target_path(fileconfig)
+                                              ])
+            return (ship_file, [self.active_conn,
+                                fileconfig.file_path,
+                                target_path(fileconfig)
+                                ])
+
+        def ship_bundle_iter():
+            trec = {
+                'basename': self.basename,
+                'name': "ship_files:bundle",
+                'actions': [(ship_files_bundle, [self.active_conn,
+                                                 self.remote_stat_probe,
+                                                 [(fileconfig.file_path, target_path(fileconfig))
+                                                  for fileconfig in fileconfigs
+                                                  ],
+                                                 kwargs.get('compress', False)
+                                                 ]),
+                            (invalidate_remote_paths, [self.remote_stat_probe,
+                                                       [target_path(fileconfig) for fileconfig in fileconfigs]
+                                                       ])
+                            ],
+                'uptodate': [(check_remote_files_exists_probe,
+                              [self.remote_stat_probe,
+                               [target_path(fileconfig) for fileconfig in fileconfigs]
+                               ]
+                              )
+                             ],
+                'file_dep': [fileconfig.file_path for fileconfig in fileconfigs],
+                'task_dep': [task_label_ship_files_prefix]
+                }
+            teardown = [(teardown_shipfile, [self.active_conn, fileconfig, target_path])
+                        for fileconfig in fileconfigs
+                        if fileconfig.clean_local or fileconfig.clean_remote
+                        ]
+            if teardown:
+                trec['teardown'] = teardown
+            yield trec
+
         def ship_task_iter():
             for fileconfig in fileconfigs:
 
@@ -331,14 +587,14 @@ class RemoteTaskActionSequence:
                     'basename': self.basename,
 
                     'name': f"ship_file:{target_path(fileconfig)}",
-                    'actions': [(ship_file, [self.active_conn,
-                                             fileconfig.file_path,
-                                             target_path(fileconfig)
-                                             ])
+                    'actions': [ship_action(fileconfig),
+                                (invalidate_remote_paths, [self.remote_stat_probe,
+                                                           [target_path(fileconfig)]
+                                                           ])
 
                                 ],
-                    'uptodate': [(check_remote_files_exists,
-                                  [self.active_conn,
+                    'uptodate': [(check_remote_files_exists_probe,
+                                  [self.remote_stat_probe,
                                    [target_path(fileconfig)]
                                    ]
                                   )
@@ -353,6 +609,10 @@ class RemoteTaskActionSequence:
                 if fileconfig.clean_local or fileconfig.clean_remote:
                     trec['teardown'] = [(teardown_shipfile, [self.active_conn, fileconfig, target_path])]
 
+                if ship_engine:
+                    # ship_file tasks of a group touch no rtas state; let them run side by side
+                    trec['meta'] = {'rtas_concurrent': True}
+
                 yield trec
 
         
@@ -367,12 +627,14 @@ class RemoteTaskActionSequence:
         trec = {'basename': self.basename,
                 'name': f"ship_files:_leaf_final_",
                 'task_dep': [f"{self.basename}:ship_file:{target_path(fileconfig)}" for fileconfig in fileconfigs
-                             ],
+                             ] if not kwargs.get('bundle') else [f"{self.basename}:ship_files:bundle"],
                 'actions': None,
                 #'doc': f"{self.task_label}: group task for file ship to remote"
                 }
+        if ship_engine:
+            trec['teardown'] = [ship_engine.close]
 
-        self.task_ship_files_iter  = ship_task_iter()
+        self.task_ship_files_iter  = ship_bundle_iter() if kwargs.get('bundle') else ship_task_iter()
         self.task_ship_files_group = trec
         self.final_task = f"{self.basename}:ship_files:_leaf_final_"
 
@@ -446,13 +708,73 @@ class RemoteTaskActionSequence:
 
         # all the task records 
         remote_step_trecs = []
+        # remote_step labels submitted as remote jobs; awaited by the final task
+        detached_labels = []
+        job_timeout = [None]
         def append(cmd, label, *args, **kwargs):
             """
-            if cmd is string-- then the string is executed via fabric.run
+            if cmd is a list of strings -- all the commands are executed in a single fabric.run (one ssh exec channel);
+                                           a command fails by its exit code and stops the step;
+                                           per command exit code, stdout, stderr and duration are kept in rtas.remote_task_results
+            if cmd is string-- same as a list of one command
+            if cmd is a BootstrapSpec -- the host is bootstrapped by one fingerprinted script over one ssh exec channel
+                                         (see bootstrap); the script itself is the uptodate check
+            if cmd is a list of functions -- all the remote actions are run in a single rpc (exec_actions), in order;
+                                             kwargs['parallel']=True runs them concurrently on the remote.
+                                             per action status, value and duration are kept in rtas.remote_task_results
             if cmd is a function -- its assumed that it is using dask to run python code remotely.
+                                    with kwargs['detach']=True the function is submitted as a job of the remote service
+                                    and the task returns right away; the jobs of the chain are awaited in the final
+                                    remote_step task (kwargs['job_timeout'] bounds the wait). later steps of the chain
+                                    must not depend on the outcome of a detached step.
+                                    rtas_pool="process" in the function kwargs runs a cpu bound action in the
+                                    service's process pool (see remote_execution_service.run_action).
+                                    rtas_result="value" returns the result by value: unpickled in
+                                    rtas.remote_task_results, or a RemoteResultFile for large ones (see fetch_result).
+                                    kwargs['memo']=True memoises the result on the remote, keyed by the action module's
+                                    content, the function and its args; the step is uptodate while a result is memoised.
             
             """
-            if isinstance(cmd, str):
+            # a remote action is (action name, args, kwargs)
+            memo = isinstance(cmd, tuple) and kwargs.get('memo')
+            if memo:
+                cmd = (cmd[0], cmd[1], {**cmd[2], 'rtas_memo': True})
+
+            if isinstance(cmd, BootstrapSpec):
+                trec = {
+                    'basename': self.basename,
+                    'name': f"remote_step:{label}",
+                    'actions': [(action_wrapper(self, remote_bootstrap),
+                                 [self,
+                                  f"{self.basename}:remote_step:{label}",
+                                  cmd]
+                                 )
+                                ],
+                    }
+            elif isinstance(cmd, list) and cmd and not isinstance(cmd[0], str):
+                trec = {
+                    'basename': self.basename,
+                    'name': f"remote_step:{label}",
+                    'actions': [(action_wrapper(self, remote_exec_func_batch),
+                                 [self,
+                                  f"{self.basename}:remote_step:{label}",
+                                  cmd,
+                                  kwargs.get('parallel', False)]
+                                 )
+                                ],
+                    }
+            elif isinstance(cmd, list):
+                trec = {
+                    'basename': self.basename,
+                    'name': f"remote_step:{label}",
+                    'actions': [(action_wrapper(self, remote_exec_cmd_batch),
+                                 [self,
+                                  f"{self.basename}:remote_step:{label}",
+                                  *cmd]
+                                 )
+                                ],
+                    }
+            elif isinstance(cmd, str):
                 trec = {
                     'basename': self.basename,
                     'name': f"remote_step:{label}",
@@ -464,6 +786,18 @@ class RemoteTaskActionSequence:
                                 ],
                     #'doc': f"{self.suffix_task_label}: remote step : {label}",
                     }
+            elif kwargs.get('detach'):
+                detached_labels.append(f"{self.basename}:remote_step:{label}")
+                if kwargs.get('job_timeout'):
+                    job_timeout[0] = max(job_timeout[0] or 0, kwargs.get('job_timeout'))
+                trec = {
+                    'basename': self.basename,
+                    'name': f"remote_step:{label}",
+                    'actions': [(action_wrapper(self, remote_submit_func), [self,
+                                                                            f"{self.basename}:remote_step:{label}",
+                                                                            cmd])
+                                ],
+                    }
             else:
                 #cmd is a dask function
                 trec = {
@@ -478,6 +812,8 @@ class RemoteTaskActionSequence:
 
 
             trec['uptodate'] = kwargs.get('uptodate', [])
+            if memo:
+                trec['uptodate'].append((check_remote_memo, [self, cmd]))
 
             trec['task_dep'] = kwargs.get('task_dep', [])
 
@@ -490,18 +826,23 @@ class RemoteTaskActionSequence:
         
             #target implies remote targets
             if 'targets' in kwargs:
-                trec['uptodate'].append((check_remote_files_exists,
-                                         [self.active_conn, kwargs.get('targets')]
+                self.remote_stat_probe.register(kwargs.get('targets'))
+                trec['uptodate'].append((check_remote_files_exists_probe,
+                                         [self.remote_stat_probe, kwargs.get('targets')]
                                          )
                                         )
+                # targets are written by this step; drop them from the run's remote metadata cache
+                trec['actions'].append((invalidate_remote_paths,
+                                        [self.remote_stat_probe, kwargs.get('targets')]
+                                        )
+                                       )
             
 
             #file_dep implies remote file_dep
             if 'file_dep' in kwargs:
-                trec['uptodate'].append(RemoteFilesDep(self.active_conn,
-                                                       kwargs.get('file_dep'),
-                                                       os_type=self.os_type
-                                                       )
+                trec['uptodate'].append(CachedRemoteFilesDep(self.remote_stat_probe,
+                                                             kwargs.get('file_dep')
+                                                             )
                                         )
             remote_step_trecs.append(trec)
 
@@ -529,6 +870,11 @@ class RemoteTaskActionSequence:
                 'task_dep': [get_ref_name(remote_step_trecs[-1])]
 
                 }
+            if detached_labels:
+                self.remote_step_iter_final_trec['actions'] = [(action_wrapper(self, remote_wait_jobs),
+                                                                [self, detached_labels, job_timeout[0]]
+                                                                )
+                                                               ]
             self.remote_step_iter_final_task = f"{self.basename}:remote_step"
 
         self.task_remote_step_iter = remote_step_trecs
@@ -587,10 +933,9 @@ class RemoteTaskActionSequence:
 
 
 
-                    'uptodate': [RemoteFilesDep(self.active_conn,
-                                                [fileconfig.file_path],
-                                                os_type=self.os_type
-                                                )
+                    'uptodate': [CachedRemoteFilesDep(self.remote_stat_probe,
+                                                      [fileconfig.file_path]
+                                                      )
                                  ],
                     #'doc': f"{self.suffix_task_label}: fetch-file {file_to_fetch}",
                     'task_dep': [task_label_fetch_files_prefix]
@@ -670,6 +1015,12 @@ class RemoteTaskActionSequence:
 
 
     def __iter__(self):
+        for trec in self._iter_trecs():
+            # the concurrent runner (rtas_executor) serialises the tasks of an rtas by meta['rtas']
+            trec.setdefault('meta', {})['rtas'] = self
+            yield trec
+
+    def _iter_trecs(self):
 
         # prefix task must be send
 
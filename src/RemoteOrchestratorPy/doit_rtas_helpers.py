@@ -12,6 +12,11 @@ from plumbum import SshMachine
 from .setup_remote import ClientService, service_port, FileConfig, module_dir
 
 import logging
+import re
+import pickle
+import tempfile
+import uuid
+from typing import NamedTuple
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +62,108 @@ def fetch_file(fabric_conn,
         
     pass
 
+class RemoteResultFile(NamedTuple):
+    """
+    a by value result (rtas_result="value") too large to return inline; it is pickled in a file on the remote.
+    fetch it with fetch_result, or as any remote file via set_task_fetch_files_iter.
+    """
+    path: str
+    size: int
+
+
+def decode_result(value):
+    """
+    result of a remote action as returned by the service: unpickle by value results,
+    wrap spilled ones in a RemoteResultFile, pass anything else through
+    """
+    # match the exact shapes encode_result returns; a plain result that merely starts with the tag passes through
+    if isinstance(value, tuple):
+        if len(value) == 2 and value[0] == "rtas-value" and isinstance(value[1], bytes):
+            return pickle.loads(value[1])
+        if len(value) == 3 and value[0] == "rtas-file" and isinstance(value[1], str) and isinstance(value[2], int):
+            return RemoteResultFile(value[1], value[2])
+    return value
+
+
+def fetch_result(fabric_conn, result_file, target_path=None, clean_remote=True):
+    """
+    fetch and unpickle a spilled result. target_path: where to keep the fetched file (default: a temporary file)
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        local_path = target_path or Path(tmp_dir)/Path(result_file.path).name
+        fetch_file(fabric_conn, result_file.path, local_path)
+        with open(local_path, "rb") as fh:
+            result = pickle.load(fh)
+    if clean_remote:
+        fabric_conn.run(f"rm -f {result_file.path}", hide=True, warn=True)
+    return result
+
+
+class CommandResult(NamedTuple):
+    """
+    outcome of one command of a batched remote step
+    duration is in seconds, as measured on the remote
+    """
+    cmdstr: str
+    exit_code: int
+    stdout: str
+    stderr: str
+    duration: float
+
+
+# sh function that prints current time in ns;
+# openbsd date has no %N, fall back to second resolution
+_batch_now_func = """__rtas_now() { _n=$(date +%s%N); case $_n in *N) echo "$(date +%s)000000000";; *) echo "$_n";; esac; }"""
+
+def build_batch_script(cmdstrs, token, stop_on_error=True):
+    """
+    frame each command between begin/end markers on both stdout and stderr,
+    so that a single exec channel can run all of them and the output can be split per command.
+    every command runs in its own subshell, same as when each is sent via a separate fabric run.
+    """
+    lines = [_batch_now_func]
+    for idx, cmdstr in enumerate(cmdstrs):
+        lines.append(f"printf '%s begin %d\\n' {token} {idx}; printf '%s begin %d\\n' {token} {idx} >&2")
+        lines.append("__rtas_t0=$(__rtas_now)")
+        lines.append(f"(\n{cmdstr}\n)")
+        lines.append("__rtas_rc=$?")
+        lines.append("__rtas_t1=$(__rtas_now)")
+        lines.append(f"printf '\\n%s end %d %d %s %s\\n' {token} {idx} $__rtas_rc $__rtas_t0 $__rtas_t1; printf '\\n%s end %d\\n' {token} {idx} >&2")
+        if stop_on_error:
+            lines.append("[ $__rtas_rc -eq 0 ] || exit 0")
+    return "\n".join(lines) + "\n"
+
+def parse_batch_output(cmdstrs, token, stdout, stderr):
+    """
+    split the framed output of build_batch_script back into a CommandResult per executed command
+    """
+    out_re = re.compile(rf"{token} begin (\d+)\n(.*?)\n{token} end \1 (-?\d+) (\d+) (\d+)\n", re.S)
+    err_re = re.compile(rf"{token} begin (\d+)\n(.*?)\n{token} end \1\n", re.S)
+    errs = {int(m.group(1)): m.group(2) for m in err_re.finditer(stderr)}
+
+    results = []
+    for m in out_re.finditer(stdout):
+        idx = int(m.group(1))
+        duration = (int(m.group(5)) - int(m.group(4)))/1e9
+        results.append(CommandResult(cmdstrs[idx],
+                                     int(m.group(3)),
+                                     m.group(2),
+                                     errs.get(idx, ""),
+                                     duration
+                                     )
+                       )
+    return results
+
+def run_batched(fabric_conn, cmdstrs, stop_on_error=True):
+    """
+    run all cmdstrs over a single ssh exec channel.
+    returns list of CommandResult; with stop_on_error the list ends at the first failing command.
+    """
+    token = f"__rtas_{uuid.uuid4().hex}"
+    script = build_batch_script(cmdstrs, token, stop_on_error=stop_on_error)
+    result = fabric_conn.run(script, hide=True, warn=True)
+    return parse_batch_output(cmdstrs, token, result.stdout, result.stderr)
+
 def teardown_shipfile(fabric_conn, fileconfig, target_path):
     if fileconfig.clean_local:
         fileconfig.file_path.unlink()
@@ -116,6 +223,58 @@ def log_command_exec_status(cmdstr, result, task_label, rtas):
             
 
  
+def log_batch_exec_status(cmd_results, num_cmds, task_label, rtas):
+    """
+    log per command status of a batched remote step; raise on first failed command.
+    all command results (not just the last) are kept in rtas.remote_task_results
+    """
+    for cmd_result in cmd_results:
+        logger.info(f"IP Address: {rtas.ipv6} || {task_label} || For command: {cmd_result.cmdstr} || exit code {cmd_result.exit_code} in {cmd_result.duration:.3f}s")
+        logger.info(cmd_result.stdout.strip())
+
+    failed = [_ for _ in cmd_results if _.exit_code != 0]
+    if failed:
+        cmd_result = failed[0]
+        logger.error(f"IP Address: {rtas.ipv6} || {task_label} || For command: {cmd_result.cmdstr}")
+        logger.error(cmd_result.stderr.strip())
+        rtas.remote_task_results[task_label] = ("Error", cmd_results)
+        raise RemoteCommandError("remote command execution failed", cmd_result.exit_code, cmd_result.stderr.strip())
+
+    if len(cmd_results) != num_cmds:
+        rtas.remote_task_results[task_label] = ("Error", cmd_results)
+        raise RemoteCommandError("batched remote commands did not run to completion", -1, "")
+
+    rtas.remote_task_results[task_label] = ("Success", cmd_results)
+    return True
+
+
+class ActionResult(NamedTuple):
+    action: str
+    status: str
+    value: object
+    duration: float
+
+
+def log_batch_action_status(action_results, task_label, rtas):
+    """
+    log per action status of a batched remote step (exec_actions); raise if any action failed.
+    all action results are kept in rtas.remote_task_results
+    """
+    for action_result in action_results:
+        logger.info(f"IP Address: {rtas.ipv6} || {task_label} || For action: {action_result.action} || {action_result.status} in {action_result.duration:.3f}s")
+        logger.info(action_result.value)
+
+    failed = [_ for _ in action_results if _.status != "ok"]
+    if failed:
+        action_result = failed[0]
+        logger.error(f"IP Address: {rtas.ipv6} || {task_label} || For action: {action_result.action}")
+        logger.error(action_result.value)
+        rtas.remote_task_results[task_label] = ("Error", action_results)
+        raise RemoteCommandError("remote action execution failed", -1, str(action_result.value))
+
+    rtas.remote_task_results[task_label] = ("Success", action_results)
+    return True
+
 # client service but         
 
 
@@ -0,0 +1,75 @@
+"""
+collect the stats of the remote_execution_service of every rtas into one fleet report.
+
+    stats = collect_fleet_stats(all_rtas)
+    print(format_fleet_report(stats))
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .rpyc_pool import rpyc_pool
+
+logger = logging.getLogger(__name__)
+
+
+def collect_fleet_stats(all_rtas, max_workers=32):
+    """
+    returns {ipv6: stats dict} (see ServiceStats.report), in the order of all_rtas; hosts without
+    a service connection, or whose service did not answer, map to {"error": ...}.
+    the hosts are queried concurrently, max_workers at a time.
+    """
+    def host_stats(rtas):
+        if rtas.rpyc_conn is None:
+            return {"error": "no rpyc connection"}
+        try:
+            with rpyc_pool.checkout(rtas.ipv6, default=rtas.rpyc_conn) as rpyc_conn:
+                return json.loads(rpyc_conn.root.stats())
+        except Exception as e:
+            logger.info(f"RTAS-stats-FAILURE: {rtas.ipv6} due to {e}")
+            return {"error": str(e)}
+
+    all_rtas = list(all_rtas)
+    with ThreadPoolExecutor(max_workers=max(min(max_workers, len(all_rtas)), 1)) as executor:
+        return {rtas.ipv6: stats for rtas, stats in zip(all_rtas, executor.map(host_stats, all_rtas))}
+
+
+def merge_action_stats(fleet_stats):
+    """
+    per action totals over all hosts
+    """
+    merged = {}
+    for stats in fleet_stats.values():
+        for action, entry in stats.get("actions", {}).items():
+            total = merged.setdefault(action, {"calls": 0,
+                                               "errors": 0,
+                                               "total_seconds": 0.0,
+                                               "max_seconds": 0.0,
+                                               "latency_histogram": [0] * len(entry["latency_histogram"])
+                                               })
+            total["calls"] += entry["calls"]
+            total["errors"] += entry["errors"]
+            total["total_seconds"] += entry["total_seconds"]
+            total["max_seconds"] = max(total["max_seconds"], entry["max_seconds"])
+            total["latency_histogram"] = [a + b for a, b in zip(total["latency_histogram"], entry["latency_histogram"])]
+    return merged
+
+
+def format_fleet_report(fleet_stats):
+    lines = ["host | uptime(s) | rss(MB) | conns | in flight | jobs | bytes in | bytes out"]
+    for host, stats in fleet_stats.items():
+        if "error" in stats:
+            lines.append(f"{host} | error: {stats['error']}")
+            continue
+        lines.append(f"{host} | {stats['uptime_seconds']:.0f} | {stats['rss_bytes'] / 2**20:.1f} | "
+                     f"{stats['connections']} | {len(stats['in_flight'])} | {stats['pending_jobs']} | "
+                     f"{stats['bytes_in']} | {stats['bytes_out']}")
+
+    buckets = next((stats["latency_buckets"] for stats in fleet_stats.values() if "latency_buckets" in stats), [])
+    lines.append("")
+    lines.append(f"action | calls | errors | mean(s) | max(s) | latency histogram (le {', '.join(buckets)})")
+    for action, total in sorted(merge_action_stats(fleet_stats).items()):
+        mean = total["total_seconds"] / total["calls"] if total["calls"] else 0.0
+        lines.append(f"{action} | {total['calls']} | {total['errors']} | {mean:.3f} | "
+                     f"{total['max_seconds']:.3f} | {total['latency_histogram']}")
+    return "\n".join(lines)
@@ -0,0 +1,90 @@
+"""
+remote half of the broadcast ship (see broadcast). stdlib only.
+
+the controller runs the source of this file over an ssh exec on every host of the relay tree:
+    python3 -c "<source>" <target> <sha256> stdin|listen <bind address> [<child address> <child port> ...]
+and writes the token as the first line of stdin (not on the command line, where ps shows it).
+
+stdin:  the file is read from the exec channel, after the token (seed hosts, fed by the controller)
+listen: binds an ephemeral port on bind address (the host's address as seen by its peers), prints
+        the port on stdout and accepts one connection from the parent host; the parent sends the
+        token first, then the file. gives up after ACCEPT_TIMEOUT, or as soon as the controller
+        closes the exec channel (eof on stdin), e.g. because the parent relay did not start
+
+every chunk is written to <target>.rtas-part and forwarded to the children as it arrives,
+so the tree is a pipeline, not store-and-forward. the part file is renamed to target
+once its sha256 matches.
+"""
+import sys
+import os
+import socket
+import select
+import hashlib
+
+CHUNK = 1 << 18
+ACCEPT_TIMEOUT = 60
+
+
+def open_source(mode, token, bind_address):
+    if mode == "stdin":
+        return sys.stdin.buffer, None
+    family = socket.AF_INET6 if ":" in bind_address else socket.AF_INET
+    server = socket.create_server((bind_address, 0), family=family)
+    print(server.getsockname()[1], flush=True)
+    readable, _, _ = select.select([server, sys.stdin.buffer], [], [], ACCEPT_TIMEOUT)
+    if server not in readable:
+        raise TimeoutError("parent relay did not connect")
+    conn, _ = server.accept()
+    server.close()
+    conn.settimeout(None)
+    source = conn.makefile("rb")
+    if source.read(len(token)) != token:
+        raise ValueError("bad relay token")
+    return source, conn
+
+
+def relay(target, sha256, token, mode, bind_address, children):
+    source, conn = open_source(mode, token, bind_address)
+    part_path = f"{target}.rtas-part"
+    fh = open(part_path, "wb")
+
+    peers = []
+    for host, port in children:
+        try:
+            peer = socket.create_connection((host, int(port)))
+            peer.sendall(token)
+            peers.append((host, peer))
+        except OSError as e:
+            sys.stderr.write(f"relay to {host} failed: {e}\n")
+
+    digest = hashlib.sha256()
+    with fh:
+        while True:
+            buf = source.read(CHUNK)
+            if not buf:
+                break
+            fh.write(buf)
+            digest.update(buf)
+            for host, peer in list(peers):
+                try:
+                    peer.sendall(buf)
+                except OSError as e:
+                    sys.stderr.write(f"relay to {host} failed: {e}\n")
+                    peers.remove((host, peer))
+
+    for host, peer in peers:
+        peer.close()
+    if conn:
+        conn.close()
+
+    if digest.hexdigest() != sha256:
+        os.unlink(part_path)
+        sys.stderr.write(f"digest mismatch for {target}\n")
+        sys.exit(2)
+    os.replace(part_path, target)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    token = sys.stdin.buffer.readline().rstrip(b"\n")
+    relay(args[0], args[1], token, args[2], args[3], list(zip(args[4::2], args[5::2])))
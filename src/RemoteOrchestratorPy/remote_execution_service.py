@@ -1,8 +1,582 @@
 import rpyc
+import os
 import sys
+import json
+import resource
+import pickle
+import time
+import uuid
+import inspect
+import argparse
+import logging
+import signal
+import socket
+import threading
+import zlib
+import hashlib
+import zipfile
+import zipimport
+import tempfile
+import py_compile
 import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
 from pathlib import Path
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# max number of exec_action calls running at once, across all connections (set in __main__)
+action_slots = threading.BoundedSemaphore(8)
+# module upload replaces a module in sys.modules; one upload at a time
+module_lock = threading.Lock()
+# module/package name -> content digest of what is loaded; a reconnect with the same digest skips upload and import
+loaded_digests = {}
+# module/package name -> (kind, path, digest) of the uploaded file; lets pool workers load it
+module_sources = {}
+# process pool for actions that should not run on a service thread (see run_action); created on first use
+process_pool = None
+process_pool_lock = threading.Lock()
+pool_workers = os.cpu_count()
+pool_start_method = "forkserver"
+# results returned by value (rtas_result="value", see encode_result): pickled results above
+# max_inline_result bytes are spilled to a file in results_dir; results above max_result bytes are refused
+max_inline_result = 4 * 2**20
+max_result = 2**30
+results_dir = "rtas_results"
+# memoised action results (rtas_memo, see run_action), one pickle per key
+memo_dir = "rtas_memo"
+# a job record is rewritten on a progress record at most once per interval (seconds); the job log gets every record
+progress_save_interval = 1.0
+# copy_local_file: bytes per chunk request and number of chunk requests in flight
+BULK_CHUNK = 4 * 2**20
+BULK_WINDOW = 8
+# what the service reports in service_info; a controller reattaches to a running service only if
+# its source digest and settings match what it would launch (set in __main__)
+service_digest = None
+service_settings = {}
+pidfile = "remote_execution_service.pid"
+# "<pid> <port>" is written here once the server listens; the launcher waits for it
+ready_file = "remote_execution_service.ready"
+
+
+class ServiceStats:
+    """
+    counters of the service, reported by exposed_stats:
+    per action call counts, errors and latency histogram; calls in flight; connections;
+    bytes pulled from clients (copy_local_file) and returned by value; rss and uptime
+    """
+    # latency histogram bucket upper bounds, in seconds
+    LATENCY_BUCKETS = (0.001, 0.01, 0.1, 1, 10, 60, 600, float("inf"))
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.actions = {}
+        self.in_flight = {}
+        self.connections = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.lock = threading.Lock()
+
+    def call_started(self, action):
+        call_id = uuid.uuid4().hex
+        with self.lock:
+            self.in_flight[call_id] = (action, time.time())
+        return call_id
+
+    def call_finished(self, call_id, failed=False):
+        with self.lock:
+            action, start = self.in_flight.pop(call_id)
+            latency = time.time() - start
+            entry = self.actions.setdefault(action, {"calls": 0,
+                                                     "errors": 0,
+                                                     "total_seconds": 0.0,
+                                                     "max_seconds": 0.0,
+                                                     "latency_histogram": [0] * len(self.LATENCY_BUCKETS)
+                                                     })
+            entry["calls"] += 1
+            entry["errors"] += int(failed)
+            entry["total_seconds"] += latency
+            entry["max_seconds"] = max(entry["max_seconds"], latency)
+            for idx, upper in enumerate(self.LATENCY_BUCKETS):
+                if latency <= upper:
+                    entry["latency_histogram"][idx] += 1
+                    break
+
+    def add_bytes(self, bytes_in=0, bytes_out=0):
+        with self.lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def rss_bytes(self):
+        """
+        current rss from /proc on linux; elsewhere (openbsd) the peak rss from getrusage
+        """
+        try:
+            with open("/proc/self/status") as fh:
+                for line in fh:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macos, kilobytes elsewhere
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    def report(self):
+        now = time.time()
+        with self.lock:
+            return {"pid": os.getpid(),
+                    "uptime_seconds": now - self.start_time,
+                    "rss_bytes": self.rss_bytes(),
+                    "connections": self.connections,
+                    "bytes_in": self.bytes_in,
+                    "bytes_out": self.bytes_out,
+                    "latency_buckets": [str(upper) for upper in self.LATENCY_BUCKETS],
+                    "actions": {action: dict(entry, latency_histogram=list(entry["latency_histogram"]))
+                                for action, entry in self.actions.items()},
+                    "in_flight": [{"action": action, "running_seconds": now - start}
+                                  for action, start in self.in_flight.values()],
+                    "pending_jobs": job_table.num_pending() if job_table else 0,
+                    }
+
+
+service_stats = ServiceStats()
+
+
+def file_digest(path):
+    """
+    sha256 of the file; also used by the controller side (setup_remote, bootstrap), as this file
+    is shipped to the remote on its own and cannot import helpers of the package
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for buf in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(buf)
+    return digest.hexdigest()
+
+
+def localize_bytecode(zip_path):
+    """
+    the bytecode in a package zip is compiled by the controller's python. if this python
+    has a different magic number, recompile the sources in the zip once, so that zipimport
+    loads bytecode instead of compiling the sources on every import.
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        names = zf.namelist()
+        pycs = [name for name in names if name.endswith(".pyc")]
+        if pycs and zf.read(pycs[0])[:4] == importlib.util.MAGIC_NUMBER:
+            return
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zf.extractall(tmp_dir)
+            tmp_zip = f"{zip_path}.tmp"
+            with zipfile.ZipFile(tmp_zip, "w", zipfile.ZIP_DEFLATED) as out:
+                for name in names:
+                    if name.endswith(".pyc"):
+                        continue
+                    path = os.path.join(tmp_dir, name)
+                    out.write(path, name)
+                    if name.endswith(".py"):
+                        py_compile.compile(path, cfile=f"{path}c", doraise=True,
+                                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+                        out.write(f"{path}c", f"{name}c")
+    os.replace(tmp_zip, zip_path)
+
+
+def import_module_file(module_name, module_path):
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules[module_name] = module
+
+
+def import_package_zip(package_name, zip_path):
+    # drop the old package and any cached view of the old zip
+    for name in list(sys.modules):
+        if name == package_name or name.startswith(f"{package_name}."):
+            del sys.modules[name]
+    getattr(zipimport, "_zip_directory_cache", {}).pop(zip_path, None)
+    sys.path_importer_cache.pop(zip_path, None)
+    if zip_path not in sys.path:
+        sys.path.insert(0, zip_path)
+    importlib.invalidate_caches()
+    importlib.import_module(package_name)
+
+
+def decompress_chunk(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    return data
+
+
+def resolve_action(module_name, action_func):
+    if module_name not in sys.modules:
+        raise ValueError(f"Module '{module_name}' is not loaded.")
+
+    module = sys.modules[module_name]
+
+    # Check if the function exists in the module
+    if not hasattr(module, action_func):
+        raise AttributeError(f"Function '{action_func}' not found in module '{module_name}'.")
+
+    # Retrieve the function
+    func = getattr(module, action_func)
+
+    # Ensure it's callable
+    if not callable(func):
+        raise TypeError(f"'{action_func}' in module '{module_name}' is not callable.")
+    return func
+
+
+def stream_record(record):
+    """
+    (kind, text) for a record yielded by an action: str/bytes are output chunks, anything else a progress record.
+    plain strings travel by value over rpyc; the controller never has to call back into the service for them.
+    """
+    if isinstance(record, bytes):
+        return ("output", record.decode(errors="replace"))
+    if isinstance(record, str):
+        return ("output", record)
+    return ("progress", json.dumps(record, default=repr))
+
+
+def call_action(func, args, kwargs, progress=None):
+    """
+    run func. an action reports while it runs by
+    - being a generator: every yielded item is a progress record or an output chunk, the return value is the result
+    - having an rtas_progress attribute set (func.rtas_progress = True): it is called with a
+      progress argument, a callable it can pass records to
+    progress(kind, text) receives each record (see stream_record)
+    """
+    def report(record):
+        if progress is not None:
+            progress(*stream_record(record))
+
+    if getattr(func, "rtas_progress", False):
+        kwargs = dict(kwargs, progress=report)
+    result = func(*args, **kwargs)
+    if inspect.isgenerator(result):
+        while True:
+            try:
+                record = next(result)
+            except StopIteration as stop:
+                return stop.value
+            report(record)
+    return result
+
+
+def localize(value):
+    """
+    copy containers passed by reference over rpyc (netrefs) into local ones, so they can be pickled
+    """
+    if isinstance(value, dict):
+        return {localize(key): localize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [localize(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(localize(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return {localize(item) for item in value}
+    return value
+
+
+def get_process_pool():
+    global process_pool
+    with process_pool_lock:
+        if process_pool is None:
+            start_method = pool_start_method
+            if start_method not in multiprocessing.get_all_start_methods():
+                start_method = "spawn"
+            process_pool = ProcessPoolExecutor(max_workers=pool_workers,
+                                               mp_context=multiprocessing.get_context(start_method))
+        return process_pool
+
+
+# in a pool worker: module name -> digest of the loaded copy
+worker_digests = {}
+
+def pool_worker(module_name, source, action_func, args, kwargs):
+    """
+    runs in a pool process. (re)loads the action module if the service has a newer upload,
+    runs the action and returns (result, records reported by the action)
+    """
+    root_name = module_name.split(".")[0]
+    kind, path, digest = source
+    if worker_digests.get(root_name) != digest:
+        if kind == "zip":
+            import_package_zip(root_name, path)
+        else:
+            import_module_file(root_name, path)
+        worker_digests[root_name] = digest
+    records = []
+    result = call_action(resolve_action(module_name, action_func), args, kwargs,
+                         lambda kind, text: records.append((kind, text)))
+    return result, records
+
+
+def encode_result(result):
+    """
+    serialise a result once, by value (pickle protocol 5), instead of returning it as a netref
+    whose every access is a round trip:
+    ("rtas-value", bytes) for results up to max_inline_result bytes
+    ("rtas-file", path, size) for larger ones, written to a file on this host (fetch it with fetch_file)
+    """
+    data = pickle.dumps(result, protocol=5)
+    service_stats.add_bytes(bytes_out=len(data))
+    if len(data) > max_result:
+        raise ValueError(f"result of {len(data)} bytes exceeds the limit of {max_result} bytes")
+    if len(data) <= max_inline_result:
+        return ("rtas-value", data)
+    os.makedirs(results_dir, exist_ok=True)
+    result_path = os.path.abspath(os.path.join(results_dir, f"{uuid.uuid4().hex}.pickle"))
+    with open(f"{result_path}.part", "wb") as fh:
+        fh.write(data)
+    os.replace(f"{result_path}.part", result_path)
+    return ("rtas-file", result_path, len(data))
+
+
+def memo_key(module_name, action_func, args, kwargs):
+    """
+    key of a memoised call: content digest of the uploaded module, function name and the
+    pickled arguments (without the rtas_* control kwargs). None if the module was not uploaded.
+    """
+    source = module_sources.get(module_name.split(".")[0])
+    if source is None:
+        return None
+    call_kwargs = sorted((key, value) for key, value in localize(kwargs).items() if not key.startswith("rtas_"))
+    payload = pickle.dumps((module_name, action_func, localize(args), call_kwargs), protocol=5)
+    return hashlib.sha256(source[2].encode() + payload).hexdigest()
+
+
+def memo_path(key):
+    return os.path.join(memo_dir, f"{key}.pickle")
+
+
+def action_pool(func, kwargs):
+    """
+    where to run an action: kwargs['rtas_pool'] per call, else the action's rtas_pool attribute
+    (e.g. `checksum.rtas_pool = "process"` in the action module), else "inline"
+    """
+    return kwargs.get("rtas_pool") or getattr(func, "rtas_pool", "inline")
+
+
+def run_action(module_name, action_func, args, kwargs, progress=None):
+    """
+    run the action on the calling thread ("inline") or in the process pool ("process"),
+    for cpu bound actions to use all cores. a pooled action gets its args by value (pickled),
+    its records are reported once it completes, and its exceptions are raised here as usual.
+    kwargs['rtas_result']="value" returns the result serialised (see encode_result)
+    kwargs['rtas_memo']=True (or an rtas_memo attribute on the action) memoises the result on disk,
+    keyed by memo_key; a later call with the same key returns the stored result without running the action
+    """
+    call_id = service_stats.call_started(f"{module_name}.{action_func}")
+    try:
+        result = _run_action_memo(module_name, action_func, args, kwargs, progress)
+    except Exception as e:
+        service_stats.call_finished(call_id, failed=True)
+        raise e
+    service_stats.call_finished(call_id)
+
+    if kwargs.get("rtas_result") == "value":
+        return encode_result(result)
+    return result
+
+
+def _run_action_memo(module_name, action_func, args, kwargs, progress=None):
+    call_kwargs = {key: value for key, value in kwargs.items() if key not in ("rtas_result", "rtas_memo")}
+    key = None
+    if kwargs.get("rtas_memo") or getattr(resolve_action(module_name, action_func), "rtas_memo", False):
+        key = memo_key(module_name, action_func, args, call_kwargs)
+
+    if key and os.path.isfile(memo_path(key)):
+        with open(memo_path(key), "rb") as fh:
+            result = pickle.load(fh)
+        logger.debug(f"RTAS-memo-hit: {module_name}.{action_func}")
+    else:
+        result = _run_action(module_name, action_func, args, call_kwargs, progress)
+        if key:
+            try:
+                data = pickle.dumps(result, protocol=5)
+            except Exception as e:
+                logger.info(f"RTAS-memo-skip: result of {module_name}.{action_func} not memoised: {e}")
+            else:
+                os.makedirs(memo_dir, exist_ok=True)
+                with open(f"{memo_path(key)}.part", "wb") as fh:
+                    fh.write(data)
+                os.replace(f"{memo_path(key)}.part", memo_path(key))
+    return result
+
+
+def _run_action(module_name, action_func, args, kwargs, progress=None):
+    func = resolve_action(module_name, action_func)
+    pool = action_pool(func, kwargs)
+    kwargs = {key: value for key, value in kwargs.items() if key != "rtas_pool"}
+    if pool != "process":
+        return call_action(func, args, kwargs, progress)
+
+    source = module_sources[module_name.split(".")[0]]
+    future = get_process_pool().submit(pool_worker, module_name, source, action_func,
+                                       localize(args), localize(kwargs))
+    result, records = future.result()
+    if progress is not None:
+        for kind, text in records:
+            progress(kind, text)
+    return result
+
+
+class JobTable:
+    """
+    background remote actions (jobs), for actions that outlast an rpc timeout.
+
+    each job is recorded in <jobs_dir>/<job_id>.json and the record is rewritten on every state change:
+    queued -> running -> done | failed | cancelled
+    the table is reloaded on service start; jobs that were queued or running in a previous service process are marked lost.
+
+    a job waits for a slot of action_slots, like exec_action. cancel drops a queued job;
+    a running job can only stop itself: if its function takes a cancel_event argument,
+    a threading.Event is passed and set on cancel (not for jobs run in the process pool).
+
+    records reported by a job (see call_action) are appended to <jobs_dir>/<job_id>.log;
+    the last progress record is kept in the job record (saved at most every progress_save_interval).
+    """
+    FINAL_STATES = ("done", "failed", "cancelled", "lost")
+
+    def __init__(self, jobs_dir="rtas_jobs"):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.records = {}
+        # job_id -> result object, kept in memory (the json record has it only if json serialisable)
+        self.results = {}
+        self.cancel_events = {}
+        self.cond = threading.Condition()
+        for record_path in self.jobs_dir.glob("*.json"):
+            try:
+                record = json.loads(record_path.read_text())
+            except ValueError:
+                continue
+            if record["state"] not in self.FINAL_STATES:
+                record["state"] = "lost"
+                record["error"] = "service restarted while the job was pending"
+                self._save(record)
+            self.records[record["job_id"]] = record
+
+    def _save(self, record):
+        record_path = self.jobs_dir/f"{record['job_id']}.json"
+        tmp_path = self.jobs_dir/f"{record['job_id']}.json.tmp"
+        tmp_path.write_text(json.dumps(record, default=repr))
+        os.replace(tmp_path, record_path)
+
+    def _update(self, job_id, save=True, **fields):
+        with self.cond:
+            record = self.records[job_id]
+            record.update(fields)
+            if save:
+                self._save(record)
+            self.cond.notify_all()
+
+    def submit(self, module_name, action_func, args, kwargs):
+        func = resolve_action(module_name, action_func)
+        job_id = uuid.uuid4().hex
+        cancel_event = threading.Event()
+        if "cancel_event" in inspect.signature(func).parameters and action_pool(func, kwargs) != "process":
+            kwargs = dict(kwargs, cancel_event=cancel_event)
+        with self.cond:
+            self.cancel_events[job_id] = cancel_event
+            self.records[job_id] = {"job_id": job_id,
+                                    "action": f"{module_name}.{action_func}",
+                                    "args": repr(args),
+                                    "state": "queued",
+                                    "submitted": time.time(),
+                                    "started": None,
+                                    "finished": None,
+                                    "result": None,
+                                    "error": None,
+                                    "progress": None
+                                    }
+            self._save(self.records[job_id])
+        threading.Thread(target=self._run, args=(job_id, module_name, action_func, args, kwargs), daemon=True).start()
+        return job_id
+
+    def _run(self, job_id, module_name, action_func, args, kwargs):
+        with action_slots:
+            with self.cond:
+                if self.records[job_id]["state"] == "cancelled":
+                    return
+            self._update(job_id, state="running", started=time.time())
+            last_save = [time.monotonic()]
+            def progress(kind, text):
+                with (self.jobs_dir/f"{job_id}.log").open("a") as fh:
+                    fh.write(text if kind == "output" else f"{text}\n")
+                if kind == "progress":
+                    # status() sees every record; the json record on disk lags by up to progress_save_interval
+                    save = time.monotonic() - last_save[0] >= progress_save_interval
+                    if save:
+                        last_save[0] = time.monotonic()
+                    self._update(job_id, save=save, progress=text)
+
+            try:
+                result = run_action(module_name, action_func, args, kwargs, progress)
+            except Exception as e:
+                self._update(job_id, state="failed", finished=time.time(), error=f"{type(e).__name__}: {e}")
+                return
+            self.results[job_id] = result
+            state = "cancelled" if self.cancel_events[job_id].is_set() else "done"
+            self._update(job_id, state=state, finished=time.time(), result=result)
+
+    def status(self, job_id):
+        """
+        (job_id, state, result, error, last progress record)
+        """
+        with self.cond:
+            if job_id not in self.records:
+                raise KeyError(f"unknown job {job_id}")
+            record = self.records[job_id]
+            return (job_id, record["state"], self.results.get(job_id, record["result"]), record["error"],
+                    record.get("progress"))
+
+    def wait(self, job_ids, timeout=None):
+        """
+        wait until all job_ids are final or timeout seconds passed; returns their status
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while not all(self.records[job_id]["state"] in self.FINAL_STATES for job_id in job_ids):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+        return tuple(self.status(job_id) for job_id in job_ids)
+
+    def cancel(self, job_id):
+        with self.cond:
+            record = self.records[job_id]
+            if record["state"] == "queued":
+                record.update(state="cancelled", finished=time.time())
+                self._save(record)
+                self.cond.notify_all()
+            elif record["state"] == "running":
+                self.cancel_events[job_id].set()
+            return record["state"]
+
+    def num_pending(self):
+        with self.cond:
+            return sum(1 for record in self.records.values() if record["state"] not in self.FINAL_STATES)
+
+
+# set in __main__
+job_table = None
+
+
 class ExecutionService(rpyc.Service):
+    """
+    one instance per connection; the server runs each connection in its own thread
+    """
     def __init__(self):
         pass
 
@@ -11,64 +585,305 @@ class ExecutionService(rpyc.Service):
         # (to init the service, if needed)
         print("client connected")
         self.conn = conn
+        with service_stats.lock:
+            service_stats.connections += 1
         pass
 
     def on_disconnect(self, conn):
         print("client disconnected")
+        with service_stats.lock:
+            service_stats.connections -= 1
         # code that runs after the connection has already closed
         # (to finalize the service, if needed)
         pass
 
-    def exposed_copy_local_file(self, client_localpath, remotepath):
-        # ask client to open file and read out the contents in chunk
-        with Path(remotepath).open("wb") as fh:
-            for buf in self.conn.root.file_reader(client_localpath):
-                fh.write(buf)
-            
-        pass
+    def exposed_copy_local_file(self, client_localpath, remotepath,
+                                chunk_size=BULK_CHUNK,
+                                window=BULK_WINDOW,
+                                compress=None):
+        """
+        pull a file from the client. chunks are requested with async rpcs, window of them in flight,
+        so the copy is not bound by one round trip per chunk.
+        compress: None, "zlib" or "zstd" (needs zstandard on both sides; the client sends a chunk
+                  uncompressed if it can't compress it)
+        """
+        if not hasattr(self.conn.root, "read_chunk"):
+            # client without bulk transfer: ask client to open file and read out the contents in chunk
+            with Path(remotepath).open("wb") as fh:
+                for buf in self.conn.root.file_reader(client_localpath):
+                    fh.write(buf)
+            return
+
+        if compress == "zstd" and zstandard is None:
+            compress = None
+        file_size = self.conn.root.file_size(client_localpath)
+        read_chunk = rpyc.async_(self.conn.root.read_chunk)
+        part_path = Path(f"{remotepath}.rtas-part")
+        try:
+            with part_path.open("wb") as fh:
+                in_flight = deque()
+                offsets = iter(range(0, file_size, chunk_size))
+                for offset in offsets:
+                    in_flight.append(read_chunk(client_localpath, offset, chunk_size, compress))
+                    if len(in_flight) >= window:
+                        break
+                while in_flight:
+                    codec, data = in_flight.popleft().value
+                    service_stats.add_bytes(bytes_in=len(data))
+                    fh.write(decompress_chunk(codec, data))
+                    offset = next(offsets, None)
+                    if offset is not None:
+                        in_flight.append(read_chunk(client_localpath, offset, chunk_size, compress))
+        finally:
+            self.conn.root.release_file(client_localpath)
+        os.replace(part_path, remotepath)
     
-    def exposed_upload_module(self, client_local_path, module_name):
+    def exposed_upload_module(self, client_local_path, module_name, digest=None):
         """
-        
+        digest: sha256 of the module file. if the loaded module has that digest nothing is done;
+                if the file on disk has it, the module is imported without copying it again.
+        returns False if the module was already loaded
         """
         if isinstance(client_local_path, Path):
             print("This is a path instance")
-        self.exposed_copy_local_file(client_local_path, f"{module_name}.py")
-        spec = importlib.util.spec_from_file_location(module_name, f"{module_name}.py")
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        sys.modules[module_name] = module
+        with module_lock:
+            if digest and loaded_digests.get(module_name) == digest and module_name in sys.modules:
+                logger.debug(f"RTAS-module-unchanged: {module_name} already loaded")
+                return False
+            module_path = os.path.abspath(f"{module_name}.py")
+            if not (digest and os.path.isfile(module_path) and file_digest(module_path) == digest):
+                self.exposed_copy_local_file(client_local_path, module_path)
+            import_module_file(module_name, module_path)
+            loaded_digests[module_name] = digest
+            module_sources[module_name] = ("file", module_path, digest or file_digest(module_path))
         print ("module loaded successfully")
-        pass
+        return True
+
+    def exposed_upload_package(self, client_local_path, package_name, digest=None):
+        """
+        upload a package as a zip (sources and bytecode, see setup_remote.build_package_zip; a zipapp works too)
+        and import it through zipimport. the zip stays in the service workdir as <package_name>.zip.
+        digest: content digest computed by the client; same meaning as for upload_module
+        returns False if the package was already loaded
+        """
+        with module_lock:
+            if digest and loaded_digests.get(package_name) == digest and package_name in sys.modules:
+                logger.debug(f"RTAS-package-unchanged: {package_name} already loaded")
+                return False
+            zip_path = os.path.abspath(f"{package_name}.zip")
+            digest_path = f"{zip_path}.sha256"
+            if not (digest and os.path.isfile(zip_path) and os.path.isfile(digest_path)
+                    and Path(digest_path).read_text() == digest):
+                self.exposed_copy_local_file(client_local_path, zip_path)
+                localize_bytecode(zip_path)
+                Path(digest_path).write_text(digest or "")
+
+            import_package_zip(package_name, zip_path)
+            loaded_digests[package_name] = digest
+            module_sources[package_name] = ("zip", zip_path, digest or file_digest(zip_path))
+        print ("package loaded successfully")
+        return True
     
             
     def exposed_exec_action(self, module_name, action_func, *args, **kwargs):
-        if module_name not in sys.modules:
-            raise ValueError(f"Module '{module_name}' is not loaded.")
-
-        module = sys.modules[module_name]
-
-        # Check if the function exists in the module
-        if not hasattr(module, action_func):
-            raise AttributeError(f"Function '{action_func}' not found in module '{module_name}'.")
-
-        # Retrieve the function
-        func = getattr(module, action_func)
-
-        # Ensure it's callable
-        if not callable(func):
-            raise TypeError(f"'{action_func}' in module '{module_name}' is not callable.")
-
+        """
+        kwargs['rtas_pool']: "process" to run the action in the process pool (see run_action)
+        """
         # Call the function with provided arguments
         try: 
-            return func(*args, **kwargs)
+            with action_slots:
+                return run_action(module_name, action_func, args, kwargs)
         except Exception as e:
             raise e
     
         pass
+
+    def exposed_exec_action_stream(self, callback, module_name, action_func, *args, **kwargs):
+        """
+        same as exec_action; records reported by the action are sent to callback(kind, text) as they arrive.
+        callbacks are async (no round trip per record) and arrive before the result.
+        """
+        callback = rpyc.async_(callback)
+        with action_slots:
+            return run_action(module_name, action_func, args, kwargs, callback)
+
+    def exposed_exec_actions(self, module_name, calls, parallel=False, stop_on_error=True):
+        """
+        run many actions of a module in one rpc.
+        calls: sequence of (action_func, args, kwargs items); kwargs as items, so the whole batch goes by value
+        parallel: run the calls on threads (each still takes a slot of action_slots); else in order,
+                  and calls after the first error are skipped unless stop_on_error is False
+        returns per call (status, result or error message, duration); status is ok, error or skipped
+        """
+        def run_one(call):
+            action_func, args, kwargs = call
+            start = time.monotonic()
+            try:
+                with action_slots:
+                    result = run_action(module_name, action_func, tuple(args), dict(kwargs))
+                return ("ok", result, time.monotonic() - start)
+            except Exception as e:
+                return ("error", f"{type(e).__name__}: {e}", time.monotonic() - start)
+
+        calls = tuple(calls)
+        if parallel:
+            with ThreadPoolExecutor(max_workers=max(len(calls), 1)) as executor:
+                return tuple(executor.map(run_one, calls))
+
+        replies = []
+        for call in calls:
+            if stop_on_error and replies and replies[-1][0] != "ok":
+                replies.append(("skipped", None, 0.0))
+                continue
+            replies.append(run_one(call))
+        return tuple(replies)
+
+    def exposed_stats(self):
+        """
+        the service counters (see ServiceStats) as a json string
+        """
+        return json.dumps(service_stats.report())
+
+    def exposed_service_info(self):
+        """
+        handshake of a controller that finds the service already running: json of the digest of
+        the service source, the launch settings, the pid and whether the pidfile names this process
+        """
+        try:
+            with open(pidfile) as fh:
+                pidfile_ok = int(fh.read().strip()) == os.getpid()
+        except (OSError, ValueError):
+            pidfile_ok = False
+        return json.dumps({"digest": service_digest,
+                           "settings": service_settings,
+                           "pid": os.getpid(),
+                           "pidfile_ok": pidfile_ok,
+                           "uptime_seconds": time.time() - service_stats.start_time
+                           })
+
+    def exposed_memo_lookup(self, module_name, action_func, args, kwargs_items):
+        """
+        True if the call has a memoised result (see run_action); does not run the action
+        """
+        key = memo_key(module_name, action_func, tuple(args), dict(kwargs_items))
+        return bool(key) and os.path.isfile(memo_path(key))
+
+    def exposed_memo_clear(self):
+        for memo_file in Path(memo_dir).glob("*.pickle"):
+            memo_file.unlink()
+
+    def exposed_submit_job(self, module_name, action_func, *args, **kwargs):
+        """
+        run the action in the background; returns the job id.
+        args should be plain values: the job may outlive this connection.
+        """
+        return job_table.submit(module_name, action_func, args, kwargs)
+
+    def exposed_poll_job(self, job_id):
+        return job_table.status(job_id)
+
+    def exposed_wait_jobs(self, job_ids, timeout=None):
+        return job_table.wait(tuple(job_ids), timeout)
+
+    def exposed_cancel_job(self, job_id):
+        return job_table.cancel(job_id)
+
+    def exposed_list_jobs(self):
+        return tuple(job_table.records)
+
+
+def signal_ready(server):
+    """
+    listen, then publish pid and bound port in the ready file (atomically)
+    """
+    server.listener.listen(socket.SOMAXCONN)
+    port = server.listener.getsockname()[1]
+    with open(f"{ready_file}.part", "w") as fh:
+        fh.write(f"{os.getpid()} {port}\n")
+    os.replace(f"{ready_file}.part", ready_file)
+    logger.info(f"RTAS-service-ready: pid {os.getpid()} port {port}")
+
+
+def clear_ready():
+    try:
+        with open(ready_file) as fh:
+            if int(fh.read().split()[0]) != os.getpid():
+                return
+        os.unlink(ready_file)
+    except (OSError, ValueError, IndexError):
+        pass
+
+
+def exit_when_idle(server, idle_timeout):
+    """
+    close the server once it had no client (and no pending job) for idle_timeout seconds
+    """
+    idle_since = time.monotonic()
+    while True:
+        time.sleep(1)
+        if server.clients or job_table.num_pending():
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since > idle_timeout:
+            logger.info("RTAS-service-idle: no clients, shutting down")
+            server.close()
+            return
+
+
 if __name__ == "__main__":
     from rpyc.utils.server import ThreadedServer, OneShotServer
-    server_handle = OneShotServer(ExecutionService(), port=int(sys.argv[1]))
-    server_handle.start()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("port", type=int)
+    parser.add_argument("--max-workers", type=int, default=8,
+                        help="max number of exec_action calls running at once")
+    parser.add_argument("--idle-timeout", type=int, default=300,
+                        help="exit after this many seconds without a client; 0 to run until killed")
+    parser.add_argument("--jobs-dir", default="rtas_jobs",
+                        help="where the job table is kept")
+    parser.add_argument("--pool-workers", type=int, default=os.cpu_count(),
+                        help="processes in the pool for actions run with rtas_pool='process'")
+    parser.add_argument("--pool-start-method", default="forkserver",
+                        help="multiprocessing start method of the pool (spawn if not available)")
+    parser.add_argument("--max-inline-result", type=int, default=max_inline_result,
+                        help="by value results larger than this (bytes) are spilled to a file")
+    parser.add_argument("--max-result", type=int, default=max_result,
+                        help="by value results larger than this (bytes) are refused")
+    parser.add_argument("--memo-dir", default=memo_dir,
+                        help="where memoised action results are kept")
+    parser.add_argument("--pidfile", default=pidfile,
+                        help="pidfile written by the launcher; service_info reports whether it names this process")
+    parser.add_argument("--ready-file", default=ready_file,
+                        help="written with the pid and bound port once the service listens")
+    parser.add_argument("--oneshot", action="store_true",
+                        help="serve a single connection and exit (the old behaviour)")
+    cmd_args = parser.parse_args()
+    # stdout/stderr go to the service log (see the launcher); rpyc's server logger writes there too
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+
+    action_slots = threading.BoundedSemaphore(cmd_args.max_workers)
+    job_table = JobTable(cmd_args.jobs_dir)
+    pool_workers = cmd_args.pool_workers
+    pool_start_method = cmd_args.pool_start_method
+    max_inline_result = cmd_args.max_inline_result
+    max_result = cmd_args.max_result
+    memo_dir = cmd_args.memo_dir
+    pidfile = cmd_args.pidfile
+    ready_file = cmd_args.ready_file
+    service_digest = file_digest(os.path.abspath(__file__))
+    service_settings = {"port": cmd_args.port, "max_workers": cmd_args.max_workers}
+    if cmd_args.oneshot:
+        server_handle = OneShotServer(ExecutionService(), port=cmd_args.port)
+    else:
+        # pass the class, not an instance: each connection gets its own service (and self.conn)
+        server_handle = ThreadedServer(ExecutionService, port=cmd_args.port)
+        if cmd_args.idle_timeout:
+            threading.Thread(target=exit_when_idle,
+                             args=(server_handle, cmd_args.idle_timeout),
+                             daemon=True).start()
+    # kill (the launcher of the next run) should not leave a ready file behind
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal_ready(server_handle)
+    try:
+        server_handle.start()
+    finally:
+        clear_ready()
     print("Shutting down proxy server")
-    
@@ -0,0 +1,233 @@
+"""
+bulk stat of remote files.
+
+patchwork exists() is one ssh exec per path. RemoteStatProbe collects all the remote paths
+of an rtas (ship_file targets, remote_step targets) at task generation time and
+resolves existence, size and mtime of all of them in a single ssh exec, the first time
+any of them is needed by an uptodate check.
+
+sha256 of remote file_deps is not bulk probed: a file_dep (e.g. a fetch_file source) may be
+regenerated by a remote_step earlier in the chain, after the first check ran. the hashes of a
+CachedRemoteFilesDep are taken when the dep is checked, in one exec for all its files.
+
+results are kept in remote_metadata_cache, keyed by (host, path), for the duration of the run
+(RTASRun clears it when a run starts; clear it yourself between runs of plain DoitMain in one process);
+tasks that write a remote path (ship_file, remote_step targets) invalidate its entry.
+"""
+import shlex
+import hashlib
+import threading
+import uuid
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteFileStat(NamedTuple):
+    path: str
+    exists: bool
+    size: int = None
+    mtime: int = None
+    sha256: str = None
+    # True if sha256 was asked for; sha256 stays None for non regular files
+    hashed: bool = False
+
+
+# per os_type: (stat cmd printing "size mtime", sha256 cmd printing the hex digest)
+stat_cmds = {
+    "openbsd": ("stat -f '%z %m'", "sha256 -q"),
+    "linux": ("stat -c '%s %Y'", "sha256sum | cut -d' ' -f1"),
+}
+
+
+def build_stat_script(paths, token, os_type, with_hash=False):
+    """
+    one line per path: '<token> <idx> -' if missing else '<token> <idx> <size> <mtime> [<sha256>]'
+    with_hash: True to hash all paths, or a collection of the paths to hash
+    """
+    stat_cmd, hash_cmd = stat_cmds.get(os_type, stat_cmds["openbsd"])
+    lines = []
+    for idx, path in enumerate(paths):
+        qpath = shlex.quote(str(path))
+        hash_part = ""
+        if with_hash is True or (with_hash and str(path) in with_hash):
+            hash_part = f" $(if [ -f {qpath} ]; then < {qpath} {hash_cmd}; else echo -; fi)"
+        lines.append(f"""if [ -e {qpath} ]; then echo "{token} {idx} $({stat_cmd} {qpath}){hash_part}"; else echo "{token} {idx} -"; fi""")
+    return "\n".join(lines) + "\n"
+
+
+def parse_stat_output(paths, token, stdout):
+    stats = {}
+    for line in stdout.splitlines():
+        fields = line.split()
+        if len(fields) < 3 or fields[0] != token:
+            continue
+        path = str(paths[int(fields[1])])
+        if fields[2] == "-":
+            stats[path] = RemoteFileStat(path, False)
+            continue
+        hashed = len(fields) > 4
+        sha256 = fields[4] if hashed and fields[4] != "-" else None
+        stats[path] = RemoteFileStat(path, True, int(fields[2]), int(fields[3]), sha256, hashed)
+    return stats
+
+
+def bulk_stat(fabric_conn, paths, os_type="openbsd", with_hash=False):
+    """
+    stat all paths in a single ssh exec; returns dict path -> RemoteFileStat
+    """
+    paths = [str(_) for _ in paths]
+    if not paths:
+        return {}
+    token = f"__rtas_{uuid.uuid4().hex}"
+    result = fabric_conn.run(build_stat_script(paths, token, os_type, with_hash=with_hash),
+                             hide=True,
+                             warn=True)
+    stats = parse_stat_output(paths, token, result.stdout)
+    # a path missing from the output (e.g. stat failed) is treated as not existing
+    return {path: stats.get(path, RemoteFileStat(path, False)) for path in paths}
+
+
+class RemoteMetadataCache:
+    """
+    run scoped cache of remote file metadata: (host, path) -> RemoteFileStat
+    """
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, host, path):
+        with self._lock:
+            return self.stats.get((host, str(path)))
+
+    def update(self, host, stats):
+        with self._lock:
+            for path, stat in stats.items():
+                self.stats[(host, path)] = stat
+
+    def invalidate(self, host, paths):
+        with self._lock:
+            for path in paths:
+                self.stats.pop((host, str(path)), None)
+
+    def clear(self):
+        with self._lock:
+            self.stats = {}
+
+
+remote_metadata_cache = RemoteMetadataCache()
+
+
+class RemoteStatProbe:
+    """
+    per rtas collection of remote paths, stat'ed together on first use.
+    conn and os_type are taken from the rtas when the probe runs (active user may change after task generation).
+    """
+    def __init__(self, rtas, cache=remote_metadata_cache):
+        self.rtas = rtas
+        self.cache = cache
+        # registered paths, in registration order
+        self.paths = {}
+        self._lock = threading.RLock()
+
+    @property
+    def host(self):
+        return self.rtas.active_conn.host
+
+    def register(self, paths):
+        with self._lock:
+            for path in paths:
+                self.paths[str(path)] = True
+
+    def probe(self):
+        """
+        stat, in one exec, all registered paths that are not in the cache
+        """
+        with self._lock:
+            paths = [path for path in self.paths
+                     if self.cache.get(self.host, path) is None
+                     ]
+            logger.debug(f"RTAS-stat-probe: {self.rtas.ipv6}: {len(paths)} paths")
+            self.cache.update(self.host,
+                              bulk_stat(self.rtas.active_conn,
+                                        paths,
+                                        os_type=self.rtas.os_type)
+                              )
+
+    def stat(self, path):
+        path = str(path)
+        with self._lock:
+            if self.cache.get(self.host, path) is None:
+                # not probed yet, or invalidated by a task that wrote it
+                self.register([path])
+                self.probe()
+            return self.cache.get(self.host, path)
+
+    def hash(self, paths):
+        """
+        stat and sha256, in one exec, paths as they are now (never from the cache); returns dict path -> RemoteFileStat
+        """
+        paths = [str(_) for _ in paths]
+        with self._lock:
+            stats = bulk_stat(self.rtas.active_conn,
+                              paths,
+                              os_type=self.rtas.os_type,
+                              with_hash=True)
+            self.cache.update(self.host, stats)
+            return stats
+
+    def invalidate(self, paths):
+        self.cache.invalidate(self.host, paths)
+
+
+def check_remote_files_exists_probe(probe, remote_targets):
+    """
+    uptodate checker: same as check_remote_files_exists, but reads from the rtas bulk stat probe
+    """
+    for _fs in remote_targets:
+        if not probe.stat(_fs).exists:
+            logger.info(
+                f"Path {_fs} does not exits")
+            return False
+
+    return True
+
+
+def invalidate_remote_paths(probe, remote_paths):
+    """
+    action: to be run after an action that writes remote_paths
+    """
+    probe.invalidate(remote_paths)
+    return True
+
+
+class CachedRemoteFilesDep:
+    """
+    uptodate checker for remote file_dep: the task is uptodate if the sha256 of
+    all remote files is the same as on the last successful run.
+    Like RemoteFilesDep, but all the files of the dep are hashed in one exec, when the dep is checked.
+    """
+    def __init__(self, probe, remote_files):
+        self.probe = probe
+        self.remote_files = [str(_) for _ in remote_files]
+        self.digests = None
+        # saved value of this dep; a task may have several (e.g. per host or per set of files)
+        paths_digest = hashlib.sha256("\n".join(sorted(self.remote_files)).encode()).hexdigest()[:16]
+        self.value_key = f"_remote_files_dep:{probe.rtas.ipv6}:{paths_digest}"
+
+    def configure_task(self, task):
+        task.value_savers.append(lambda: {self.value_key: self.digests})
+
+    def __call__(self, task, values):
+        stats = self.probe.hash(self.remote_files)
+        self.digests = {path: stats[path].sha256
+                        for path in self.remote_files
+                        }
+        last_success = values.get(self.value_key)
+        if last_success is None:
+            return False
+        return last_success == self.digests
+
+    def __repr__(self):
+        return f"CachedRemoteFilesDep({self.remote_files!r})"
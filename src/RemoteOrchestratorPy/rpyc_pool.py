@@ -0,0 +1,127 @@
+"""
+rpyc connections to the remote_execution_service of each host.
+
+rpyc serves the requests of one connection one at a time. the service runs each
+connection in its own thread, so remote actions of independent task chains on a host
+run concurrently as long as each call has a connection of its own. the pool hands out
+a free connection per call and opens new ones (channels of the pooled ssh transport)
+up to max_conns per host.
+"""
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class _HostConns:
+    def __init__(self, connect, max_conns):
+        self.connect = connect
+        self.max_conns = max_conns
+        self.free = queue.Queue()
+        self.all = []
+        self.lock = threading.Lock()
+
+
+class RPyCConnPool:
+    """
+    max_conns: max number of rpyc connections per host, unless given to register
+    """
+    def __init__(self, max_conns=4):
+        self.max_conns = max_conns
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def register(self, host, connect, conn=None, max_conns=None):
+        """
+        connect: callable returning a new rpyc conn to the host's service
+        conn: an already open conn, handed out first
+        max_conns: max number of conns to this host; match the service's worker count
+        a host registered again has its previous conns closed (except conn)
+        """
+        host_conns = _HostConns(connect, max_conns or self.max_conns)
+        if conn is not None:
+            host_conns.all.append(conn)
+            host_conns.free.put(conn)
+        with self._lock:
+            old_host_conns = self._hosts.get(host)
+            self._hosts[host] = host_conns
+        if old_host_conns is not None:
+            self._close_conns(old_host_conns, keep=conn)
+
+    def _acquire(self, host_conns):
+        while True:
+            try:
+                conn = host_conns.free.get_nowait()
+            except queue.Empty:
+                break
+            if not conn.closed:
+                return conn
+            self._drop(host_conns, conn)
+
+        with host_conns.lock:
+            can_open = len(host_conns.all) < host_conns.max_conns
+            if can_open:
+                # reserve the slot before connecting
+                host_conns.all.append(None)
+        if can_open:
+            try:
+                conn = host_conns.connect()
+            except Exception as e:
+                with host_conns.lock:
+                    host_conns.all.remove(None)
+                raise e
+            with host_conns.lock:
+                host_conns.all[host_conns.all.index(None)] = conn
+            logger.debug(f"RPYC-pool-connect: {len(host_conns.all)} conns")
+            return conn
+
+        conn = host_conns.free.get()
+        if conn.closed:
+            self._drop(host_conns, conn)
+            return self._acquire(host_conns)
+        return conn
+
+    def _drop(self, host_conns, conn):
+        with host_conns.lock:
+            if conn in host_conns.all:
+                host_conns.all.remove(conn)
+
+    @contextmanager
+    def checkout(self, host, default=None):
+        """
+        a free conn to host for the duration of one call.
+        yields default if the host is not registered.
+        """
+        host_conns = self._hosts.get(host)
+        if host_conns is None:
+            yield default
+            return
+        conn = self._acquire(host_conns)
+        try:
+            yield conn
+        finally:
+            # closed conns go back too; _acquire drops them and wakes a waiter to open a new one
+            host_conns.free.put(conn)
+
+    def close(self, host):
+        with self._lock:
+            host_conns = self._hosts.pop(host, None)
+        if host_conns is None:
+            return
+        self._close_conns(host_conns)
+
+    @staticmethod
+    def _close_conns(host_conns, keep=None):
+        for conn in list(host_conns.all):
+            if conn is not None and conn is not keep:
+                conn.close()
+
+    def close_all(self):
+        for host in list(self._hosts):
+            self.close(host)
+
+
+# the pool used by setup_remote and remote_exec_func
+rpyc_pool = RPyCConnPool()
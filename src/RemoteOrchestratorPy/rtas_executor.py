@@ -0,0 +1,129 @@
+"""
+run the task sequences of many rtas concurrently.
+
+rtas tasks hold live fabric connections, rpyc netrefs and per rtas flags (task_failed_abort_execution).
+None of these pickle, so doit's multiprocess runner (-n N -P process) cannot be used.
+RTASThreadRunner runs tasks on a pool of threads instead:
+- num_process is the concurrency limit, i.e., the max number of tasks (and hence hosts) in flight
+- ordering within a chain (local_step_pre -> ship_files -> remote_step -> fetch_files -> local_step_post)
+  is already enforced by task_dep
+- tasks of the same rtas (super and sub task sequences) are serialised via rtas.lock
+  so that per rtas state is never touched by two threads at once;
+  tasks with meta {'rtas_concurrent': True} (e.g. ship_file via a ShipEngine) are exempt.
+  the rtas of a task is meta['rtas'], set when the rtas yields its tasks
+
+rtas.lock and the action slots of the remote service (--max-workers): as a plain remote_step
+holds the lock for the whole exec_action call, the remote_step chains of one rtas run one
+action at a time from this controller, whatever max_workers is. to keep several slots of a
+host busy, submit the steps with detach=True: the lock is then held only for the submit, the
+jobs run side by side on the service and remote_wait_jobs collects them. slots are also
+shared by other controllers (and other rtas of the same host) connected to the service.
+
+usage:
+    DOIT_CONFIG = {'num_process': 32, 'par_type': 'thread'}
+    RTASDoitMain(ModuleTaskLoader(sys.modules[__name__])).run(sys.argv[1:])
+"""
+import sys
+import codecs
+import logging
+
+from doit.action import PythonAction
+from doit.control import TaskControl
+from doit.exceptions import InvalidCommand
+from doit.runner import Runner, MThreadRunner
+from doit.task import Stream
+from doit.cmd_run import Run
+from doit.doit_cmd import DoitMain
+
+from .setup_remote import close_reattach_conns
+from .remote_stat import remote_metadata_cache
+
+logger = logging.getLogger(__name__)
+
+
+class RTASThreadRunner(MThreadRunner):
+    """
+    thread pool runner that never runs two tasks of the same rtas at the same time
+    """
+
+    def execute_task(self, task):
+        meta = task.meta or {}
+        rtas = meta.get('rtas')
+        if rtas is None or meta.get('rtas_concurrent'):
+            return super().execute_task(task)
+
+        with rtas.lock:
+            logger.debug(f"RTAS-thread-exec: {rtas.ipv6}: {task.name}")
+            return super().execute_task(task)
+
+
+class RTASRun(Run):
+    """
+    doit run command that uses RTASThreadRunner for parallel execution.
+    par_type 'process' is not supported for rtas tasks; it falls back to threads.
+    _execute is doit's Run._execute (0.37) with the runner selection replaced.
+    """
+    name = "run"
+
+    # doit passes the options by the argument names of _execute; keep the signature of Run._execute
+    def _execute(self, outfile,
+                 verbosity=None, always=False, continue_=False,
+                 reporter='console', num_process=0, par_type='process',
+                 single=False, auto_delayed_regex=False, force_verbosity=False,
+                 failure_verbosity=0, pdb=False):
+        if num_process and par_type == 'process':
+            sys.stderr.write(
+                "WARNING: rtas tasks cannot be pickled, "
+                "running in parallel using threads.\n")
+            par_type = 'thread'
+        # remote file metadata is only valid for the run that stat'ed it
+        remote_metadata_cache.clear()
+
+        PythonAction.pm_pdb = pdb
+        # self.control is saved on instance to be used by 'auto' command
+        self.control = TaskControl(self.task_list, auto_delayed_regex=auto_delayed_regex)
+        self.control.process(self.sel_tasks)
+        if single:
+            for task_name in self.control.selected_tasks:
+                task = self.control.tasks[task_name]
+                if task.has_subtask:
+                    for sub_task_name in task.task_dep:
+                        self.control.tasks[sub_task_name].task_dep = []
+                else:
+                    task.task_dep = []
+
+        # reporter: name of a provided one, a user defined class, or an instance
+        reporter_cls = self.reporters[reporter] if isinstance(reporter, str) else reporter
+        if isinstance(outfile, str):
+            outstream = codecs.open(outfile, 'w', encoding='utf-8')
+        else:
+            outstream = outfile
+        self.outstream = outstream
+
+        try:
+            if isinstance(reporter_cls, type):
+                reporter_obj = reporter_cls(outstream, {'failure_verbosity': failure_verbosity})
+            else:
+                reporter_obj = reporter_cls
+            run_args = [self.dep_manager, reporter_obj, continue_, always,
+                        Stream(verbosity, force_verbosity)]
+            if num_process == 0:
+                runner = Runner(*run_args)
+            elif par_type == 'thread':
+                runner = RTASThreadRunner(*run_args, num_process)
+            else:
+                raise InvalidCommand(f"Invalid parallel type {par_type}")
+            return runner.run_all(self.control.task_dispatcher())
+        finally:
+            if isinstance(outfile, str):
+                outstream.close()
+            # service conns probed by launch_rpyc uptodate checks but never taken
+            close_reattach_conns()
+
+
+class RTASDoitMain(DoitMain):
+    """
+    DoitMain with the run command replaced by RTASRun
+    """
+    DOIT_CMDS = tuple(RTASRun if cmd_cls is Run else cmd_cls
+                      for cmd_cls in DoitMain.DOIT_CMDS)
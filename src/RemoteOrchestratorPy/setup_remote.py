@@ -1,16 +1,32 @@
-from plumbum import SshMachine
 import rpyc
+from rpyc.core.stream import SocketStream
 from rpyc.core.consts import STREAM_CHUNK
-from doit.tools import run_once
 from pathlib import Path
 from typing import NamedTuple
 # use to describe behaviour for ship and fetch file
 import tempfile
 import logging
+import json
+import mmap
+import zlib
+import hashlib
+import zipfile
+import py_compile
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
 import os
+import threading
+
+from .ssh_pool import ssh_pool
+from .rpyc_pool import rpyc_pool
+from .tunnels import tunnel_manager
+from .bootstrap import BootstrapSpec
+from .remote_execution_service import file_digest
 
 # Get the directory of the current file
 module_dir = os.path.dirname(os.path.abspath(__file__))
@@ -21,11 +37,24 @@ class FileConfig(NamedTuple):
     clean_local: bool = False
     clean_remote: bool = False
     target_path: str = None
+    # ship only the blocks that differ from the existing remote copy (see delta_transfer)
+    delta: bool = False
     
 
 service_port = 7777
+# concurrent exec_action calls on the remote service, and rpyc conns per host (see rpyc_pool)
+service_max_workers = 8
+# the service exits after this many seconds without a client; long enough to be reused by the next run
+service_idle_timeout = 3600
+# seconds the launcher waits for the service to listen (the ready file); rpyc_conn_lifecycle connects right after
+service_ready_timeout = 30
+# ipv6 -> rpyc conn to an already running service, opened by check_service_reusable;
+# taken over by rpyc_conn_lifecycle instead of connecting again
+reattach_conns = {}
 class ClientService(rpyc.Service):
     def __init__(self):
+        # local path -> (file, mmap) of files being pulled by the service (read_chunk)
+        self._mapped = {}
         pass
 
     def on_connect(self, conn):
@@ -52,9 +81,180 @@ class ClientService(rpyc.Service):
                 yield buf
 
         pass
+
+    def exposed_file_size(self, localpath):
+        return os.path.getsize(localpath)
+
+    def exposed_read_chunk(self, localpath, offset, size, compress=None):
+        """
+        (codec, bytes) of the file at [offset, offset + size); the service keeps several of these in flight.
+        the file is mmap'ed once and sliced per chunk, until release_file.
+        """
+        localpath = str(localpath)
+        if localpath not in self._mapped:
+            fh = open(localpath, "rb")
+            self._mapped[localpath] = (fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+        data = self._mapped[localpath][1][offset:offset + size]
+        if compress == "zstd" and zstandard is not None:
+            return ("zstd", zstandard.ZstdCompressor(level=3).compress(data))
+        if compress == "zlib":
+            return ("zlib", zlib.compress(data, 1))
+        return (None, data)
+
+    def exposed_release_file(self, localpath):
+        fh, mapped = self._mapped.pop(str(localpath), (None, None))
+        if fh:
+            mapped.close()
+            fh.close()
     pass
 
-        
+
+
+def package_files(package_dir):
+    """
+    (path, arcname) of the files of the package at package_dir that go into its zip
+    """
+    package_dir = Path(package_dir)
+    for path in sorted(package_dir.rglob("*")):
+        if not path.is_file() or "__pycache__" in path.parts or path.suffix == ".pyc":
+            continue
+        yield path, f"{package_dir.name}/{path.relative_to(package_dir).as_posix()}"
+
+
+def package_digest(package_dir):
+    """
+    digest of the package sources, used by the service to skip unchanged uploads
+    """
+    digest = hashlib.sha256()
+    for path, arcname in package_files(package_dir):
+        digest.update(arcname.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def build_package_zip(package_dir, zip_path):
+    """
+    zip the package at package_dir (sources and precompiled bytecode, importable by zipimport).
+    the zip is written to a temporary name and renamed in place, so readers never see a partial zip.
+    returns the package_digest.
+    """
+    digest = package_digest(package_dir)
+    part_path = f"{zip_path}.{os.getpid()}.{threading.get_ident()}.part"
+    with zipfile.ZipFile(part_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path, arcname in package_files(package_dir):
+            zf.write(path, arcname)
+            if path.suffix == ".py":
+                # zipimport loads mod.pyc next to mod.py; unchecked hash pycs skip the source mtime check
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    cfile = py_compile.compile(str(path), cfile=f"{tmp_dir}/{path.name}c", doraise=True,
+                                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+                    zf.write(cfile, f"{arcname}c")
+    os.replace(part_path, zip_path)
+    return digest
+
+
+def upload_remote_action_module(conn, remote_action_module, local_workdir):
+    """
+    upload remote_action_module to the service: a module as its .py file, a package as a zip.
+    the upload is skipped by the service if it already has the same content loaded.
+    """
+    # if remote_action is imported from nested module then its name is fully qualified 
+    remote_action_module_name = remote_action_module.__name__.split(".")[-1]
+    if hasattr(remote_action_module, "__path__"):
+        # content addressed: the services of all hosts read the same zip (read_chunk) while other
+        # setup chains upload; a zip once written is never rewritten
+        package_dir = remote_action_module.__path__[0]
+        digest = package_digest(package_dir)
+        zip_path = Path(f"{local_workdir}/{remote_action_module_name}-{digest[:16]}.zip")
+        if not zip_path.exists():
+            build_package_zip(package_dir, zip_path)
+        return conn.root.upload_package(zip_path, remote_action_module_name, digest)
+
+    localpath = Path(os.path.abspath(remote_action_module.__file__))
+    return conn.root.upload_module(localpath, remote_action_module_name, file_digest(localpath))
+
+
+def probe_service(connect, max_workers=service_max_workers):
+    """
+    rpyc conn to the service already running on the host, if it runs the same
+    remote_execution_service.py with the same settings and owns the pidfile; else None
+    """
+    try:
+        conn = connect()
+    except Exception as e:
+        # nothing listening on the service port
+        logger.debug(f"RTAS-service-probe: no service due to {e}")
+        return None
+    try:
+        info = json.loads(conn.root.service_info())
+    except Exception as e:
+        # a service without service_info predates the handshake
+        logger.debug(f"RTAS-service-probe: no handshake due to {e}")
+        conn.close()
+        return None
+
+    expected_digest = file_digest(f"{module_dir}/remote_execution_service.py")
+    if (info["digest"] != expected_digest
+        or not info["pidfile_ok"]
+        or info["settings"].get("max_workers") != max_workers):
+        logger.info(f"RTAS-service-probe: running service (pid {info['pid']}) does not match, relaunching")
+        conn.close()
+        return None
+    logger.info(f"RTAS-service-reattach: pid {info['pid']} up for {info['uptime_seconds']:.0f}s")
+    return conn
+
+
+def check_service_reusable(rtas, connect):
+    """
+    uptodate checker of the launch_rpyc step: True if a matching service is already running,
+    so doit skips the launch and rpyc_conn_lifecycle reattaches with the probed conn
+    """
+    # a conn probed earlier (a previous run in this process, or a launch that ran anyway) is stale
+    drop_reattach_conn(rtas)
+    conn = probe_service(connect)
+    if conn is None:
+        return False
+    reattach_conns[rtas.ipv6] = conn
+    return True
+
+
+def take_reattach_conn(rtas):
+    """
+    the conn probed by check_service_reusable, unless the service was relaunched since
+    """
+    conn = reattach_conns.pop(rtas.ipv6, None)
+    if conn is None:
+        return None
+    try:
+        # a relaunch (e.g. doit -a) killed the probed service; its channel is at eof
+        conn.poll()
+    except EOFError:
+        conn.close()
+        return None
+    if conn.closed:
+        return None
+    return conn
+
+
+def drop_reattach_conn(rtas):
+    """
+    close the conn probed for rtas, if it was not taken
+    """
+    conn = reattach_conns.pop(rtas.ipv6, None)
+    if conn is not None:
+        conn.close()
+
+
+def close_reattach_conns():
+    """
+    close all probed conns that were not taken, e.g. of hosts whose chain failed before
+    rpyc_conn_lifecycle; called at the end of a run (see rtas_executor)
+    """
+    while reattach_conns:
+        _, conn = reattach_conns.popitem()
+        conn.close()
+
+
 def init_connection(conn_resource_context):
     try:
         # Start the generator to initialize the resource
@@ -80,34 +280,21 @@ def setup_remote_debian(rtas,
                         remote_action_module,
                         remote_ssh_private_key,
                         local_port=18356,
+                        wheelhouse=None,
                         ):
     """
     remote_action_module: to be uploaded remotely
     remote_ssh_private_key: for passwordless connection between rpyc server (running on remote machine) and
                            local machine
     local_workdir: for temporary files .. we cannot use NamedTemporaryFile because it messes up task info etc.
+    local_port: no longer used; rpyc runs over a channel of the pooled ssh conn (see ssh_pool).
+                for a local endpoint of the service use tunnel_manager.open(fabric_conn, service_port)
+    wheelhouse: prebuilt bundle for the host's os, arch and python (see WheelhouseCache.bundle);
+                the venv is then installed with no network access
     
     
     """
 
-    remote_task_append = rtas.set_task_remote_step_iter()
-    remote_task_append(f"mkdir {remote_workdir}", "create_workdir", uptodate=[run_once]
-        )
-
-    # assume python is already installed 
-    # remote_task_append(f"doas pkg_add python-3.12.8p1", "install_python", uptodate=[run_once]
-    #     )
-
-    remote_task_append(f"cd {remote_workdir}; python3 -m venv venv", "create_python_venv", uptodate=[run_once]
-        )
-    # install rpyc
-    remote_task_append(f"cd {remote_workdir}; . ./venv/bin/activate; pip install rpyc wget", "install_modules", uptodate=[run_once]
-                       )
-
-    yield from rtas
-    
-    rtas.set_new_subtask_seq(id_args=["inner_rpyc"])
-
     launch_service_str = f"""
 #!/bin/bash
 
@@ -115,21 +302,44 @@ cd {remote_workdir}
     
 . ./venv/bin/activate; 
 
-# Run the command and check for errors
-nohup python3 remote_execution_service.py {service_port} > remote_execution_service.log 2>&1 & 
-pid=$!
-
-# Wait briefly to allow any immediate errors to surface
-sleep 1
-
-# Check if the process is still running
-if ! kill -0 $pid 2>/dev/null; then
-    echo -1  >&2  # Return -1 if the process failed to start
-    exit 1
+# the service outlives a client disconnect (until idle); stop the one of a previous run
+if [ -f remote_execution_service.pid ]; then
+    old_pid=$(cat remote_execution_service.pid)
+    kill $old_pid 2>/dev/null
+    # the port is free once it is gone
+    tries=0
+    while kill -0 $old_pid 2>/dev/null && [ $tries -lt 100 ]; do
+        tries=$((tries + 1))
+        sleep 0.05
+    done
 fi
 
-# Return the PID if the process is running
-echo $pid
+# the service writes "<pid> <port>" to the ready file once it listens
+rm -f remote_execution_service.ready
+
+# Run the command and check for errors
+nohup python3 remote_execution_service.py {service_port} --max-workers {service_max_workers} --idle-timeout {service_idle_timeout} > remote_execution_service.log 2>&1 & 
+pid=$!
+echo $pid > remote_execution_service.pid
+
+# Wait for the service to listen, or to fail
+tries=0
+while [ ! -f remote_execution_service.ready ]; do
+    if ! kill -0 $pid 2>/dev/null; then
+        echo -1  >&2  # Return -1 if the process failed to start
+        tail -n 20 remote_execution_service.log >&2
+        exit 1
+    fi
+    tries=$((tries + 1))
+    if [ $tries -gt {service_ready_timeout * 20} ]; then
+        echo "service not ready after {service_ready_timeout}s" >&2
+        exit 1
+    fi
+    sleep 0.05
+done
+
+# Return the PID and port of the ready service
+cat remote_execution_service.ready
 exit 0
     """
     
@@ -145,12 +355,24 @@ exit 0
 
     
     
-    # put a teardown task to remove the file
-    rtas.set_task_ship_files_iter([FileConfig(Path(f"{module_dir}/remote_execution_service.py"), False, False),
-                                   FileConfig(launch_rpyc_service_fp, False, False)
-                                   ],
-                                  Path(remote_workdir)
-                                  )
+    # workdir, venv, rpyc and the service files in one fingerprinted script; a no-op on an unchanged host
+    # assume python is already installed 
+    remote_task_append = rtas.set_task_remote_step_iter()
+    remote_task_append(BootstrapSpec(remote_workdir,
+                                     python="python3",
+                                     packages=("rpyc", "wget"),
+                                     files=(Path(f"{module_dir}/remote_execution_service.py"),
+                                            launch_rpyc_service_fp
+                                            ),
+                                     wheelhouse=wheelhouse
+                                     ),
+                       "bootstrap"
+                       )
+
+    yield from rtas
+
+    rtas.set_new_subtask_seq(id_args=["inner_rpyc"])
+
     # launch_service_fh<-- named temporary files
     # launch_service_fh.name<-- the temporary file path
     #.Path(launch_service_fh.name).name <-- basename 
@@ -167,37 +389,44 @@ exit 0
         task_label = f"{rtas.basename}:remote_step:launch_rpyc"
         # although server is started here.
         # it will get teardown when client disconnected
-        pass 
+        # the launch ran, so a conn probed by its uptodate check is to a killed service
+        drop_reattach_conn(rtas) 
 
     # remote_task_append(f"cd {remote_workdir}; . ./venv/bin/activate; {command}", "launch_rpyc", teardown=[(teardown, [rtas])]
     #     )
-    remote_task_append(f"cd {remote_workdir}; sh {launch_service_basename}", "launch_rpyc", teardown=[(teardown, [rtas])]
+    # rpyc runs over a channel of the pooled ssh conn; no separate ssh session or local port
+    fabric_conn = ssh_pool.get(rtas.ipv6, "adming",
+                               connect_kwargs={"key_filename": "/home/adming/.ssh/id_rsa"}
+                               )
+    def connect():
+        chan = ssh_pool.open_channel(fabric_conn, service_port)
+        return rpyc.utils.factory.connect_stream(SocketStream(chan),
+                                                 service=ClientService,
+                                                 config={"sync_request_timeout": 600}
+                                                 )
+
+    # skipped if the service of a previous run is still up and matches
+    remote_task_append(f"cd {remote_workdir}; sh {launch_service_basename}", "launch_rpyc", teardown=[(teardown, [rtas])],
+                       uptodate=[(check_service_reusable, [rtas, connect])]
                        )
 
     # connect to remote rpyc and upload remote module
     def rpyc_conn_lifecycle(rtas):
         try:
-            
-            with SshMachine(rtas.ipv6,
-                            user = "adming",
-                            keyfile="/home/adming/.ssh/id_rsa"
-                            ) as rem:
-                with rem.tunnel(local_port, service_port) as tunnel:
-                    conn = rpyc.connect("localhost",
-                                        local_port,
-                                        service=ClientService,
-                                        config={"sync_request_timeout": 600}
-                                        )
-                    localpath = Path(os.path.abspath(remote_action_module.__file__))
-                    
-                    # if remote_action is imported from nested module then its name is fully qualified 
-                    remote_action_module_name = remote_action_module.__name__.split(".")[-1]
-                    conn.root.upload_module(localpath, remote_action_module_name)
-                    rtas.rpyc_conn = conn
-                    yield
-                    pass
+            conn = take_reattach_conn(rtas) or connect()
+            try:
+                upload_remote_action_module(conn, remote_action_module, local_workdir)
+                rtas.rpyc_conn = conn
+                # further conns for concurrent remote actions; the module is already loaded in the service
+                rpyc_pool.register(rtas.ipv6, connect, conn, max_conns=service_max_workers)
+                yield
+            finally:
+                rpyc_pool.close(rtas.ipv6)
+                tunnel_manager.close(rtas.ipv6)
+                drop_reattach_conn(rtas)
+                conn.close()
         except Exception as e:
-            logger.error("tunneling failed: {e}")
+            logger.error(f"tunneling failed: {e}")
 
         return True
 
@@ -223,34 +452,19 @@ def setup_remote_openbsd(rtas,
                       remote_action_module,
                       remote_ssh_private_key,
                       local_port = 18356,
-                      
+                      wheelhouse=None,
                       ):
     """
     remote_action_module: to be uploaded remotely
     remote_ssh_private_key: for passwordless connection between rpyc server (running on remote machine) and
                            local machine
-    
+    local_port: no longer used; rpyc runs over a channel of the pooled ssh conn (see ssh_pool).
+                for a local endpoint of the service use tunnel_manager.open(fabric_conn, service_port)
+    wheelhouse: prebuilt bundle for the host's os, arch and python (see WheelhouseCache.bundle);
+                the venv is then installed with no network access
     
     """
 
-    remote_task_append = rtas.set_task_remote_step_iter()
-    remote_task_append(f"mkdir {remote_workdir}", "create_workdir", uptodate=[run_once]
-        )
-
-    remote_task_append(f"doas pkg_add python-3.12.8p1 wget", "install_python", uptodate=[run_once]
-        )
-
-    remote_task_append(f"cd {remote_workdir}; /usr/local/bin/python3 -m venv venv", "create_python_venv", uptodate=[run_once]
-        )
-    # install rpyc, wget
-    # TODO: faric reports failed
-    # remote_task_append(f"cd {remote_workdir}; . ./venv/bin/activate; pip install rpyc wget", "install_rpyc", uptodate=[run_once]
-    #                    )
-
-    yield from rtas
-    
-    rtas.set_new_subtask_seq(id_args=["inner"])
-
     launch_service_str = f"""
 #!/bin/bash
 
@@ -258,21 +472,44 @@ cd {remote_workdir}
     
 . ./venv/bin/activate; 
 
-# Run the command and check for errors
-nohup python3 remote_execution_service.py {service_port} > remote_execution_service.log 2>&1 & 
-pid=$!
-
-# Wait briefly to allow any immediate errors to surface
-sleep 1
-
-# Check if the process is still running
-if ! kill -0 $pid 2>/dev/null; then
-    echo -1  >&2  # Return -1 if the process failed to start
-    exit 1
+# the service outlives a client disconnect (until idle); stop the one of a previous run
+if [ -f remote_execution_service.pid ]; then
+    old_pid=$(cat remote_execution_service.pid)
+    kill $old_pid 2>/dev/null
+    # the port is free once it is gone
+    tries=0
+    while kill -0 $old_pid 2>/dev/null && [ $tries -lt 100 ]; do
+        tries=$((tries + 1))
+        sleep 0.05
+    done
 fi
 
-# Return the PID if the process is running
-echo $pid
+# the service writes "<pid> <port>" to the ready file once it listens
+rm -f remote_execution_service.ready
+
+# Run the command and check for errors
+nohup python3 remote_execution_service.py {service_port} --max-workers {service_max_workers} --idle-timeout {service_idle_timeout} > remote_execution_service.log 2>&1 & 
+pid=$!
+echo $pid > remote_execution_service.pid
+
+# Wait for the service to listen, or to fail
+tries=0
+while [ ! -f remote_execution_service.ready ]; do
+    if ! kill -0 $pid 2>/dev/null; then
+        echo -1  >&2  # Return -1 if the process failed to start
+        tail -n 20 remote_execution_service.log >&2
+        exit 1
+    fi
+    tries=$((tries + 1))
+    if [ $tries -gt {service_ready_timeout * 20} ]; then
+        echo "service not ready after {service_ready_timeout}s" >&2
+        exit 1
+    fi
+    sleep 0.05
+done
+
+# Return the PID and port of the ready service
+cat remote_execution_service.ready
 exit 0
     """
 
@@ -285,12 +522,24 @@ exit 0
         launch_service_fh.flush()
 
     
-    # put a teardown task to remove the file
-    rtas.set_task_ship_files_iter([FileConfig(Path(f"{module_dir}/remote_execution_service.py"), False, False),
-                                   FileConfig(launch_rpyc_service_fp, False, False)
-                                   ],
-                                  Path(remote_workdir)
-                                  )
+    # workdir, python, venv, rpyc and the service files in one fingerprinted script; a no-op on an unchanged host
+    remote_task_append = rtas.set_task_remote_step_iter()
+    remote_task_append(BootstrapSpec(remote_workdir,
+                                     python="/usr/local/bin/python3",
+                                     packages=("rpyc", "wget"),
+                                     system_install="doas pkg_add python-3.12.8p1 wget",
+                                     files=(Path(f"{module_dir}/remote_execution_service.py"),
+                                            launch_rpyc_service_fp
+                                            ),
+                                     wheelhouse=wheelhouse
+                                     ),
+                       "bootstrap"
+                       )
+
+    yield from rtas
+
+    rtas.set_new_subtask_seq(id_args=["inner"])
+
     # launch_service_fh<-- named temporary files
     # launch_service_fh.name<-- the temporary file path
     #.Path(launch_service_fh.name).name <-- basename 
@@ -306,27 +555,37 @@ exit 0
         task_label = f"{rtas.basename}:remote_step:launch_rpyc"
         # although server is started here.
         # it will get teardown when client disconnected
-        pass
-    remote_task_append(f"cd {remote_workdir}; sh {launch_service_basename}", "launch_rpyc", teardown=[(teardown, [rtas])]
+        # the launch ran, so a conn probed by its uptodate check is to a killed service
+        drop_reattach_conn(rtas)
+    fabric_conn = ssh_pool.get(rtas.ipv6, "adming",
+                               connect_kwargs={"key_filename": "/home/adming/.ssh/id_rsa"}
+                               )
+    def connect():
+        chan = ssh_pool.open_channel(fabric_conn, service_port)
+        return rpyc.utils.factory.connect_stream(SocketStream(chan),
+                                                 service=ClientService
+                                                 )
+
+    # skipped if the service of a previous run is still up and matches
+    remote_task_append(f"cd {remote_workdir}; sh {launch_service_basename}", "launch_rpyc", teardown=[(teardown, [rtas])],
+                       uptodate=[(check_service_reusable, [rtas, connect])]
                        )
 
     # connect to remote rpyc and upload remote module
     def rpyc_conn_lifecycle(rtas):
         try: 
-            with SshMachine(rtas.ipv6,
-                            user = "adming",
-                            keyfile="/home/adming/.ssh/id_rsa"
-                            ) as rem:
-                with rem.tunnel(local_port, service_port):
-                    conn = rpyc.connect("localhost",
-                                        local_port,
-                                        service=ClientService
-                                        )
-                    localpath = Path(os.path.abspath(remote_action_module.__file__))
-                    remote_action_module_name = remote_action_module.__name__.split(".")[-1]
-                    conn.root.upload_module(localpath, remote_action_module_name)
-                    rtas.rpyc_conn  = conn
-                    yield
+            conn = take_reattach_conn(rtas) or connect()
+            try:
+                upload_remote_action_module(conn, remote_action_module, local_workdir)
+                rtas.rpyc_conn  = conn
+                # further conns for concurrent remote actions; the module is already loaded in the service
+                rpyc_pool.register(rtas.ipv6, connect, conn, max_conns=service_max_workers)
+                yield
+            finally:
+                rpyc_pool.close(rtas.ipv6)
+                tunnel_manager.close(rtas.ipv6)
+                drop_reattach_conn(rtas)
+                conn.close()
         except Exception as e:
             logger.error(f"tunneling failed: {e}")
         return True
@@ -0,0 +1,258 @@
+"""
+pipelined, multi-channel sftp upload for ship_files.
+
+fabric put is one sftp channel per call; the remote channel window (2MB on OpenSSH) caps the
+bytes in flight, so on long RTT links a single put uses a small fraction of the bandwidth.
+ShipEngine keeps a set of sftp channels open on the pooled ssh transport:
+- writes are pipelined, i.e., many write requests are in flight per channel
+- ship_file tasks of a group run concurrently (with RTASThreadRunner), each on its own channel
+- a large file is split in ranges that are written in parallel over all free channels
+
+files are written to a temporary name and renamed in place once complete.
+
+ship_files_bundle is the alternative for many small files: all files of a ship group
+go as one tar stream over a single exec channel and are unpacked remotely in place.
+"""
+import os
+import tarfile
+import threading
+import logging
+
+import paramiko
+
+from .ssh_pool import ssh_pool
+
+logger = logging.getLogger(__name__)
+
+# paramiko splits writes in requests of this size
+CHUNK_SIZE = paramiko.SFTPFile.MAX_REQUEST_SIZE
+
+
+class ShipEngine:
+    """
+    num_channels: max number of sftp channels opened on the transport
+    window_size: local window for each sftp channel (passed to paramiko open_session)
+    split_threshold: files larger than this (in bytes) are written over several channels in parallel
+    """
+    def __init__(self, fabric_conn,
+                 num_channels=4,
+                 window_size=None,
+                 split_threshold=64 * 2**20):
+        self.fabric_conn = fabric_conn
+        self.num_channels = num_channels
+        self.window_size = window_size
+        self.split_threshold = split_threshold
+        # idle channels; every release notifies, so a waiter can take the channel or,
+        # after a broken release, open a new one in its place
+        self._free = []
+        self._num_open = 0
+        self._cond = threading.Condition()
+
+    def _open_sftp(self):
+        transport = ssh_pool.ensure_open(self.fabric_conn)
+        return paramiko.SFTPClient.from_transport(transport, window_size=self.window_size)
+
+    def _acquire(self, block=True):
+        """
+        get a free sftp channel; open a new one if below num_channels.
+        returns None if block is False and no channel is available.
+        """
+        with self._cond:
+            while True:
+                if self._free:
+                    return self._free.pop()
+                if self._num_open < self.num_channels:
+                    self._num_open += 1
+                    break
+                if not block:
+                    return None
+                self._cond.wait()
+
+        try:
+            return self._open_sftp()
+        except Exception as e:
+            with self._cond:
+                self._num_open -= 1
+                self._cond.notify()
+            raise e
+
+    def _release(self, sftp, broken=False):
+        with self._cond:
+            if broken:
+                # do not hand out a channel that failed mid transfer; its slot is free for a new one
+                self._num_open -= 1
+            else:
+                self._free.append(sftp)
+            self._cond.notify()
+        if broken:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+
+    def _write_range(self, sftp, local_path, remote_path, offset, length):
+        with open(local_path, "rb") as lfh, sftp.open(remote_path, "r+b") as rfh:
+            rfh.set_pipelined(True)
+            lfh.seek(offset)
+            rfh.seek(offset)
+            remaining = length
+            while remaining:
+                buf = lfh.read(min(CHUNK_SIZE, remaining))
+                if not buf:
+                    break
+                rfh.write(buf)
+                remaining -= len(buf)
+
+    def put(self, local_path, remote_path):
+        local_path = str(local_path)
+        remote_path = str(remote_path)
+        part_path = f"{remote_path}.rtas-part"
+        file_size = os.path.getsize(local_path)
+
+        sftp = self._acquire()
+        extra = []
+        # channels whose own write failed, and those errors; the other channels go back to the free list
+        broken = []
+        errors = []
+        try:
+            # create/truncate the part file; all ranges are written into it
+            with sftp.open(part_path, "wb") as rfh:
+                rfh.truncate(file_size)
+
+            if file_size > self.split_threshold:
+                # use as many channels as are free right now; never wait for more
+                while len(extra) + 1 < self.num_channels:
+                    _sftp = self._acquire(block=False)
+                    if _sftp is None:
+                        break
+                    extra.append(_sftp)
+
+            channels = [sftp, *extra]
+            range_size = -(-file_size // len(channels))
+
+            def write(_sftp, offset):
+                try:
+                    self._write_range(_sftp, local_path, part_path, offset,
+                                      min(range_size, file_size - offset))
+                except Exception as e:
+                    errors.append(e)
+                    broken.append(_sftp)
+
+            threads = [threading.Thread(target=write, args=(_sftp, idx * range_size))
+                       for idx, _sftp in enumerate(channels)
+                       if idx * range_size < file_size
+                       ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if errors:
+                raise errors[0]
+
+            remote_stat = sftp.stat(part_path)
+            if remote_stat.st_size != file_size:
+                raise IOError(f"size mismatch in put! {remote_stat.st_size} != {file_size}")
+            # same as fabric put(preserve_mode=True)
+            sftp.chmod(part_path, os.stat(local_path).st_mode & 0o7777)
+            sftp.posix_rename(part_path, remote_path)
+            logger.debug(f"FILE-ship: {local_path} -> {remote_path} over {len(channels)} channels")
+
+        except Exception as e:
+            if not any(e is _ for _ in errors):
+                # failed outside the range writes, on the primary channel
+                broken.append(sftp)
+            for _sftp in [sftp, *extra]:
+                self._release(_sftp, broken=any(_sftp is _ for _ in broken))
+            raise e
+
+        self._release(sftp)
+        for _sftp in extra:
+            self._release(_sftp)
+
+    def close(self):
+        with self._cond:
+            free, self._free = self._free, []
+            self._num_open -= len(free)
+            self._cond.notify_all()
+        for sftp in free:
+            sftp.close()
+
+
+def ship_file_pipelined(ship_engine,
+                        file_to_ship,
+                        dest_path
+                        ):
+    """
+    same as ship_file, but via a ShipEngine
+    """
+    try:
+        ship_engine.put(file_to_ship, dest_path)
+    except Exception as e:
+        logger.debug(f"FILE-ship-FAILURE: {file_to_ship} due to {e}")
+        raise e
+
+
+class _ChannelWriter:
+    """
+    file like write end of an exec channel, for tarfile stream mode
+    """
+    def __init__(self, chan):
+        self.chan = chan
+
+    def write(self, buf):
+        self.chan.sendall(buf)
+        return len(buf)
+
+
+def ship_files_bundle(fabric_conn,
+                      probe,
+                      entries,
+                      compress=False,
+                      changed=None
+                      ):
+    """
+    ship (local_path, remote_path) entries as one tar stream, unpacked on the remote with
+    each member at its remote_path (tar -P keeps absolute paths; relative paths are relative to the ssh login dir).
+    only entries whose local file changed (changed: set by doit) or whose remote copy is missing (probe) are sent.
+    """
+    changed = None if changed is None else {str(_) for _ in changed}
+    to_ship = [(local_path, remote_path) for local_path, remote_path in entries
+               if changed is None
+               or str(local_path) in changed
+               or not probe.stat(remote_path).exists
+               ]
+    if not to_ship:
+        return True
+
+    tar_flags = "-xpPzf" if compress else "-xpPf"
+    transport = ssh_pool.ensure_open(fabric_conn)
+    chan = transport.open_session()
+    try:
+        chan.exec_command(f"tar {tar_flags} -")
+        with tarfile.open(fileobj=_ChannelWriter(chan),
+                          mode="w|gz" if compress else "w|",
+                          format=tarfile.PAX_FORMAT) as tar:
+            for local_path, remote_path in to_ship:
+                tarinfo = tar.gettarinfo(str(local_path))
+                # gettarinfo strips leading '/' from arcname; member must land at remote_path as is
+                tarinfo.name = str(remote_path)
+                tarinfo.uname = tarinfo.gname = ""
+                with open(local_path, "rb") as lfh:
+                    tar.addfile(tarinfo, lfh)
+        chan.shutdown_write()
+
+        stderr = b""
+        while True:
+            buf = chan.recv_stderr(32768)
+            if not buf:
+                break
+            stderr += buf
+        exit_status = chan.recv_exit_status()
+    finally:
+        chan.close()
+
+    if exit_status != 0:
+        logger.debug(f"FILE-ship-bundle-FAILURE: {[str(_) for _, __ in to_ship]} due to {stderr}")
+        raise IOError(f"remote tar exited with {exit_status}: {stderr.decode(errors='replace').strip()}")
+    logger.debug(f"FILE-ship-bundle: {len(to_ship)} files in one tar stream")
+    return True
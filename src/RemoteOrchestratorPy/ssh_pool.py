@@ -0,0 +1,97 @@
+"""
+one ssh connection per (host, user), shared by all the ssh users of the package:
+- fabric run/put/get (remote_exec_cmd, ship_file, fetch_file)
+- patchwork exists (check_remote_files_exists), which runs over the fabric conn
+- rpyc, which runs over a direct-tcpip channel of the same transport
+  instead of a separate plumbum SshMachine + tunnel
+
+paramiko multiplexes channels over a transport, so exec, sftp and rpyc channels
+can be opened concurrently over the one handshake.
+"""
+import threading
+import logging
+
+import paramiko
+from fabric import Connection
+from plumbum.machines.paramiko_machine import SocketCompatibleChannel
+
+logger = logging.getLogger(__name__)
+
+
+class SSHConnectionPool:
+    """
+    keepalive: seconds between ssh keepalive packets on the pooled transports
+    """
+    def __init__(self, keepalive=30):
+        self.keepalive = keepalive
+        self._conns = {}
+        self._lock = threading.Lock()
+
+    def add(self, fabric_conn):
+        """
+        register a fabric conn with the pool.
+        returns the pooled conn for (host, user) -- which is fabric_conn unless
+        one was already registered
+        """
+        key = (fabric_conn.host, fabric_conn.user)
+        with self._lock:
+            if key not in self._conns:
+                self._conns[key] = fabric_conn
+            return self._conns[key]
+
+    def get(self, host, user, **kwargs):
+        """
+        return the pooled conn for (host, user); create one if missing.
+        kwargs are passed to fabric Connection (e.g. config, connect_kwargs)
+        """
+        with self._lock:
+            if (host, user) not in self._conns:
+                self._conns[(host, user)] = Connection(host=host, user=user, **kwargs)
+            return self._conns[(host, user)]
+
+    def ensure_open(self, fabric_conn):
+        """
+        (re)open the conn if the transport is down and set keepalive.
+        fabric already reopens dead conns for run/put/get; this is for users of the raw transport.
+        """
+        with self._lock:
+            if not fabric_conn.is_connected:
+                logger.info(f"SSH-pool-connect: {fabric_conn.user}@{fabric_conn.host}")
+                fabric_conn.close()
+                fabric_conn.open()
+            fabric_conn.transport.set_keepalive(self.keepalive)
+        return fabric_conn.transport
+
+    def open_channel(self, fabric_conn, remote_port, remote_host="localhost"):
+        """
+        open a direct-tcpip channel to remote_host:remote_port as seen from the remote machine.
+        the returned channel behaves like a socket (can be wrapped in rpyc SocketStream).
+        reconnects once if the transport turns out to be dead.
+        """
+        fabric_conn = self.add(fabric_conn)
+        for attempt in range(2):
+            transport = self.ensure_open(fabric_conn)
+            try:
+                chan = transport.open_channel("direct-tcpip",
+                                              (remote_host, remote_port),
+                                              ("127.0.0.1", 0)
+                                              )
+                return SocketCompatibleChannel(chan)
+            except paramiko.ChannelException as e:
+                # the transport is fine; nothing listens on remote_port
+                raise e
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                if attempt:
+                    raise e
+                logger.info(f"SSH-pool-reconnect: {fabric_conn.user}@{fabric_conn.host} due to {e}")
+                fabric_conn.close()
+
+    def close_all(self):
+        with self._lock:
+            for fabric_conn in self._conns.values():
+                fabric_conn.close()
+            self._conns = {}
+
+
+# the pool used by rtas and setup_remote
+ssh_pool = SSHConnectionPool()
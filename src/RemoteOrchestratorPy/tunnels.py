@@ -0,0 +1,332 @@
+"""
+local endpoints for remote ports, over the pooled ssh transports.
+
+rpyc of the package itself runs over direct-tcpip channels (see ssh_pool) and needs no
+local port. the TunnelManager is for everything that wants a socket address instead:
+other processes, rpyc.connect / unix_connect, dashboards. each tunnel listens on an
+ephemeral 127.0.0.1 port or a unix socket (in a private dir) and forwards every
+accepted connection over a new channel of the host's pooled transport.
+
+    tunnel = tunnel_manager.open(fabric_conn, service_port, kind="unix")
+    conn = rpyc_connect(tunnel)
+
+a registry keyed by (host, remote port, kind) hands out the existing tunnel on repeated opens.
+all tunnels are served by one selector thread, so hundreds of them cost a few fds each
+(two per forwarded connection plus the pipe paramiko keeps per channel), not threads.
+nothing blocks that thread: both ends of a forwarded connection are non-blocking, what one end
+can not take yet is buffered (up to PUMP_BUFFER per direction, then the other end is not read).
+a local socket is watched for EVENT_WRITE while bytes for it are pending; a channel has no
+writable fd, so pending bytes for channels are retried every FLUSH_INTERVAL.
+"""
+import os
+import re
+import socket
+import tempfile
+import threading
+import selectors
+import logging
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+
+import rpyc
+
+from .ssh_pool import ssh_pool
+
+logger = logging.getLogger(__name__)
+
+PUMP_CHUNK = 1 << 16
+PUMP_BUFFER = 1 << 20
+FLUSH_INTERVAL = 0.02
+
+
+class Tunnel(NamedTuple):
+    host: str
+    remote_port: int
+    # "tcp" or "unix"
+    kind: str
+    # ("127.0.0.1", port) for tcp, socket path for unix
+    endpoint: object
+
+
+class _TunnelState:
+    def __init__(self, tunnel, fabric_conn, listener):
+        self.tunnel = tunnel
+        self.fabric_conn = fabric_conn
+        self.listener = listener
+        # _Pair of the forwarded connections
+        self.pairs = set()
+
+
+class _Pair:
+    """
+    a forwarded connection: local sock <-> channel, with the bytes not yet written in each direction
+    """
+    def __init__(self, sock, chan):
+        self.sock = sock
+        self.chan = chan
+        self.to_sock = bytearray()
+        self.to_chan = bytearray()
+        # an end at eof is not read anymore; the pair closes once the bytes it sent are written
+        self.sock_eof = False
+        self.chan_eof = False
+
+
+class TunnelManager:
+    """
+    socket_dir: where unix sockets are created; a private temp dir by default
+    """
+    def __init__(self, socket_dir=None):
+        self.socket_dir = socket_dir
+        self._tunnels = {}
+        self._lock = threading.Lock()
+        self._selector = None
+        self._calls = []
+        self._wakeup = None
+        # pair -> state of the pairs with bytes pending for the channel
+        self._stalled = {}
+        # opening a channel takes a round trip; done off the selector thread
+        self._connector = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rtas-tunnel")
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._selector is not None:
+                return
+            self._selector = selectors.DefaultSelector()
+            self._wakeup = socket.socketpair()
+            self._wakeup[0].setblocking(False)
+            self._selector.register(self._wakeup[0], selectors.EVENT_READ, self._on_wakeup)
+            threading.Thread(target=self._loop, name="rtas-tunnels", daemon=True).start()
+
+    def _call_soon(self, func, *args):
+        """
+        run func on the selector thread; the selector is only touched from there
+        """
+        with self._lock:
+            self._calls.append((func, args))
+        self._wakeup[1].send(b"x")
+
+    def _loop(self):
+        while True:
+            for key, events in self._selector.select(FLUSH_INTERVAL if self._stalled else None):
+                try:
+                    key.data(key.fileobj, events)
+                except Exception as e:
+                    logger.debug(f"TUNNEL-loop: {e}")
+            for pair, state in list(self._stalled.items()):
+                self._pump(state, pair, 0)
+
+    def _on_wakeup(self, sock, events):
+        try:
+            sock.recv(4096)
+        except BlockingIOError:
+            pass
+        with self._lock:
+            calls, self._calls = self._calls, []
+        for func, args in calls:
+            func(*args)
+
+    def _socket_path(self, host, remote_port):
+        if self.socket_dir is None:
+            self.socket_dir = tempfile.mkdtemp(prefix="rtas_tunnels_")
+        return os.path.join(self.socket_dir, f"{re.sub(r'[^A-Za-z0-9.-]', '_', host)}-{remote_port}.sock")
+
+    def open(self, fabric_conn, remote_port, kind="tcp"):
+        """
+        the tunnel to remote_port on fabric_conn's host (as seen from that host); opened on first use
+        """
+        assert kind in ("tcp", "unix")
+        key = (fabric_conn.host, remote_port, kind)
+        with self._lock:
+            if key in self._tunnels:
+                return self._tunnels[key].tunnel
+
+        if kind == "tcp":
+            listener = socket.create_server(("127.0.0.1", 0), backlog=128)
+            endpoint = listener.getsockname()[:2]
+        else:
+            endpoint = self._socket_path(fabric_conn.host, remote_port)
+            if os.path.exists(endpoint):
+                os.unlink(endpoint)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(endpoint)
+            listener.listen(128)
+        listener.setblocking(False)
+
+        state = _TunnelState(Tunnel(fabric_conn.host, remote_port, kind, endpoint), fabric_conn, listener)
+        with self._lock:
+            if key in self._tunnels:
+                # lost a race with another open of the same tunnel
+                listener.close()
+                return self._tunnels[key].tunnel
+            self._tunnels[key] = state
+        self._ensure_loop()
+        self._call_soon(self._selector.register, listener, selectors.EVENT_READ,
+                        lambda sock, events: self._on_accept(state))
+        logger.info(f"TUNNEL-open: {fabric_conn.host}:{remote_port} at {endpoint}")
+        return state.tunnel
+
+    def _on_accept(self, state):
+        try:
+            sock, _ = state.listener.accept()
+        except BlockingIOError:
+            return
+        self._connector.submit(self._connect, state, sock)
+
+    def _connect(self, state, sock):
+        try:
+            chan = ssh_pool.open_channel(state.fabric_conn, state.tunnel.remote_port)
+        except Exception as e:
+            logger.info(f"TUNNEL-connect-FAILURE: {state.tunnel.host}:{state.tunnel.remote_port} due to {e}")
+            sock.close()
+            return
+        self._call_soon(self._add_pair, state, sock, chan)
+
+    def _add_pair(self, state, sock, chan):
+        with self._lock:
+            registered = self._tunnels.get(state.tunnel[:3]) is state
+        if not registered:
+            # the tunnel was closed while the channel was being opened
+            sock.close()
+            chan.close()
+            return
+        sock.setblocking(False)
+        chan.settimeout(0.0)
+        pair = _Pair(sock, chan)
+        state.pairs.add(pair)
+        self._selector.register(sock, selectors.EVENT_READ,
+                                lambda src, events: self._pump(state, pair, events))
+        self._selector.register(chan, selectors.EVENT_READ,
+                                lambda src, events: self._pump(state, pair, events, chan_events=events))
+
+    def _pump(self, state, pair, sock_events, chan_events=0):
+        """
+        move what can be moved without blocking, then update what the selector watches for the pair
+        """
+        try:
+            if chan_events & selectors.EVENT_READ:
+                try:
+                    buf = pair.chan.recv(PUMP_CHUNK)
+                    pair.to_sock += buf
+                    pair.chan_eof = not buf
+                except socket.timeout:
+                    pass
+            if sock_events & selectors.EVENT_READ:
+                try:
+                    buf = pair.sock.recv(PUMP_CHUNK)
+                    pair.to_chan += buf
+                    pair.sock_eof = not buf
+                except BlockingIOError:
+                    pass
+            if pair.to_sock:
+                try:
+                    del pair.to_sock[:pair.sock.send(pair.to_sock)]
+                except BlockingIOError:
+                    pass
+            if pair.to_chan:
+                try:
+                    del pair.to_chan[:pair.chan.send(pair.to_chan)]
+                except socket.timeout:
+                    # channel window full
+                    pass
+        except OSError as e:
+            logger.debug(f"TUNNEL-pump: {state.tunnel.host}:{state.tunnel.remote_port} due to {e}")
+            self._close_pair(state, pair)
+            return
+
+        if (pair.sock_eof and not pair.to_chan) or (pair.chan_eof and not pair.to_sock):
+            self._close_pair(state, pair)
+            return
+        sock_watch = 0
+        if not pair.sock_eof and len(pair.to_chan) < PUMP_BUFFER:
+            sock_watch |= selectors.EVENT_READ
+        if pair.to_sock:
+            sock_watch |= selectors.EVENT_WRITE
+        chan_watch = 0
+        if not pair.chan_eof and len(pair.to_sock) < PUMP_BUFFER:
+            chan_watch = selectors.EVENT_READ
+        self._watch(pair.sock, sock_watch, lambda src, events: self._pump(state, pair, events))
+        self._watch(pair.chan, chan_watch, lambda src, events: self._pump(state, pair, 0, chan_events=events))
+        if pair.to_chan:
+            self._stalled[pair] = state
+        else:
+            self._stalled.pop(pair, None)
+
+    def _watch(self, end, events, callback):
+        try:
+            key = self._selector.get_key(end)
+        except KeyError:
+            key = None
+        if not events:
+            if key is not None:
+                self._selector.unregister(end)
+        elif key is None:
+            self._selector.register(end, events, callback)
+        elif key.events != events:
+            self._selector.modify(end, events, callback)
+
+    def _close_pair(self, state, pair):
+        if pair not in state.pairs:
+            return
+        state.pairs.discard(pair)
+        self._stalled.pop(pair, None)
+        for end in (pair.sock, pair.chan):
+            try:
+                self._selector.unregister(end)
+            except (KeyError, ValueError):
+                pass
+            end.close()
+
+    def _close_tunnel(self, state):
+        for pair in list(state.pairs):
+            self._close_pair(state, pair)
+        try:
+            self._selector.unregister(state.listener)
+        except (KeyError, ValueError):
+            pass
+        state.listener.close()
+        if state.tunnel.kind == "unix" and os.path.exists(state.tunnel.endpoint):
+            os.unlink(state.tunnel.endpoint)
+
+    def get(self, host, remote_port, kind="tcp"):
+        state = self._tunnels.get((host, remote_port, kind))
+        return state.tunnel if state else None
+
+    def tunnels(self):
+        """
+        the registry: all open tunnels
+        """
+        with self._lock:
+            return [state.tunnel for state in self._tunnels.values()]
+
+    def close(self, host, remote_port=None):
+        """
+        close the tunnels of host (only the ones to remote_port, if given) and their connections
+        """
+        with self._lock:
+            keys = [key for key in self._tunnels
+                    if key[0] == host and remote_port in (None, key[1])
+                    ]
+            states = [self._tunnels.pop(key) for key in keys]
+        for state in states:
+            logger.info(f"TUNNEL-close: {state.tunnel.host}:{state.tunnel.remote_port} at {state.tunnel.endpoint}")
+            if self._selector is None:
+                state.listener.close()
+            else:
+                self._call_soon(self._close_tunnel, state)
+
+    def close_all(self):
+        for host in {key[0] for key in list(self._tunnels)}:
+            self.close(host)
+
+
+def rpyc_connect(tunnel, service=rpyc.VoidService, config={}):
+    """
+    rpyc conn to the remote service behind tunnel
+    """
+    if tunnel.kind == "unix":
+        return rpyc.utils.factory.unix_connect(tunnel.endpoint, service=service, config=config)
+    return rpyc.connect(*tunnel.endpoint, service=service, config=config)
+
+
+# the manager used by setup_remote
+tunnel_manager = TunnelManager()
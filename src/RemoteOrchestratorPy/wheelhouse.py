@@ -0,0 +1,140 @@
+"""
+prebuilt wheelhouse bundles for offline installs of the remote venv (see bootstrap).
+
+a bundle is a tar.gz of wheels for one (os_type, arch, python version, package set),
+built once on the controller and kept in cache_dir:
+
+    cache = WheelhouseCache("~/.cache/rtas_wheelhouse")
+    bundle = cache.bundle(rtas.os_type, "x86_64", "3.11", ("rpyc", "wget"))
+    BootstrapSpec(remote_workdir, packages=("rpyc", "wget"), wheelhouse=bundle)
+
+the bootstrap uploads the bundle only to hosts that miss packages and do not have it yet,
+and installs with pip --no-index, i.e., the hosts need no access to PyPI.
+
+building: binary wheels for the target platform are fetched with pip download --platform
+(linux only, manylinux tags); packages that ship only an sdist are built with pip wheel on
+the controller, which only works for pure python packages (or a controller of the same
+os/arch/python as the target).
+"""
+import os
+import re
+import shlex
+import shutil
+import tarfile
+import hashlib
+import tempfile
+import threading
+import subprocess
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+manylinux_tags = {
+    "x86_64": ["manylinux2014_x86_64", "manylinux_2_28_x86_64"],
+    "aarch64": ["manylinux2014_aarch64", "manylinux_2_28_aarch64"],
+}
+# os_type (as in RTAS.os_type) -> arch -> pip platform tags;
+# os types without binary wheels on PyPI get pure wheels only
+platform_tags = {
+    "linux": manylinux_tags,
+    "debian": manylinux_tags,
+}
+# os_type -> os.uname().sysname.lower() of a host running it
+uname_os = {"debian": "linux"}
+
+
+def _wheel_is_pure(wheel_name):
+    # name-version(-build)?-python-abi-platform.whl
+    return wheel_name.endswith("-none-any.whl")
+
+
+class WheelhouseCache:
+    """
+    cache_dir: local dir holding the bundles
+    python: controller interpreter used to run pip
+    """
+    def __init__(self, cache_dir, python="python3"):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.python = python
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def bundle_path(self, os_type, arch, python_version, packages):
+        packages_digest = hashlib.sha256(" ".join(sorted(packages)).encode()).hexdigest()[:16]
+        return self.cache_dir/f"{os_type}-{arch}-py{python_version}-{packages_digest}.tar.gz"
+
+    def _pip(self, *args):
+        cmd = [self.python, "-m", "pip", *args]
+        logger.debug(f"WHEELHOUSE-pip: {shlex.join(cmd)}")
+        return subprocess.run(cmd, capture_output=True, text=True)
+
+    def _download(self, wheel_dir, os_type, arch, python_version, packages):
+        """
+        binary wheels for the target platform; False if some package has no matching wheel
+        """
+        tags = platform_tags.get(os_type, {}).get(arch)
+        if not tags:
+            return False
+        result = self._pip("download", "--dest", str(wheel_dir),
+                           "--only-binary=:all:",
+                           "--implementation", "cp",
+                           "--python-version", python_version,
+                           *[arg for tag in tags for arg in ("--platform", tag)],
+                           *packages)
+        if result.returncode != 0:
+            logger.info(f"WHEELHOUSE-download-FAILURE: {os_type}/{arch}/py{python_version}: {result.stderr.strip()[-500:]}")
+            return False
+        return True
+
+    def _build(self, wheel_dir, packages):
+        result = self._pip("wheel", "--wheel-dir", str(wheel_dir), *packages)
+        if result.returncode != 0:
+            raise RuntimeError(f"pip wheel failed for {packages}: {result.stderr.strip()[-500:]}")
+        impure = [path.name for path in wheel_dir.glob("*.whl") if not _wheel_is_pure(path.name)]
+        if impure:
+            logger.info(f"WHEELHOUSE-build: platform specific wheels built on the controller: {impure}")
+        return impure
+
+    def build(self, os_type, arch, python_version, packages):
+        bundle_path = self.bundle_path(os_type, arch, python_version, packages)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.cache_dir) as tmp_dir:
+            wheel_dir = Path(tmp_dir)/"wheels"
+            wheel_dir.mkdir()
+            if not self._download(wheel_dir, os_type, arch, python_version, packages):
+                for path in wheel_dir.glob("*"):
+                    path.unlink()
+                impure = self._build(wheel_dir, packages)
+                controller_py = subprocess.run([self.python, "-c", "import sys; print('%d.%d' % sys.version_info[:2])"],
+                                               capture_output=True, text=True).stdout.strip()
+                controller_os = os.uname().sysname.lower()
+                if impure and (uname_os.get(os_type, os_type) != controller_os
+                               or os.uname().machine != arch
+                               or controller_py != python_version):
+                    raise RuntimeError(f"no {os_type}/{arch}/py{python_version} wheels for {impure}; "
+                                       f"build the wheelhouse on a matching host")
+
+            part_path = f"{bundle_path}.part"
+            with tarfile.open(part_path, "w:gz") as tar:
+                for path in sorted(wheel_dir.glob("*.whl")):
+                    tar.add(path, arcname=path.name)
+            os.replace(part_path, bundle_path)
+        logger.info(f"WHEELHOUSE-build: {bundle_path}")
+        return bundle_path
+
+    def bundle(self, os_type, arch, python_version, packages):
+        """
+        path of the cached bundle; built on first use
+        """
+        python_version = re.match(r"\d+\.\d+", str(python_version)).group(0)
+        bundle_path = self.bundle_path(os_type, arch, python_version, packages)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(bundle_path, threading.Lock())
+        with key_lock:
+            if not bundle_path.exists():
+                self.build(os_type, arch, python_version, packages)
+        return bundle_path
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
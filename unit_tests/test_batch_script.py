@@ -0,0 +1,78 @@
+"""
+batched remote commands: the framed script run locally with sh, then split back per command
+"""
+import uuid
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+from doit_extntools import RemoteCommandError
+
+from RemoteOrchestratorPy.doit_rtas import remote_exec_cmd, remote_exec_cmd_batch
+from RemoteOrchestratorPy.doit_rtas_helpers import build_batch_script, parse_batch_output
+
+CMDS = ["echo one", "printf 'two\\nlines'; echo err >&2", "exit 3", "echo four"]
+
+
+def run_local(cmdstrs, stop_on_error=True):
+    token = f"__rtas_{uuid.uuid4().hex}"
+    script = build_batch_script(cmdstrs, token, stop_on_error=stop_on_error)
+    result = subprocess.run(["sh", "-s"], input=script, capture_output=True, text=True, timeout=30)
+    return parse_batch_output(cmdstrs, token, result.stdout, result.stderr)
+
+
+def test_stops_at_first_failure():
+    results = run_local(CMDS)
+    assert [result.cmdstr for result in results] == CMDS[:3]
+    assert [result.exit_code for result in results] == [0, 0, 3]
+    assert results[0].stdout == "one\n"
+    assert results[1].stdout == "two\nlines"
+    assert results[1].stderr == "err\n"
+    assert results[0].stderr == ""
+    assert all(result.duration >= 0 for result in results)
+
+
+def test_continue_on_error():
+    results = run_local(CMDS, stop_on_error=False)
+    assert [result.exit_code for result in results] == [0, 0, 3, 0]
+    assert results[3].stdout == "four\n"
+
+
+def test_commands_run_in_subshells():
+    results = run_local(["cd /; x=1", "pwd; echo \"x=$x\""])
+    assert results[1].stdout != "/\n"
+    assert results[1].stdout.endswith("x=\n")
+
+
+def test_output_of_other_runs_is_ignored():
+    stdout = "__rtas_other begin 0\nnoise\n__rtas_other end 0 0 1 2\n"
+    assert parse_batch_output(["echo"], "__rtas_mine", stdout, "") == []
+
+
+class LocalConn:
+    def run(self, script, hide=True, warn=False):
+        return subprocess.run(["sh", "-s"], input=script, capture_output=True, text=True, timeout=30)
+
+
+def make_rtas():
+    return SimpleNamespace(ipv6="unit-test-host", active_conn=LocalConn(), remote_task_results={})
+
+
+@pytest.mark.parametrize("exec_cmd", [remote_exec_cmd, remote_exec_cmd_batch])
+def test_command_fails_by_exit_code_not_stderr(exec_cmd):
+    rtas = make_rtas()
+    assert exec_cmd(rtas, "t:remote_step:a", "echo warning >&2; echo done") is True
+    status, (cmd_result,) = rtas.remote_task_results["t:remote_step:a"]
+    assert status == "Success"
+    assert (cmd_result.stdout, cmd_result.stderr) == ("done\n", "warning\n")
+
+    with pytest.raises(RemoteCommandError):
+        exec_cmd(rtas, "t:remote_step:b", "exit 2")
+    assert rtas.remote_task_results["t:remote_step:b"][0] == "Error"
+
+
+def test_single_command_path_keeps_every_result():
+    rtas = make_rtas()
+    assert remote_exec_cmd(rtas, "t:remote_step:a", "echo one", "echo two") is True
+    _, cmd_results = rtas.remote_task_results["t:remote_step:a"]
+    assert [cmd_result.stdout for cmd_result in cmd_results] == ["one\n", "two\n"]
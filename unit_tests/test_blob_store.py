@@ -0,0 +1,127 @@
+"""
+RemoteBlobStore hit, miss and evict, with the store scripts run by the local sh
+"""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from RemoteOrchestratorPy.blob_store import RemoteBlobStore
+
+
+class Result:
+    def __init__(self, proc):
+        self.stdout = proc.stdout
+        self.stderr = proc.stderr
+
+
+class LocalConn:
+    host = "localhost"
+
+    def __init__(self):
+        self.puts = []
+
+    def run(self, script, hide=True, warn=False):
+        proc = subprocess.run(["sh", "-c", script], capture_output=True, text=True)
+        if proc.returncode and not warn:
+            raise IOError(proc.stderr)
+        return Result(proc)
+
+    def put(self, local_path, remote_path):
+        self.puts.append(remote_path)
+        shutil.copyfile(local_path, remote_path)
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    return tmp_path/"store"
+
+
+def make_file(tmp_path, name, size, fill=b"x"):
+    path = tmp_path/name
+    path.write_bytes(fill * size)
+    return path
+
+
+@pytest.mark.parametrize("link_mode", ["reflink", "copy", "hardlink"])
+def test_miss_uploads_once_then_hits(tmp_path, store_dir, link_mode):
+    conn = LocalConn()
+    store = RemoteBlobStore(store_dir, link_mode=link_mode)
+    local_file = make_file(tmp_path, "artifact", 1000)
+    store.ship(conn, local_file, tmp_path/"target-a")
+    store.ship(conn, local_file, tmp_path/"target-b")
+    assert len(conn.puts) == 1
+    for name in ("target-a", "target-b"):
+        assert (tmp_path/name).read_bytes() == local_file.read_bytes()
+    digest = store.local_digest(local_file)
+    assert (store_dir/".lru"/digest).exists()
+    assert not list(store_dir.glob("*.part"))
+
+
+def test_default_mode_keeps_blob_apart_from_target(tmp_path, store_dir):
+    conn = LocalConn()
+    store = RemoteBlobStore(store_dir)
+    local_file = make_file(tmp_path, "artifact", 1000)
+    store.ship(conn, local_file, tmp_path/"target")
+    (tmp_path/"target").write_bytes(b"edited in place")
+    assert store.blob_path(store.local_digest(local_file)).read_bytes() == local_file.read_bytes()
+
+
+def test_hit_leaves_target_mtime_alone(tmp_path, store_dir):
+    conn = LocalConn()
+    store = RemoteBlobStore(store_dir, link_mode="hardlink")
+    local_file = make_file(tmp_path, "artifact", 1000)
+    store.ship(conn, local_file, tmp_path/"target-a")
+    os.utime(tmp_path/"target-a", ns=(1, 1))
+    store.ship(conn, local_file, tmp_path/"target-b")
+    assert (tmp_path/"target-a").stat().st_mtime_ns == 1
+
+
+def test_hardlinked_blob_edited_through_target_is_uploaded_again(tmp_path, store_dir):
+    conn = LocalConn()
+    store = RemoteBlobStore(store_dir, link_mode="hardlink")
+    local_file = make_file(tmp_path, "artifact", 1000)
+    store.ship(conn, local_file, tmp_path/"target-a")
+    with open(tmp_path/"target-a", "r+b") as fh:
+        fh.write(b"corrupt")
+    store.ship(conn, local_file, tmp_path/"target-b")
+    assert len(conn.puts) == 2
+    assert (tmp_path/"target-b").read_bytes() == local_file.read_bytes()
+
+
+def test_evict_least_recently_used(tmp_path, store_dir):
+    conn = LocalConn()
+    store = RemoteBlobStore(store_dir, max_bytes=2500, link_mode="copy")
+    files = [make_file(tmp_path, f"artifact-{idx}", 1000, fill=bytes([65 + idx])) for idx in range(3)]
+    digests = [store.local_digest(local_file) for local_file in files]
+    for idx, local_file in enumerate(files[:2]):
+        store.ship(conn, local_file, tmp_path/f"target-{idx}")
+        os.utime(store.stamp_path(digests[idx]), (1000 + idx, 1000 + idx))
+    # a hit makes artifact-0 the most recently used
+    store.ship(conn, files[0], tmp_path/"target-0")
+    store.ship(conn, files[2], tmp_path/"target-2")
+    assert store.blob_path(digests[0]).exists()
+    assert not store.blob_path(digests[1]).exists()
+    assert not store.stamp_path(digests[1]).exists()
+    assert store.blob_path(digests[2]).exists()
+
+
+def test_evict_skips_blobs_still_linked_by_a_target(tmp_path, store_dir):
+    conn = LocalConn()
+    store = RemoteBlobStore(store_dir, max_bytes=1500, link_mode="hardlink")
+    files = [make_file(tmp_path, f"artifact-{idx}", 1000, fill=bytes([65 + idx])) for idx in range(2)]
+    for idx, local_file in enumerate(files):
+        store.ship(conn, local_file, tmp_path/f"target-{idx}")
+    assert all(store.blob_path(store.local_digest(local_file)).exists() for local_file in files)
+
+    # once its target is gone, the blob counts again
+    (tmp_path/"target-1").unlink()
+    os.utime(store.stamp_path(store.local_digest(files[1])), (1000, 1000))
+    store.evict(conn)
+    assert store.blob_path(store.local_digest(files[0])).exists()
+    assert store.blob_path(store.local_digest(files[1])).exists()
+    (tmp_path/"target-0").unlink()
+    store.evict(conn)
+    assert store.blob_path(store.local_digest(files[0])).exists()
+    assert not store.blob_path(store.local_digest(files[1])).exists()
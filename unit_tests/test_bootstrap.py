@@ -0,0 +1,156 @@
+"""
+bootstrap script, run locally with sh (the venv is created with the interpreter running the tests)
+"""
+import io
+import re
+import sys
+import threading
+import subprocess
+
+import pytest
+
+from RemoteOrchestratorPy.bootstrap import (BootstrapSpec, NEED_WHEELHOUSE, build_bootstrap_script,
+                                            bootstrap_fingerprint, _dist_info_pattern, _read_output)
+
+
+def run_script(spec):
+    return subprocess.run(["sh", "-s"], input=build_bootstrap_script(spec), capture_output=True, text=True,
+                          timeout=120)
+
+
+def test_system_install_runs_with_python_present(tmp_path):
+    workdir = tmp_path/"work"
+    spec = BootstrapSpec(workdir, python=sys.executable, packages=(),
+                         system_install="echo installed >> system_install.txt")
+    result = run_script(spec)
+    assert result.returncode == 0, result.stderr
+    assert "rtas-bootstrap: updated" in result.stdout
+    assert (workdir/"system_install.txt").read_text() == "installed\n"
+
+    result = run_script(spec)
+    assert "rtas-bootstrap: unchanged" in result.stdout
+    assert (workdir/"system_install.txt").read_text() == "installed\n"
+
+
+def test_system_install_only_on_spec_change_or_missing_python(tmp_path):
+    workdir = tmp_path/"work"
+    service = tmp_path/"service.py"
+    service.write_text("print('v1')\n")
+    spec = BootstrapSpec(workdir, python=sys.executable, packages=(), files=(service,),
+                         system_install="echo installed >> system_install.txt")
+    assert run_script(spec).returncode == 0
+    # the node drifted, the spec did not
+    (workdir/"service.py").write_text("edited\n")
+    assert "updated" in run_script(spec).stdout
+    assert (workdir/"system_install.txt").read_text() == "installed\n"
+
+    spec = spec._replace(system_install="echo reinstalled >> system_install.txt")
+    assert run_script(spec).returncode == 0
+    assert (workdir/"system_install.txt").read_text() == "installed\nreinstalled\n"
+
+    (workdir/"service.py").write_text("edited\n")
+    result = run_script(spec._replace(python=str(tmp_path/"no-python")))
+    assert result.returncode == 1
+    assert (workdir/"system_install.txt").read_text() == "installed\nreinstalled\nreinstalled\n"
+
+
+def test_system_install_does_not_read_the_script(tmp_path):
+    workdir = tmp_path/"work"
+    spec = BootstrapSpec(workdir, python=sys.executable, packages=(),
+                         system_install="cat > stdin.txt")
+    result = run_script(spec)
+    assert result.returncode == 0, result.stderr
+    assert "rtas-bootstrap: updated" in result.stdout
+    assert (workdir/"stdin.txt").read_text() == ""
+
+
+def test_failed_system_install(tmp_path):
+    spec = BootstrapSpec(tmp_path/"work", python=sys.executable, packages=(),
+                         system_install="echo no such package; false")
+    result = run_script(spec)
+    assert result.returncode == 1
+    assert "system install failed" in result.stderr
+    assert "no such package" in result.stderr
+
+
+def test_fingerprint_follows_the_spec(tmp_path):
+    service = tmp_path/"service.py"
+    service.write_text("print('v1')\n")
+    spec = BootstrapSpec(tmp_path/"work", files=(service,))
+    fingerprint = bootstrap_fingerprint(spec)
+    assert bootstrap_fingerprint(spec._replace(packages=tuple(reversed(spec.packages)))) == fingerprint
+    assert bootstrap_fingerprint(spec._replace(packages=("rpyc==6.0.0", "wget"))) != fingerprint
+    assert bootstrap_fingerprint(spec._replace(system_install="pkg_add wget")) != fingerprint
+    assert bootstrap_fingerprint(spec._replace(python="python3.12")) != fingerprint
+    service.write_text("print('v2')\n")
+    assert bootstrap_fingerprint(spec) != fingerprint
+
+
+@pytest.mark.parametrize("requirement, dist_info, matches", [
+    ("rpyc", "rpyc-6.0.1.dist-info", True),
+    ("rpyc==6.0.1", "rpyc-6.0.1.dist-info", True),
+    ("rpyc==6.0.0", "rpyc-6.0.1.dist-info", False),
+    ("typing-extensions", "typing_extensions-4.12.2.dist-info", True),
+    ("Zope.Interface", "zope_interface-7.0.dist-info", True),
+    ("rpyc", "rpyc_extra-1.0.dist-info", False),
+])
+def test_dist_info_pattern(requirement, dist_info, matches):
+    assert bool(re.search(_dist_info_pattern(requirement), dist_info)) == matches
+
+
+@pytest.mark.parametrize("requirement", ["rpyc>=6", "git+https://example.org/rpyc", "rpyc[ssh]"])
+def test_unsupported_requirements(requirement):
+    with pytest.raises(ValueError):
+        _dist_info_pattern(requirement)
+
+
+def test_files_packages_and_wheelhouse(tmp_path):
+    workdir = tmp_path/"work"
+    service = tmp_path/"service.py"
+    service.write_text("print('v1')\n")
+    spec = BootstrapSpec(workdir, python=sys.executable, packages=(), files=(service,))
+    assert run_script(spec).returncode == 0
+    assert (workdir/"service.py").read_text() == "print('v1')\n"
+    assert run_script(spec).stdout.strip() == "rtas-bootstrap: unchanged"
+
+    # the copy on the node drifted: rewritten
+    (workdir/"service.py").write_text("edited\n")
+    assert "updated" in run_script(spec).stdout
+    assert (workdir/"service.py").read_text() == "print('v1')\n"
+
+    # an installed distribution is not installed again (pip would need the network here)
+    (site_packages,) = (workdir/"venv"/"lib").glob("python*/site-packages")
+    (site_packages/"rtas_unit_dist-1.0.dist-info").mkdir()
+    spec = spec._replace(packages=("rtas-unit-dist",))
+    assert run_script(spec).returncode == 0
+
+    # a missing package with a wheelhouse that is not on the node yet
+    wheelhouse = tmp_path/"wheelhouse.tar.gz"
+    wheelhouse.write_bytes(b"bundle")
+    spec = spec._replace(packages=("rtas-unit-dist", "rtas-unit-missing"), wheelhouse=wheelhouse)
+    result = run_script(spec)
+    assert result.returncode == NEED_WHEELHOUSE
+    assert "need wheelhouse" in result.stdout
+
+
+class FakeChan:
+    """
+    exec channel whose remote writes more stderr than fits in the window before closing stdout
+    """
+    def __init__(self):
+        self.stderr_read = threading.Event()
+
+    def makefile(self, mode):
+        if not self.stderr_read.wait(10):
+            raise TimeoutError("stdout read to eof before stderr")
+        return io.BytesIO(b"out")
+
+    def makefile_stderr(self, mode):
+        self.stderr_read.set()
+        return io.BytesIO(b"err" * 100000)
+
+
+def test_output_is_read_concurrently():
+    stdout, stderr = _read_output(FakeChan())
+    assert stdout == b"out"
+    assert len(stderr) == 300000
@@ -0,0 +1,153 @@
+"""
+FleetBroadcast rounds, with the relays run as local processes instead of over ssh
+"""
+import sys
+import shutil
+import threading
+import subprocess
+
+import pytest
+
+from RemoteOrchestratorPy import broadcast
+from RemoteOrchestratorPy.broadcast import FleetBroadcast, relay_remote_source
+
+
+class FakeFabric:
+    def __init__(self, host):
+        self.host = host
+        self.port = 22
+        self.puts = []
+
+    def put(self, local_path, remote_path):
+        self.puts.append(remote_path)
+        shutil.copyfile(local_path, remote_path)
+
+
+class FakeChan:
+    def __init__(self, proc):
+        self.proc = proc
+
+    def sendall(self, buf):
+        self.proc.stdin.write(buf)
+
+    def shutdown_write(self):
+        self.proc.stdin.close()
+
+    def close(self):
+        if not self.proc.stdin.closed:
+            self.proc.stdin.close()
+
+
+class LocalRelay(broadcast._Relay):
+    """
+    relay_remote.py run locally on 127.0.0.1; hosts named "down-*" fail to start
+    """
+    def start(self, python, sha256, token, mode, children):
+        if self.fabric_conn.host.startswith("down"):
+            raise IOError("ssh failed")
+        self.address = "127.0.0.1"
+        args = [sys.executable, "-c", relay_remote_source, str(self.target_path), sha256, mode, self.address]
+        for child in children:
+            args += [child.address, str(child.port)]
+        self.proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.chan = FakeChan(self.proc)
+        self.chan.sendall(f"{token}\n".encode())
+        self.proc.stdin.flush()
+        if mode == "listen":
+            self.port = int(self.proc.stdout.readline())
+
+    def wait(self):
+        # like the exec channel, stdin stays open: eof on it makes a listening relay give up
+        returncode = self.proc.wait(30)
+        self.chan.close()
+        if returncode != 0:
+            raise IOError(f"relay exited with {self.proc.returncode}: {self.proc.stderr.read()}")
+
+
+@pytest.fixture(autouse=True)
+def local_relays(monkeypatch):
+    monkeypatch.setattr(broadcast, "_Relay", LocalRelay)
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    path = tmp_path/"payload.bin"
+    path.write_bytes(bytes(range(256)) * 4096)
+    return path
+
+
+def test_run_relays_along_the_tree(tmp_path, local_file):
+    fleet = FleetBroadcast(fanout=2)
+    participants = [(FakeFabric(f"host-{idx}"), tmp_path/f"target-{idx}") for idx in range(7)]
+    results = fleet._run(str(local_file), participants)
+    assert set(results.values()) == {None}
+    for fabric_conn, target_path in participants:
+        assert target_path.read_bytes() == local_file.read_bytes()
+        assert not fabric_conn.puts
+
+
+def test_run_reports_hosts_below_a_failed_relay(tmp_path, local_file):
+    fleet = FleetBroadcast(fanout=1)
+    # a chain: host-0 -> down-1 -> host-2
+    participants = [(FakeFabric("host-0"), tmp_path/"t0"), (FakeFabric("down-1"), tmp_path/"t1"),
+                    (FakeFabric("host-2"), tmp_path/"t2")]
+    results = fleet._run(str(local_file), participants)
+    assert results[("host-0", 22, str(tmp_path/"t0"))] is None
+    assert isinstance(results[("down-1", 22, str(tmp_path/"t1"))], IOError)
+    assert isinstance(results[("host-2", 22, str(tmp_path/"t2"))], IOError)
+    assert not (tmp_path/"t2").exists()
+
+
+def ship_all(fleet, local_file, participants):
+    threads = [threading.Thread(target=fleet.ship, args=(fabric_conn, local_file, target_path))
+               for fabric_conn, target_path in participants]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+
+def test_only_hosts_that_ship_are_written(tmp_path, local_file, monkeypatch):
+    fleet = FleetBroadcast(fanout=1, gather_window=0.5)
+    runs = []
+    run = fleet._run
+    monkeypatch.setattr(fleet, "_run", lambda local_path, participants: runs.append(len(participants))
+                        or run(local_path, participants))
+    participants = [(FakeFabric(f"host-{idx}"), tmp_path/f"target-{idx}") for idx in range(4)]
+    for fabric_conn, target_path in participants:
+        fleet.register(fabric_conn, local_file, target_path)
+    # host-3 is uptodate (or its chain failed): its ship_file never runs
+    ship_all(fleet, local_file, participants[:3])
+    assert runs == [3]
+    assert all(target_path.exists() for _, target_path in participants[:3])
+    assert not participants[3][1].exists()
+
+
+def test_round_starts_once_all_candidates_joined(tmp_path, local_file):
+    fleet = FleetBroadcast(fanout=2, gather_window=60)
+    participants = [(FakeFabric(f"host-{idx}"), tmp_path/f"target-{idx}") for idx in range(3)]
+    for fabric_conn, target_path in participants:
+        fleet.register(fabric_conn, local_file, target_path)
+    ship_all(fleet, local_file, participants)
+    assert all(target_path.exists() for _, target_path in participants)
+
+
+def test_failed_relay_falls_back_to_direct_upload(tmp_path, local_file):
+    fleet = FleetBroadcast(fanout=1, gather_window=0.5)
+    participants = [(FakeFabric("down-0"), tmp_path/"t0"), (FakeFabric("host-1"), tmp_path/"t1")]
+    for fabric_conn, target_path in participants:
+        fleet.register(fabric_conn, local_file, target_path)
+    ship_all(fleet, local_file, participants)
+    assert participants[0][0].puts == [str(tmp_path/"t0")]
+    assert participants[1][0].puts == [str(tmp_path/"t1")]
+    assert (tmp_path/"t1").read_bytes() == local_file.read_bytes()
+
+
+def test_a_later_ship_gets_a_new_round(tmp_path, local_file):
+    fleet = FleetBroadcast(fanout=1, gather_window=0.2)
+    fabric_conn = FakeFabric("host-0")
+    fleet.register(fabric_conn, local_file, tmp_path/"t0")
+    fleet.ship(fabric_conn, local_file, tmp_path/"t0")
+    (tmp_path/"t0").unlink()
+    fleet.ship(fabric_conn, local_file, tmp_path/"t0")
+    assert (tmp_path/"t0").exists()
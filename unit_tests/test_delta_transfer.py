@@ -0,0 +1,192 @@
+"""
+delta transfer without a remote: signatures and patch of delta_remote run in process,
+or as local processes in place of the ssh execs
+"""
+import io
+import os
+import random
+import shutil
+import hashlib
+import subprocess
+
+import pytest
+
+from RemoteOrchestratorPy import delta_remote, delta_transfer
+from RemoteOrchestratorPy.delta_transfer import compute_delta, encode_op, ship_file_delta
+
+BLOCK = 2048
+
+
+def signatures_of(path):
+    out = io.BytesIO()
+    delta_remote.signature(str(path), BLOCK, out)
+    lines = out.getvalue().decode().splitlines()
+    if lines[0] == "-":
+        return 0, []
+    return int(lines[0]), [(int(weak, 16), strong) for weak, strong in (line.split() for line in lines[1:])]
+
+
+def ship(tmp_path, old, new):
+    """
+    rebuild new over a remote copy holding old (None: no remote copy); returns the ops sent
+    """
+    remote = tmp_path/"remote"
+    if old is not None:
+        remote.write_bytes(old)
+    remote_size, signatures = signatures_of(remote)
+    ops = list(compute_delta(new, BLOCK, remote_size, signatures))
+    stream = b"".join(encode_op(op) for op in ops) + b"E" + hashlib.sha256(new).digest()
+    delta_remote.patch(str(remote), BLOCK, io.BytesIO(stream))
+    assert remote.read_bytes() == new
+    return ops
+
+
+def literal_bytes(ops):
+    return sum(len(op[1]) for op in ops if op[0] == 'D')
+
+
+@pytest.fixture
+def old():
+    random.seed(8)
+    return random.randbytes(100 * BLOCK + 123)
+
+
+def test_unchanged_is_one_copy(tmp_path, old):
+    ops = ship(tmp_path, old, old)
+    assert ops == [('C', 0, 101)]
+
+
+@pytest.mark.parametrize("shift", [1, 7, BLOCK - 1])
+def test_insert_at_start_rolls_to_shifted_blocks(tmp_path, old, shift):
+    new = os.urandom(shift) + old
+    ops = ship(tmp_path, old, new)
+    assert literal_bytes(ops) < shift + 2 * BLOCK
+
+
+def test_delete_and_replace_in_the_middle(tmp_path, old):
+    new = old[:30 * BLOCK + 5] + old[31 * BLOCK + 700:60 * BLOCK] + os.urandom(500) + old[61 * BLOCK:]
+    ops = ship(tmp_path, old, new)
+    assert literal_bytes(ops) < 4 * BLOCK
+
+
+def test_no_remote_copy_is_all_literal(tmp_path, old):
+    ops = ship(tmp_path, None, old)
+    assert all(op[0] == 'D' for op in ops)
+    assert literal_bytes(ops) == len(old)
+
+
+def test_empty_files(tmp_path, old):
+    assert literal_bytes(ship(tmp_path, old, b"")) == 0
+    assert literal_bytes(ship(tmp_path, b"", old)) == len(old)
+
+
+def test_digest_mismatch_keeps_remote_copy(tmp_path, old):
+    remote = tmp_path/"remote"
+    remote.write_bytes(old)
+    stream = b"D" + len(b"x").to_bytes(8, "big") + b"x" + b"E" + hashlib.sha256(b"y").digest()
+    with pytest.raises(SystemExit):
+        delta_remote.patch(str(remote), BLOCK, io.BytesIO(stream))
+    assert remote.read_bytes() == old
+    assert not (tmp_path/"remote.rtas-part").exists()
+
+
+def test_patch_aborted_by_the_controller_leaves_no_part_file(tmp_path, old):
+    remote = tmp_path/"remote"
+    remote.write_bytes(old)
+    with pytest.raises(EOFError):
+        delta_remote.patch(str(remote), BLOCK, io.BytesIO(encode_op(('D', b"x" * 10))))
+    assert remote.read_bytes() == old
+    assert not (tmp_path/"remote.rtas-part").exists()
+
+
+def test_new_file_gets_the_mode(tmp_path, old):
+    remote = tmp_path/"remote"
+    stream = b"".join(encode_op(op) for op in compute_delta(old, BLOCK, 0, [])) + b"E" + hashlib.sha256(old).digest()
+    delta_remote.patch(str(remote), BLOCK, io.BytesIO(stream), mode=0o750)
+    assert remote.stat().st_mode & 0o7777 == 0o750
+
+
+class LocalChan:
+    def exec_command(self, cmd):
+        self.proc = subprocess.Popen(cmd, shell=True, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def sendall(self, buf):
+        self.proc.stdin.write(buf)
+
+    def shutdown_write(self):
+        self.proc.stdin.close()
+
+    def recv_stderr(self, size):
+        return self.proc.stderr.read(size)
+
+    def recv_exit_status(self):
+        return self.proc.wait(30)
+
+    def close(self):
+        if not self.proc.stdin.closed:
+            self.proc.stdin.close()
+        self.proc.wait(30)
+
+
+class LocalConn:
+    """
+    runs the remote halves of the delta transfer as local processes
+    """
+    def __init__(self):
+        self.puts = []
+
+    def run(self, cmd, hide=True):
+        return subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True)
+
+    def put(self, local_path, remote_path):
+        self.puts.append(remote_path)
+        shutil.copyfile(local_path, remote_path)
+        shutil.copymode(local_path, remote_path)
+
+    def open_session(self):
+        return LocalChan()
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = LocalConn()
+    monkeypatch.setattr(delta_transfer.ssh_pool, "ensure_open", lambda fabric_conn: conn)
+    return conn
+
+
+def test_small_change_is_shipped_as_delta(tmp_path, old, conn):
+    local, remote = tmp_path/"local", tmp_path/"remote"
+    remote.write_bytes(old)
+    local.write_bytes(old[:50 * BLOCK] + os.urandom(100) + old[50 * BLOCK:])
+    ship_file_delta(conn, local, remote, block_size=BLOCK)
+    assert remote.read_bytes() == local.read_bytes()
+    assert conn.puts == []
+
+
+def test_mostly_changed_file_falls_back_to_put(tmp_path, old, conn):
+    local, remote = tmp_path/"local", tmp_path/"remote"
+    remote.write_bytes(old)
+    local.write_bytes(old[:10 * BLOCK] + os.urandom(len(old) - 10 * BLOCK))
+    ship_file_delta(conn, local, remote, block_size=BLOCK)
+    assert remote.read_bytes() == local.read_bytes()
+    assert conn.puts == [str(remote)]
+    assert not (tmp_path/"remote.rtas-part").exists()
+
+
+def test_literal_bytes_limit(tmp_path, old, conn):
+    local, remote = tmp_path/"local", tmp_path/"remote"
+    remote.write_bytes(old)
+    local.write_bytes(old[:50 * BLOCK] + os.urandom(3 * BLOCK) + old[50 * BLOCK:])
+    ship_file_delta(conn, local, remote, block_size=BLOCK, max_literal_bytes=BLOCK)
+    assert remote.read_bytes() == local.read_bytes()
+    assert conn.puts == [str(remote)]
+
+
+def test_no_remote_copy_is_put_with_the_local_mode(tmp_path, old, conn):
+    local, remote = tmp_path/"local", tmp_path/"remote"
+    local.write_bytes(old)
+    local.chmod(0o750)
+    ship_file_delta(conn, local, remote, block_size=BLOCK)
+    assert remote.read_bytes() == old
+    assert remote.stat().st_mode & 0o7777 == 0o750
+    assert conn.puts == [str(remote)]
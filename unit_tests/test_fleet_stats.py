@@ -0,0 +1,84 @@
+"""
+ServiceStats counters and the fleet report built from them
+"""
+import json
+import time
+import threading
+
+from RemoteOrchestratorPy.fleet_stats import collect_fleet_stats, merge_action_stats, format_fleet_report
+from RemoteOrchestratorPy.remote_execution_service import ServiceStats
+
+
+def host_report(calls):
+    """
+    a ServiceStats report after calls [(action, failed)]
+    """
+    stats = ServiceStats()
+    for action, failed in calls:
+        stats.call_finished(stats.call_started(action), failed=failed)
+    stats.add_bytes(bytes_in=10, bytes_out=20)
+    return json.loads(json.dumps(stats.report()))
+
+
+def test_service_stats_report():
+    stats = ServiceStats()
+    call_id = stats.call_started("wget_url")
+    assert [call["action"] for call in stats.report()["in_flight"]] == ["wget_url"]
+    stats.call_finished(call_id, failed=True)
+    report = stats.report()
+    assert not report["in_flight"]
+    entry = report["actions"]["wget_url"]
+    assert (entry["calls"], entry["errors"]) == (1, 1)
+    assert sum(entry["latency_histogram"]) == 1
+    assert len(entry["latency_histogram"]) == len(report["latency_buckets"])
+
+
+def test_merge_action_stats():
+    fleet_stats = {"host-a": host_report([("wget_url", False), ("wget_url", True)]),
+                   "host-b": host_report([("wget_url", False), ("untar", False)]),
+                   "host-c": {"error": "no rpyc connection"}}
+    merged = merge_action_stats(fleet_stats)
+    assert sorted(merged) == ["untar", "wget_url"]
+    assert (merged["wget_url"]["calls"], merged["wget_url"]["errors"]) == (3, 1)
+    assert sum(merged["wget_url"]["latency_histogram"]) == 3
+    assert merged["wget_url"]["max_seconds"] == max(fleet_stats[host]["actions"]["wget_url"]["max_seconds"]
+                                                    for host in ("host-a", "host-b"))
+    assert merged["untar"]["calls"] == 1
+
+
+def test_format_fleet_report():
+    fleet_stats = {"host-a": host_report([("wget_url", False)]),
+                   "host-b": {"error": "timed out"}}
+    lines = format_fleet_report(fleet_stats).splitlines()
+    assert lines[0].startswith("host | uptime(s)")
+    assert lines[1].startswith("host-a | ") and lines[1].endswith("| 10 | 20")
+    assert lines[2] == "host-b | error: timed out"
+    assert "le 0.001" in lines[4]
+    assert lines[5].startswith("wget_url | 1 | 0 | ")
+
+
+class FakeRoot:
+    def __init__(self, barrier):
+        self.barrier = barrier
+
+    def stats(self):
+        # returns only once all the hosts are queried at the same time
+        self.barrier.wait(5)
+        return json.dumps({"pid": 1})
+
+
+class FakeRTAS:
+    def __init__(self, ipv6, root=None):
+        self.ipv6 = ipv6
+        self.rpyc_conn = type("FakeConn", (), {"root": root})() if root else None
+
+
+def test_hosts_are_queried_concurrently():
+    barrier = threading.Barrier(3)
+    all_rtas = [FakeRTAS(f"host-{idx}", FakeRoot(barrier)) for idx in range(3)] + [FakeRTAS("host-x")]
+    start = time.monotonic()
+    fleet_stats = collect_fleet_stats(all_rtas)
+    assert time.monotonic() - start < 5
+    assert list(fleet_stats) == ["host-0", "host-1", "host-2", "host-x"]
+    assert fleet_stats["host-0"] == {"pid": 1}
+    assert fleet_stats["host-x"] == {"error": "no rpyc connection"}
@@ -0,0 +1,127 @@
+"""
+JobTable state transitions of the remote service, run in process
+"""
+import sys
+import json
+import types
+import threading
+
+import pytest
+
+from RemoteOrchestratorPy import remote_execution_service
+from RemoteOrchestratorPy.remote_execution_service import JobTable
+
+started = threading.Event()
+
+
+def double(x):
+    return 2 * x
+
+
+def boom():
+    raise ValueError("boom")
+
+
+def wait_cancel(cancel_event):
+    started.set()
+    cancel_event.wait(5)
+    return "stopped"
+
+
+def own_progress(progress="own"):
+    return progress
+
+
+def count(n, progress):
+    for idx in range(n):
+        progress({"done": idx + 1})
+    return n
+
+
+count.rtas_progress = True
+
+
+@pytest.fixture(autouse=True)
+def actions_module():
+    module = types.ModuleType("rtas_unit_actions")
+    module.double = double
+    module.boom = boom
+    module.wait_cancel = wait_cancel
+    module.own_progress = own_progress
+    module.count = count
+    sys.modules["rtas_unit_actions"] = module
+    yield module
+    del sys.modules["rtas_unit_actions"]
+
+
+def test_done(tmp_path):
+    job_table = JobTable(tmp_path)
+    job_id = job_table.submit("rtas_unit_actions", "double", (21,), {})
+    (status,) = job_table.wait([job_id], timeout=5)
+    assert status[:4] == (job_id, "done", 42, None)
+    record = json.loads((tmp_path/f"{job_id}.json").read_text())
+    assert record["state"] == "done"
+    assert record["started"] and record["finished"]
+
+
+def test_failed(tmp_path):
+    job_table = JobTable(tmp_path)
+    job_id = job_table.submit("rtas_unit_actions", "boom", (), {})
+    (status,) = job_table.wait([job_id], timeout=5)
+    assert status[1] == "failed"
+    assert "ValueError: boom" in status[3]
+    assert job_table.num_pending() == 0
+
+
+def test_cancel_running(tmp_path):
+    started.clear()
+    job_table = JobTable(tmp_path)
+    job_id = job_table.submit("rtas_unit_actions", "wait_cancel", (), {})
+    assert started.wait(5)
+    assert job_table.cancel(job_id) == "running"
+    (status,) = job_table.wait([job_id], timeout=5)
+    assert status[1] == "cancelled"
+
+
+def test_wait_timeout_leaves_job_pending(tmp_path):
+    started.clear()
+    job_table = JobTable(tmp_path)
+    job_id = job_table.submit("rtas_unit_actions", "wait_cancel", (), {})
+    (status,) = job_table.wait([job_id], timeout=0.2)
+    assert status[1] in ("queued", "running")
+    assert job_table.num_pending() == 1
+    job_table.cancel(job_id)
+    job_table.wait([job_id], timeout=5)
+
+
+def test_pending_jobs_are_lost_on_restart(tmp_path):
+    (tmp_path/"old.json").write_text(json.dumps({"job_id": "old", "state": "running", "result": None,
+                                                  "error": None}))
+    job_table = JobTable(tmp_path)
+    assert job_table.status("old")[1] == "lost"
+    assert json.loads((tmp_path/"old.json").read_text())["state"] == "lost"
+    with pytest.raises(KeyError):
+        job_table.status("unknown")
+
+
+def test_progress_argument_is_opt_in(tmp_path):
+    job_table = JobTable(tmp_path)
+    job_id = job_table.submit("rtas_unit_actions", "own_progress", (), {})
+    (status,) = job_table.wait([job_id], timeout=5)
+    assert status[:3] == (job_id, "done", "own")
+
+
+def test_progress_saves_are_throttled(tmp_path, monkeypatch):
+    saves = []
+    save = JobTable._save
+    monkeypatch.setattr(JobTable, "_save", lambda self, record: saves.append(record["state"]) or save(self, record))
+    monkeypatch.setattr(remote_execution_service, "progress_save_interval", 60)
+    job_table = JobTable(tmp_path)
+    job_id = job_table.submit("rtas_unit_actions", "count", (1000,), {})
+    (status,) = job_table.wait([job_id], timeout=5)
+    assert status[1:3] == ("done", 1000)
+    assert json.loads(status[4]) == {"done": 1000}
+    # queued, running, done: no save per progress record
+    assert saves == ["queued", "running", "done"]
+    assert json.loads(json.loads((tmp_path/f"{job_id}.json").read_text())["progress"]) == {"done": 1000}
+    assert len((tmp_path/f"{job_id}.log").read_text().splitlines()) == 1000
@@ -0,0 +1,61 @@
+"""
+memoised action results: memo_key and the memo hit path of run_action
+"""
+import sys
+import types
+
+import pytest
+
+from RemoteOrchestratorPy import remote_execution_service
+from RemoteOrchestratorPy.remote_execution_service import memo_key, run_action
+
+calls = []
+
+
+def add(x, y=0):
+    calls.append((x, y))
+    return x + y
+
+
+@pytest.fixture(autouse=True)
+def memo_module(tmp_path, monkeypatch):
+    module = types.ModuleType("rtas_unit_memo")
+    module.add = add
+    monkeypatch.setitem(sys.modules, "rtas_unit_memo", module)
+    monkeypatch.setitem(remote_execution_service.module_sources, "rtas_unit_memo",
+                        ("module", str(tmp_path/"rtas_unit_memo.py"), "digest-1"))
+    monkeypatch.setattr(remote_execution_service, "memo_dir", str(tmp_path/"memo"))
+    calls.clear()
+    return module
+
+
+def test_key_ignores_control_kwargs_and_kwarg_order():
+    key = memo_key("rtas_unit_memo", "add", (1,), {"y": 2, "z": 3})
+    assert key == memo_key("rtas_unit_memo", "add", (1,), {"z": 3, "y": 2, "rtas_memo": True, "rtas_result": "value"})
+
+
+@pytest.mark.parametrize("other", [("rtas_unit_memo", "sub", (1,), {"y": 2}),
+                                   ("rtas_unit_memo", "add", (2,), {"y": 2}),
+                                   ("rtas_unit_memo", "add", (1,), {"y": 3}),
+                                   ("rtas_unit_memo", "add", ([1],), {"y": 2}),
+                                   ])
+def test_key_depends_on_call(other):
+    assert memo_key("rtas_unit_memo", "add", (1,), {"y": 2}) != memo_key(*other)
+
+
+def test_key_depends_on_module_content(monkeypatch):
+    key = memo_key("rtas_unit_memo", "add", (1,), {})
+    monkeypatch.setitem(remote_execution_service.module_sources, "rtas_unit_memo", ("module", "path", "digest-2"))
+    assert memo_key("rtas_unit_memo", "add", (1,), {}) != key
+
+
+def test_no_key_for_module_not_uploaded():
+    assert memo_key("not_uploaded", "add", (1,), {}) is None
+
+
+def test_memo_hit_skips_the_action():
+    assert run_action("rtas_unit_memo", "add", (1,), {"y": 2, "rtas_memo": True}) == 3
+    assert run_action("rtas_unit_memo", "add", (1,), {"y": 2, "rtas_memo": True}) == 3
+    assert calls == [(1, 2)]
+    assert run_action("rtas_unit_memo", "add", (1,), {"y": 2}) == 3
+    assert calls == [(1, 2), (1, 2)]
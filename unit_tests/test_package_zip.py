@@ -0,0 +1,70 @@
+"""
+content addressed zip of a remote action package (upload_remote_action_module)
+"""
+import sys
+import types
+import zipfile
+import importlib
+
+from RemoteOrchestratorPy.setup_remote import package_digest, build_package_zip, upload_remote_action_module
+
+
+class FakeRoot:
+    def __init__(self):
+        self.uploads = []
+
+    def upload_package(self, zip_path, name, digest):
+        self.uploads.append((zip_path, name, digest))
+        return "uploaded"
+
+
+class FakeConn:
+    def __init__(self):
+        self.root = FakeRoot()
+
+
+def make_package(tmp_path, body="def answer():\n    return 42\n"):
+    package_dir = tmp_path/"src"/"rtas_unit_pkg"
+    package_dir.mkdir(parents=True, exist_ok=True)
+    (package_dir/"__init__.py").write_text(body)
+    module = types.ModuleType("rtas_unit_pkg")
+    module.__path__ = [str(package_dir)]
+    return package_dir, module
+
+
+def test_zip_is_importable(tmp_path):
+    package_dir, _ = make_package(tmp_path)
+    zip_path = tmp_path/"pkg.zip"
+    assert build_package_zip(package_dir, zip_path) == package_digest(package_dir)
+    assert not list(tmp_path.glob("*.part"))
+    assert "rtas_unit_pkg/__init__.pyc" in zipfile.ZipFile(zip_path).namelist()
+    sys.path.insert(0, str(zip_path))
+    try:
+        module = importlib.import_module("rtas_unit_pkg")
+        assert module.answer() == 42
+        assert module.__file__.startswith(str(zip_path))
+    finally:
+        sys.path.remove(str(zip_path))
+        sys.modules.pop("rtas_unit_pkg", None)
+
+
+def test_zip_is_built_once_per_digest(tmp_path):
+    workdir = tmp_path/"work"
+    workdir.mkdir()
+    package_dir, module = make_package(tmp_path)
+    conn = FakeConn()
+    upload_remote_action_module(conn, module, workdir)
+    (zip_path, name, digest), = conn.root.uploads
+    assert name == "rtas_unit_pkg"
+    assert zip_path.name == f"rtas_unit_pkg-{digest[:16]}.zip"
+    mtime = zip_path.stat().st_mtime_ns
+
+    upload_remote_action_module(conn, module, workdir)
+    assert conn.root.uploads[1] == (zip_path, name, digest)
+    assert zip_path.stat().st_mtime_ns == mtime
+
+    make_package(tmp_path, body="def answer():\n    return 43\n")
+    upload_remote_action_module(conn, module, workdir)
+    new_zip_path, _, new_digest = conn.root.uploads[2]
+    assert new_digest != digest
+    assert new_zip_path != zip_path and zip_path.exists()
@@ -0,0 +1,68 @@
+"""
+conns probed for reattaching to a running service are closed unless taken
+"""
+from doit.cmd_base import ModuleTaskLoader
+
+from RemoteOrchestratorPy import setup_remote
+from RemoteOrchestratorPy.setup_remote import (check_service_reusable, take_reattach_conn, drop_reattach_conn,
+                                              reattach_conns)
+from RemoteOrchestratorPy.rtas_executor import RTASDoitMain
+
+
+class FakeConn:
+    def __init__(self, at_eof=False):
+        self.closed = False
+        self.at_eof = at_eof
+
+    def poll(self):
+        if self.at_eof:
+            raise EOFError()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRTAS:
+    ipv6 = "unit-test-host"
+
+
+def probe_returning(conns, monkeypatch):
+    monkeypatch.setattr(setup_remote, "probe_service", lambda connect: conns.pop(0))
+
+
+def test_probe_replaces_stale_conn(monkeypatch):
+    old, new = FakeConn(), FakeConn()
+    probe_returning([old, new], monkeypatch)
+    assert check_service_reusable(FakeRTAS(), None)
+    assert check_service_reusable(FakeRTAS(), None)
+    assert old.closed and not new.closed
+    assert take_reattach_conn(FakeRTAS()) is new
+    assert not reattach_conns
+
+
+def test_dead_conn_is_closed_on_take(monkeypatch):
+    conn = FakeConn(at_eof=True)
+    probe_returning([conn], monkeypatch)
+    check_service_reusable(FakeRTAS(), None)
+    assert take_reattach_conn(FakeRTAS()) is None
+    assert conn.closed
+
+
+def test_drop(monkeypatch):
+    conn = FakeConn()
+    probe_returning([conn], monkeypatch)
+    check_service_reusable(FakeRTAS(), None)
+    drop_reattach_conn(FakeRTAS())
+    assert conn.closed and not reattach_conns
+
+
+def test_untaken_conns_closed_after_run(monkeypatch, tmp_path):
+    conn = FakeConn()
+    probe_returning([conn], monkeypatch)
+
+    def task_launch():
+        # the chain stops before rpyc_conn_lifecycle takes the conn
+        return {'actions': [lambda: False],
+                'uptodate': [lambda: not check_service_reusable(FakeRTAS(), None)]}
+    RTASDoitMain(ModuleTaskLoader({'task_launch': task_launch})).run(['run', '--db-file', str(tmp_path/"doit.db")])
+    assert conn.closed and not reattach_conns
@@ -0,0 +1,59 @@
+"""
+relay_remote.py run as local processes: a seed relay fed on stdin and a listening child
+"""
+import os
+import sys
+import time
+import socket
+import hashlib
+import subprocess
+
+from RemoteOrchestratorPy.broadcast import relay_remote_source
+
+TOKEN = b"0123456789abcdef"
+
+
+def start_relay(target, sha256, mode, children=()):
+    args = [sys.executable, "-c", relay_remote_source, str(target), sha256, mode, "127.0.0.1"]
+    for host, port in children:
+        args += [host, str(port)]
+    relay = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    relay.stdin.write(TOKEN + b"\n")
+    relay.stdin.flush()
+    return relay
+
+
+def test_seed_relays_to_child(tmp_path):
+    data = os.urandom(3 << 20)
+    sha256 = hashlib.sha256(data).hexdigest()
+    child = start_relay(tmp_path/"child", sha256, "listen")
+    port = int(child.stdout.readline())
+    seed = start_relay(tmp_path/"seed", sha256, "stdin", [("127.0.0.1", port)])
+    seed.stdin.write(data)
+    seed.stdin.close()
+    assert seed.wait(30) == 0, seed.stderr.read()
+    assert child.wait(30) == 0, child.stderr.read()
+    child.stdin.close()
+    assert (tmp_path/"seed").read_bytes() == data
+    assert (tmp_path/"child").read_bytes() == data
+    assert all(TOKEN.decode() not in arg for arg in child.args)
+
+
+def test_bad_token_is_refused(tmp_path):
+    child = start_relay(tmp_path/"child", "0" * 64, "listen")
+    port = int(child.stdout.readline())
+    with socket.create_connection(("127.0.0.1", port)) as peer:
+        peer.sendall(b"x" * len(TOKEN))
+    assert child.wait(30) != 0
+    assert b"bad relay token" in child.stderr.read()
+    assert not (tmp_path/"child").exists()
+
+
+def test_orphan_exits_on_stdin_eof(tmp_path):
+    child = start_relay(tmp_path/"child", "0" * 64, "listen")
+    child.stdout.readline()
+    started = time.monotonic()
+    child.stdin.close()
+    assert child.wait(30) != 0
+    assert time.monotonic() - started < 10
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,102 @@
+"""
+CachedRemoteFilesDep values and the run scoped remote_metadata_cache
+"""
+import subprocess
+from types import SimpleNamespace
+
+from doit.cmd_base import ModuleTaskLoader
+
+from RemoteOrchestratorPy.remote_stat import (CachedRemoteFilesDep, RemoteFileStat, RemoteMetadataCache,
+                                              RemoteStatProbe, remote_metadata_cache)
+from RemoteOrchestratorPy.rtas_executor import RTASDoitMain
+
+
+class FakeRTAS:
+    def __init__(self, ipv6):
+        self.ipv6 = ipv6
+
+
+class FakeProbe:
+    def __init__(self, ipv6, digests):
+        self.rtas = FakeRTAS(ipv6)
+        self.digests = digests
+
+    def hash(self, paths):
+        return {path: RemoteFileStat(path, True, 1, 1, self.digests[path], True) for path in paths}
+
+
+class LocalConn:
+    """
+    runs the stat scripts with the local sh
+    """
+    host = "localhost"
+
+    def __init__(self):
+        self.runs = 0
+
+    def run(self, script, hide=True, warn=True):
+        self.runs += 1
+        return subprocess.run(["sh", "-c", script], capture_output=True, text=True)
+
+
+class FakeTask:
+    def __init__(self):
+        self.value_savers = []
+
+    def saved_values(self):
+        values = {}
+        for saver in self.value_savers:
+            values.update(saver())
+        return values
+
+
+def test_deps_of_one_task_keep_their_own_values():
+    task = FakeTask()
+    probe_a = FakeProbe("host-a", {"/srv/a": "1", "/srv/b": "2"})
+    probe_b = FakeProbe("host-b", {"/srv/a": "3"})
+    deps = [CachedRemoteFilesDep(probe_a, ["/srv/a"]),
+            CachedRemoteFilesDep(probe_a, ["/srv/b"]),
+            CachedRemoteFilesDep(probe_b, ["/srv/a"])]
+    for dep in deps:
+        dep.configure_task(task)
+        assert dep(task, {}) is False
+    values = task.saved_values()
+    assert len(values) == 3
+    assert all(dep(task, values) for dep in deps)
+
+    probe_a.digests["/srv/b"] = "changed"
+    assert [dep(task, values) for dep in deps] == [True, False, True]
+
+
+def test_run_clears_remote_metadata_cache(tmp_path):
+    remote_metadata_cache.update("host-a", {"/srv/a": RemoteFileStat("/srv/a", True)})
+    seen = []
+
+    def task_check():
+        return {'actions': [lambda: seen.append(remote_metadata_cache.get("host-a", "/srv/a")) or True]}
+    assert RTASDoitMain(ModuleTaskLoader({'task_check': task_check})).run(
+        ['run', '--db-file', str(tmp_path/"doit.db")]) == 0
+    assert seen == [None]
+
+
+def test_dep_hashes_files_when_checked(tmp_path):
+    # e.g. the source of a fetch_file, regenerated by a remote_step after the probe ran
+    remote_file = tmp_path/"out.txt"
+    remote_file.write_text("stale")
+    conn = LocalConn()
+    rtas = SimpleNamespace(ipv6="host-a", active_conn=conn, os_type="linux")
+    probe = RemoteStatProbe(rtas, cache=RemoteMetadataCache())
+    probe.register([remote_file])
+    dep = CachedRemoteFilesDep(probe, [remote_file])
+    task = FakeTask()
+    dep.configure_task(task)
+
+    assert probe.stat(remote_file).exists
+    assert dep(task, {}) is False
+    values = task.saved_values()
+    assert dep(task, values) is True
+
+    remote_file.write_text("regenerated")
+    assert probe.stat(remote_file).exists
+    assert dep(task, values) is False
+    assert conn.runs == 4
@@ -0,0 +1,65 @@
+"""
+remote_wait_jobs against a fake service conn
+"""
+import pytest
+from doit_extntools import RemoteCommandError
+
+from RemoteOrchestratorPy.doit_rtas import remote_wait_jobs
+
+
+class FakeRoot:
+    def __init__(self, states):
+        # job id -> state reported by wait_jobs
+        self.states = states
+        self.poll_timeouts = []
+
+    def wait_jobs(self, job_ids, poll_timeout):
+        self.poll_timeouts.append(poll_timeout)
+        return tuple((job_id, self.states[job_id], "result", "error", None) for job_id in job_ids)
+
+    def cancel_job(self, job_id):
+        pass
+
+
+class FakeConn:
+    def __init__(self, states, sync_request_timeout=30):
+        self.root = FakeRoot(states)
+        self._config = {"sync_request_timeout": sync_request_timeout}
+
+
+class FakeRTAS:
+    def __init__(self, conn, remote_jobs):
+        # not registered in rpyc_pool: checkout hands out rpyc_conn
+        self.ipv6 = "unit-test-host"
+        self.rpyc_conn = conn
+        self.remote_jobs = remote_jobs
+        self.remote_task_results = {}
+
+
+def test_skipped_submit_is_not_waited_for():
+    conn = FakeConn({"job-1": "done"})
+    rtas = FakeRTAS(conn, {"t:remote_step:a": ("action_a", "job-1")})
+    assert remote_wait_jobs(rtas, ["t:remote_step:a", "t:remote_step:skipped"])
+    assert rtas.remote_task_results["t:remote_step:a"] == ("Success", "result")
+
+
+def test_nothing_submitted():
+    conn = FakeConn({})
+    rtas = FakeRTAS(conn, {})
+    assert remote_wait_jobs(rtas, ["t:remote_step:skipped"])
+    assert conn.root.poll_timeouts == []
+
+
+def test_poll_timeout_below_sync_request_timeout():
+    conn = FakeConn({"job-1": "done"}, sync_request_timeout=30)
+    rtas = FakeRTAS(conn, {"t:remote_step:a": ("action_a", "job-1")})
+    remote_wait_jobs(rtas, ["t:remote_step:a"])
+    assert 0 < conn.root.poll_timeouts[0] < 30
+
+
+def test_failed_job_raises():
+    conn = FakeConn({"job-1": "failed"})
+    rtas = FakeRTAS(conn, {"t:remote_step:a": ("action_a", "job-1")})
+    with pytest.raises(RemoteCommandError):
+        remote_wait_jobs(rtas, ["t:remote_step:a"])
+    assert rtas.remote_task_results["t:remote_step:a"] == ("Failed", "error")
@@ -0,0 +1,50 @@
+"""
+by value results: encode_result on the service, decode_result on the controller
+"""
+import pickle
+
+import pytest
+
+from RemoteOrchestratorPy import remote_execution_service
+from RemoteOrchestratorPy.remote_execution_service import encode_result
+from RemoteOrchestratorPy.doit_rtas_helpers import decode_result, RemoteResultFile
+
+
+@pytest.fixture(autouse=True)
+def results_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(remote_execution_service, "results_dir", str(tmp_path/"results"))
+    return tmp_path/"results"
+
+
+@pytest.mark.parametrize("result", [None, 42, "text", b"\0bytes", {"nested": [1, (2, 3)]},
+                                    ("rtas-value", b"not a pickle"), ("rtas-file", "/etc/passwd", 3)])
+def test_inline_roundtrip(result):
+    encoded = encode_result(result)
+    assert encoded[0] == "rtas-value"
+    assert decode_result(encoded) == result
+
+
+def test_large_result_is_spilled(monkeypatch, results_dir):
+    monkeypatch.setattr(remote_execution_service, "max_inline_result", 100)
+    result = list(range(1000))
+    encoded = encode_result(result)
+    decoded = decode_result(encoded)
+    assert isinstance(decoded, RemoteResultFile)
+    assert decoded.path.startswith(str(results_dir))
+    with open(decoded.path, "rb") as fh:
+        assert pickle.load(fh) == result
+    assert decoded.size == len(pickle.dumps(result, protocol=5))
+    assert not list(results_dir.glob("*.part"))
+
+
+def test_result_over_limit_is_refused(monkeypatch):
+    monkeypatch.setattr(remote_execution_service, "max_result", 100)
+    with pytest.raises(ValueError):
+        encode_result(list(range(1000)))
+
+
+@pytest.mark.parametrize("value", [("rtas-value",), ("rtas-value", "str"), ("rtas-file", "/path"),
+                                   ("rtas-file", "/path", "3"), ("rtas-value", b"x", 1), ["rtas-value", b"x"],
+                                   ("other", 1), (), "rtas-value"])
+def test_plain_results_pass_through(value):
+    assert decode_result(value) == value
@@ -0,0 +1,72 @@
+"""
+RPyCConnPool checkout, per host limits and re-registration
+"""
+import threading
+
+from RemoteOrchestratorPy.rpyc_pool import RPyCConnPool
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Connector:
+    def __init__(self):
+        self.conns = []
+
+    def __call__(self):
+        conn = FakeConn()
+        self.conns.append(conn)
+        return conn
+
+
+def test_checkout_opens_up_to_max_conns():
+    pool = RPyCConnPool(max_conns=4)
+    connect = Connector()
+    pool.register("host-a", connect, max_conns=2)
+    with pool.checkout("host-a") as first, pool.checkout("host-a") as second:
+        assert first is not second
+    assert len(connect.conns) == 2
+
+    got = []
+    with pool.checkout("host-a"), pool.checkout("host-a"):
+        waiter = threading.Thread(target=lambda: got.append(pool.checkout("host-a").__enter__()), daemon=True)
+        waiter.start()
+        waiter.join(0.2)
+        # both conns are checked out: the third call waits for one of them
+        assert got == []
+    waiter.join(5)
+    assert got[0] in connect.conns
+    assert len(connect.conns) == 2
+
+
+def test_unregistered_host_yields_default():
+    pool = RPyCConnPool()
+    with pool.checkout("host-a", default="conn") as conn:
+        assert conn == "conn"
+
+
+def test_register_again_closes_previous_conns():
+    pool = RPyCConnPool()
+    connect = Connector()
+    first_conn = FakeConn()
+    pool.register("host-a", connect, first_conn)
+    with pool.checkout("host-a"), pool.checkout("host-a"):
+        pass
+    (opened,) = connect.conns
+
+    second_conn = FakeConn()
+    pool.register("host-a", connect, second_conn)
+    assert first_conn.closed and opened.closed
+    with pool.checkout("host-a") as conn:
+        assert conn is second_conn
+
+    # the conn handed to register is kept open, even if it was pooled already
+    pool.register("host-a", connect, second_conn)
+    assert not second_conn.closed
+    pool.close("host-a")
+    assert second_conn.closed
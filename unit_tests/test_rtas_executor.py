@@ -0,0 +1,86 @@
+"""
+RTASRun picks RTASThreadRunner for parallel runs, leaving the rest to doit's run command
+"""
+import time
+import threading
+
+import pytest
+from doit import cmd_run
+from doit.cmd_base import ModuleTaskLoader
+from doit.runner import MThreadRunner
+
+from RemoteOrchestratorPy.rtas_executor import RTASDoitMain, RTASThreadRunner
+
+threads = set()
+
+
+def record_thread():
+    threads.add(threading.current_thread().name)
+
+
+def task_unit():
+    for idx in range(4):
+        yield {'name': f"t{idx}", 'actions': [record_thread], 'verbosity': 0}
+
+
+@pytest.mark.parametrize("par_type", ["process", "thread"])
+def test_parallel_run_uses_rtas_thread_runner(tmp_path, monkeypatch, capsys, par_type):
+    runners = []
+    monkeypatch.setattr(RTASThreadRunner, "run_all",
+                        lambda self, task_dispatcher: runners.append(type(self)) or 0)
+    loader = ModuleTaskLoader({'task_unit': task_unit})
+    args = ['run', '--db-file', str(tmp_path/"doit.db"), '-n', '2', '-P', par_type]
+    assert RTASDoitMain(loader).run(args) == 0
+    assert runners == [RTASThreadRunner]
+    assert cmd_run.MThreadRunner is MThreadRunner
+    assert ("cannot be pickled" in capsys.readouterr().err) == (par_type == "process")
+
+
+def test_serial_run(tmp_path):
+    threads.clear()
+    loader = ModuleTaskLoader({'task_unit': task_unit})
+    assert RTASDoitMain(loader).run(['run', '--db-file', str(tmp_path/"doit.db")]) == 0
+    assert threads == {threading.current_thread().name}
+
+
+def test_parallel_run(tmp_path):
+    threads.clear()
+    loader = ModuleTaskLoader({'task_unit': task_unit})
+    args = ['run', '--db-file', str(tmp_path/"doit.db"), '-n', '2', '-P', 'thread']
+    assert RTASDoitMain(loader).run(args) == 0
+    assert threads and threading.current_thread().name not in threads
+
+
+class FakeRTAS:
+    def __init__(self, ipv6):
+        self.ipv6 = ipv6
+        self.lock = threading.RLock()
+        self.running = 0
+        self.max_running = 0
+
+
+counter_lock = threading.Lock()
+
+
+def run_on(rtas):
+    with counter_lock:
+        rtas.running += 1
+        rtas.max_running = max(rtas.max_running, rtas.running)
+    time.sleep(0.05)
+    with counter_lock:
+        rtas.running -= 1
+
+
+def test_tasks_of_one_rtas_are_serialised(tmp_path):
+    all_rtas = [FakeRTAS("host-a"), FakeRTAS("host-b")]
+
+    def task_rtas():
+        for rtas in all_rtas:
+            for idx in range(3):
+                yield {'name': f"{rtas.ipv6}:t{idx}", 'actions': [(run_on, [rtas])],
+                       'meta': {'rtas': rtas}, 'verbosity': 0}
+
+    loader = ModuleTaskLoader({'task_rtas': task_rtas})
+    args = ['run', '--db-file', str(tmp_path/"doit.db"), '-n', '6', '-P', 'thread']
+    assert RTASDoitMain(loader).run(args) == 0
+    assert [rtas.max_running for rtas in all_rtas] == [1, 1]
@@ -0,0 +1,138 @@
+"""
+ShipEngine channel accounting, with fake sftp channels (no remote host needed)
+"""
+import os
+import threading
+
+import pytest
+
+from RemoteOrchestratorPy.ship_engine import ShipEngine
+
+
+class FakeRemoteFile:
+    def __init__(self, sftp, path):
+        self.sftp = sftp
+        self.path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def truncate(self, size):
+        self.sftp.files[self.path] = bytearray(size)
+
+    def set_pipelined(self, pipelined):
+        pass
+
+    def seek(self, offset):
+        self.offset = offset
+
+    def write(self, buf):
+        if self.sftp.fail_writes:
+            raise IOError("channel failed")
+        data = self.sftp.files[self.path]
+        data[self.offset:self.offset + len(buf)] = buf
+        self.offset += len(buf)
+
+
+class FakeStat:
+    def __init__(self, size):
+        self.st_size = size
+
+
+class FakeSftp:
+    def __init__(self, files, fail_writes=False):
+        self.files = files
+        self.fail_writes = fail_writes
+        self.closed = False
+        self.modes = {}
+
+    def open(self, path, mode):
+        return FakeRemoteFile(self, path)
+
+    def stat(self, path):
+        return FakeStat(len(self.files[path]))
+
+    def chmod(self, path, mode):
+        self.modes[path] = mode
+
+    def posix_rename(self, src, dst):
+        self.files[dst] = self.files.pop(src)
+        self.modes[dst] = self.modes.pop(src, None)
+
+    def close(self):
+        self.closed = True
+
+
+def make_engine(num_channels, fail_first=0, **kwargs):
+    engine = ShipEngine(None, num_channels=num_channels, **kwargs)
+    engine.files = {}
+    engine.opened = []
+
+    def open_sftp():
+        sftp = FakeSftp(engine.files, fail_writes=len(engine.opened) < fail_first)
+        engine.opened.append(sftp)
+        return sftp
+    engine._open_sftp = open_sftp
+    return engine
+
+
+def test_waiter_opens_new_channel_after_broken_release():
+    engine = make_engine(num_channels=1)
+    sftp = engine._acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(engine._acquire()), daemon=True)
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    engine._release(sftp, broken=True)
+    waiter.join(2)
+    assert not waiter.is_alive()
+    assert acquired[0] is not sftp
+    assert sftp.closed
+    assert engine._num_open == 1
+
+
+def test_waiter_takes_released_channel():
+    engine = make_engine(num_channels=1)
+    sftp = engine._acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(engine._acquire()), daemon=True)
+    waiter.start()
+    engine._release(sftp)
+    waiter.join(2)
+    assert acquired == [sftp]
+    assert len(engine.opened) == 1
+
+
+def test_acquire_non_blocking_at_limit():
+    engine = make_engine(num_channels=1)
+    engine._acquire()
+    assert engine._acquire(block=False) is None
+
+
+def test_put_keeps_mode_and_content(tmp_path):
+    local_path = tmp_path/"script.sh"
+    local_path.write_bytes(os.urandom(1000))
+    local_path.chmod(0o750)
+    engine = make_engine(num_channels=2)
+    engine.put(local_path, "/remote/script.sh")
+    assert bytes(engine.files["/remote/script.sh"]) == local_path.read_bytes()
+    assert engine.opened[0].modes["/remote/script.sh"] == 0o750
+
+
+def test_failed_range_write_only_drops_failing_channel(tmp_path):
+    local_path = tmp_path/"big"
+    local_path.write_bytes(os.urandom(4000))
+    # the first channel fails its writes, the three extra channels are healthy
+    engine = make_engine(num_channels=4, fail_first=1, split_threshold=100)
+    for sftp in [engine._acquire() for _ in range(4)]:
+        engine._release(sftp)
+    with pytest.raises(IOError):
+        engine.put(local_path, "/remote/big")
+    assert engine._num_open == 3
+    assert len(engine._free) == 3
+    assert not any(sftp.closed for sftp in engine._free)
@@ -0,0 +1,112 @@
+"""
+TunnelManager pumping, with socketpairs standing in for the ssh channels
+"""
+import os
+import queue
+import socket
+import threading
+
+import pytest
+
+from RemoteOrchestratorPy import tunnels
+from RemoteOrchestratorPy.tunnels import TunnelManager
+
+
+class FakeChannel:
+    """
+    socket that behaves like a non-blocking paramiko channel: socket.timeout instead of BlockingIOError
+    """
+    def __init__(self, sock):
+        self.sock = sock
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def recv(self, size):
+        try:
+            return self.sock.recv(size)
+        except BlockingIOError:
+            raise socket.timeout()
+
+    def send(self, buf):
+        try:
+            return self.sock.send(buf)
+        except BlockingIOError:
+            raise socket.timeout()
+
+    def close(self):
+        self.sock.close()
+
+
+class FakeFabric:
+    host = "unit-test-host"
+
+
+@pytest.fixture
+def remotes(monkeypatch):
+    # remote ends of the opened channels
+    remotes = queue.Queue()
+
+    def open_channel(fabric_conn, remote_port):
+        chan_end, remote_end = socket.socketpair()
+        remotes.put(remote_end)
+        return FakeChannel(chan_end)
+    monkeypatch.setattr(tunnels.ssh_pool, "open_channel", open_channel)
+    return remotes
+
+
+def recv_exactly(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        data = sock.recv(size - len(buf))
+        assert data
+        buf += data
+    return bytes(buf)
+
+
+def echo_roundtrip(tunnel, remotes):
+    with socket.create_connection(tunnel.endpoint, timeout=2) as client:
+        remote = remotes.get(timeout=2)
+        remote.settimeout(2)
+        client.sendall(b"ping")
+        assert recv_exactly(remote, 4) == b"ping"
+        remote.sendall(b"pong")
+        assert recv_exactly(client, 4) == b"pong"
+        remote.close()
+
+
+@pytest.mark.parametrize("direction", ["to_remote", "to_local"])
+def test_slow_reader_does_not_block_other_connections(remotes, direction):
+    manager = TunnelManager()
+    tunnel = manager.open(FakeFabric(), 7777)
+    payload = os.urandom(8 << 20)
+    client = socket.create_connection(tunnel.endpoint, timeout=5)
+    remote = remotes.get(timeout=2)
+    remote.settimeout(5)
+    sender, receiver = (client, remote) if direction == "to_remote" else (remote, client)
+    threading.Thread(target=sender.sendall, args=(payload,), daemon=True).start()
+
+    # nobody reads the big transfer yet: the tunnel must keep serving the other connections
+    echo_roundtrip(tunnel, remotes)
+
+    assert recv_exactly(receiver, len(payload)) == payload
+    client.close()
+    remote.close()
+    manager.close(FakeFabric.host)
+
+
+def test_channel_opened_after_close_is_dropped(remotes):
+    manager = TunnelManager()
+    tunnel = manager.open(FakeFabric(), 7777)
+    state = manager._tunnels[tunnel[:3]]
+    manager.close(FakeFabric.host)
+    sock, peer = socket.socketpair()
+    chan, remote = socket.socketpair()
+    manager._add_pair(state, sock, FakeChannel(chan))
+    assert not state.pairs
+    assert sock.fileno() == -1 and chan.fileno() == -1
+    for end in (peer, remote):
+        end.close()
@@ -0,0 +1,43 @@
+"""
+WheelhouseCache with pip stubbed out
+"""
+import subprocess
+
+import pytest
+
+from RemoteOrchestratorPy.wheelhouse import WheelhouseCache
+
+
+class FakePip:
+    def __init__(self, download_ok=True):
+        self.download_ok = download_ok
+        self.calls = []
+
+    def __call__(self, *args):
+        self.calls.append(args)
+        wheel_dir = args[args.index("--dest" if args[0] == "download" else "--wheel-dir") + 1]
+        returncode = 0 if args[0] == "wheel" or self.download_ok else 1
+        if returncode == 0:
+            open(f"{wheel_dir}/rpyc-6.0.0-py3-none-any.whl", "w").close()
+        return subprocess.CompletedProcess(args, returncode, "", "")
+
+
+@pytest.mark.parametrize("os_type", ["linux", "debian"])
+def test_linux_uses_manylinux_tags(tmp_path, os_type):
+    cache = WheelhouseCache(tmp_path)
+    cache._pip = FakePip()
+    bundle = cache.bundle(os_type, "x86_64", "3.11.2", ("rpyc",))
+    assert bundle.exists() and "py3.11-" in bundle.name
+    (download,) = cache._pip.calls
+    assert download[0] == "download"
+    assert "manylinux2014_x86_64" in download
+
+    cache.bundle(os_type, "x86_64", "3.11", ("rpyc",))
+    assert len(cache._pip.calls) == 1
+
+
+def test_openbsd_builds_pure_wheels(tmp_path):
+    cache = WheelhouseCache(tmp_path)
+    cache._pip = FakePip()
+    cache.bundle("openbsd", "amd64", "3.12", ("rpyc",))
+    assert [call[0] for call in cache._pip.calls] == ["wheel"]